@@ -1,4 +1,5 @@
 import sys
+from bisect import bisect_left
 try:
     from PyQt5.QtWidgets import QWidget, QHBoxLayout, QComboBox
 except ImportError:
@@ -18,7 +19,7 @@ class ComboBox(QWidget):
 
         layout = QHBoxLayout()
         self.cb = QComboBox()
-        self.items = items
+        self.items = list(items)
         self.cb.addItems(self.items)
 
         self.cb.currentIndexChanged.connect(parent.comboSelectionChanged)
@@ -31,3 +32,32 @@ class ComboBox(QWidget):
 
         self.cb.clear()
         self.cb.addItems(self.items)
+
+    def add_item(self, text):
+        """Insert a single item keeping the list sorted, without touching the
+        current selection."""
+        index = bisect_left(self.items, text)
+        if index < len(self.items) and self.items[index] == text:
+            return
+        self.items.insert(index, text)
+        self.cb.blockSignals(True)
+        self.cb.insertItem(index, text)
+        self.cb.blockSignals(False)
+
+    def remove_item(self, text):
+        """Remove a single item. The empty "show all" row is never removed;
+        if the removed item was selected the selection falls back to it."""
+        if not text:
+            return
+        index = bisect_left(self.items, text)
+        if index >= len(self.items) or self.items[index] != text:
+            return
+        del self.items[index]
+        current = self.cb.currentIndex() == index
+        self.cb.blockSignals(True)
+        self.cb.removeItem(index)
+        if current:
+            self.cb.setCurrentIndex(-1)
+        self.cb.blockSignals(False)
+        if current:
+            self.cb.setCurrentIndex(0)
@@ -8,6 +8,7 @@ import re
 import sys
 import subprocess
 import json
+import sqlite3
 
 from functools import partial
 from collections import defaultdict
@@ -32,11 +33,12 @@ from libs.resources import *
 from libs.constants import *
 from libs.utils import *
 from libs.settings import Settings
-from libs.shape import Shape, DEFAULT_LINE_COLOR, DEFAULT_FILL_COLOR
+from libs.shape import Shape, DEFAULT_LINE_COLOR, DEFAULT_FILL_COLOR, coordsOf
 from libs.stringBundle import StringBundle
 from libs.canvas import Canvas
 from libs.zoomWidget import ZoomWidget
 from libs.labelDialog import LabelDialog
+from libs.labelVocabulary import LabelVocabulary
 from libs.colorDialog import ColorDialog
 from libs.labelFile import LabelFile, LabelFileError
 from libs.toolBar import ToolBar
@@ -46,6 +48,19 @@ from libs.yolo_io import YoloReader
 from libs.yolo_io import TXT_EXT
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
+from libs.autoLabelWorker import AutoLabelWorker
+from libs.dirScanner import DirScanner, iterImageFiles
+from libs.datasetList import DatasetList
+from libs.tiledImage import TiledImage, TILED_IMAGE_PIXELS, DEFAULT_TILE_CACHE_SIZE
+from libs.datasetIndex import DatasetIndex, IndexReconciler
+from libs.perfMonitor import PerfMonitor, PerfHud
+from libs.labelPalette import LABEL_PALETTE, PALETTE_FILE_NAME
+from libs.labelHistogram import LabelHistogram, LabelStatsWidget
+from libs.undoJournal import UndoJournal, CreateCommand, DeleteCommand, MoveCommand, RelabelCommand
+from libs.fileListModel import FileListModel, STATUS_NONE, STATUS_ANNOTATED, STATUS_VERIFIED
+from libs.imageCache import ImageCache, ImagePrefetcher, FullImageLoader, decodeImageData, \
+    FULL_IMAGE_ZOOM_THRESHOLD, DEFAULT_CACHE_SIZE, \
+    DEFAULT_PREFETCH_NEXT, DEFAULT_PREFETCH_PREV
 
 # 扩展专用的类库
 import copy
@@ -96,12 +111,17 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # 映射字典
         self.mapping = self.get_mapping_dict()
+        # mapping.json中固定的标签颜色
+        LABEL_PALETTE.setPinned(self.mapping.get('label_colors', {}))
 
         # 自动标注配置
         self.auto_label = self.get_tf_auto_label()
         self.auto_label_tool = TFObjectDetect(
             self.auto_label, self.mapping, os.path.split(__file__)[0]
         )
+        # 自动标注在后台线程执行, 识别完成后再添加到画布
+        self.autoLabelWorker = AutoLabelWorker(self.auto_label_tool, self)
+        self.autoLabelWorker.detected.connect(self.autoLabelDetected)
 
         # Save as Pascal voc xml
         self.defaultSaveDir = defaultSaveDir
@@ -109,11 +129,33 @@ class MainWindow(QMainWindow, WindowMixin):
         self.usingYoloFormat = False
 
         # For loading all image under a directory
-        self.mImgList = []
+        self.mImgList = DatasetList()
+        self.dirScanner = None
+        # 重新打开数据集时先使用索引中的清单, 扫描结果暂存在这里
+        self.scanBuffer = None
         self.dirname = None
-        self.labelHist = []
+        # 数据集索引, 本次会话增量更新完成后才用于查询
+        self.datasetIndex = None
+        self.indexReconciler = None
+        self.indexReconciled = False
+        # 标签词表, 标签输入框共用, 新标签增量加入
+        self.labelHist = LabelVocabulary()
         self.lastOpenDir = None
 
+        # 图片预读缓存, 在后台线程解码前后的图片
+        self.prefetchNext = settings.get(SETTING_PREFETCH_NEXT, DEFAULT_PREFETCH_NEXT)
+        self.prefetchPrev = settings.get(SETTING_PREFETCH_PREV, DEFAULT_PREFETCH_PREV)
+        self.imageCache = ImageCache(
+            settings.get(SETTING_IMAGE_CACHE_SIZE, DEFAULT_CACHE_SIZE) * 1024 * 1024
+        )
+        # 大图先按屏幕分辨率缩小解码, 放大超过阈值后再在后台加载原图
+        self.imagePrefetcher = ImagePrefetcher(self.imageCache, maxSize=self.decodeSize())
+        self.fullImageLoader = FullImageLoader(self.imageCache, self)
+        self.fullImageLoader.loaded.connect(self.fullImageLoaded)
+        # 超大图片分块的磁盘缓存目录(None为临时目录)及容量(MB)
+        self.tileCacheDir = settings.get(SETTING_TILE_CACHE_DIR, None) or None
+        self.tileCacheSize = settings.get(SETTING_TILE_CACHE_SIZE, DEFAULT_TILE_CACHE_SIZE)
+
         # Whether we need to save or not.
         self.dirty = False
 
@@ -130,7 +172,13 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self.itemsToShapes = {}
         self.shapesToItems = {}
+        # 标签 -> 列表项集合, 用于按标签筛选
+        self.labelItems = defaultdict(set)
+        # 当前的标签筛选函数, None代表全部显示, 新增的标注同样按它筛选
+        self.labelFilter = None
         self.prevLabelText = ''
+        # 标注修改的撤销/重做日志, 切换图片时清空
+        self.undoJournal = UndoJournal()
 
         listLayout = QVBoxLayout()
         listLayout.setContentsMargins(0, 0, 0, 0)
@@ -175,6 +223,18 @@ class MainWindow(QMainWindow, WindowMixin):
         self.comboBox = ComboBox(self)
         listLayout.addWidget(self.comboBox)
 
+        # 当前图片的标签数量统计, 只在标签出现或消失时更新下拉框
+        self.labelHistogram = LabelHistogram(self)
+        self.labelHistogram.labelAdded.connect(self.comboBox.add_item)
+        self.labelHistogram.labelRemoved.connect(self.comboBox.remove_item)
+
+        # 标签筛选: 多个标签用逗号分隔, /.../ 为正则表达式
+        self.labelFilterLine = QLineEdit()
+        self.labelFilterLine.setPlaceholderText('筛选标签: 逗号分隔多个标签, /正则/')
+        self.labelFilterLine.setClearButtonEnabled(True)
+        self.labelFilterLine.textChanged.connect(self.labelFilterChanged)
+        listLayout.addWidget(self.labelFilterLine)
+
         # 添加自定义的商品信息展示表格
         self.productInfo = QListWidget()
         self.productInfo.doubleClicked.connect(self.product_item_double_clicked)
@@ -182,6 +242,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # Create and add a widget for showing current label items
         self.labelList = QListWidget()
+        self.labelList.setSelectionMode(QAbstractItemView.ExtendedSelection)
         labelListContainer = QWidget()
         labelListContainer.setLayout(listLayout)
         self.labelList.itemActivated.connect(self.labelSelectionChanged)
@@ -195,17 +256,27 @@ class MainWindow(QMainWindow, WindowMixin):
         self.dock.setObjectName(getStr('labels'))
         self.dock.setWidget(labelListContainer)
 
-        self.fileListWidget = QListWidget()
-        self.fileListWidget.itemDoubleClicked.connect(self.fileitemDoubleClicked)
+        # 文件清单直接使用图片路径清单作为模型, 行内容按需生成
+        self.fileListModel = FileListModel(self.mImgList, self.fileAnnotationStatus, parent=self)
+        self.fileListView = QListView()
+        self.fileListView.setModel(self.fileListModel)
+        self.fileListView.setUniformItemSizes(True)
+        self.fileListView.setLayoutMode(QListView.Batched)
+        self.fileListView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.fileListView.doubleClicked.connect(self.fileitemDoubleClicked)
         filelistLayout = QVBoxLayout()
         filelistLayout.setContentsMargins(0, 0, 0, 0)
-        filelistLayout.addWidget(self.fileListWidget)
+        filelistLayout.addWidget(self.fileListView)
         fileListContainer = QWidget()
         fileListContainer.setLayout(filelistLayout)
         self.filedock = QDockWidget(getStr('fileList'), self)
         self.filedock.setObjectName(getStr('files'))
         self.filedock.setWidget(fileListContainer)
 
+        self.statsDock = QDockWidget('标注统计', self)
+        self.statsDock.setObjectName('labelStats')
+        self.statsDock.setWidget(LabelStatsWidget(self.labelHistogram))
+
         self.zoomWidget = ZoomWidget()
         self.colorDialog = ColorDialog(parent=self)
 
@@ -223,8 +294,13 @@ class MainWindow(QMainWindow, WindowMixin):
         self.scrollArea = scroll
         self.canvas.scrollRequest.connect(self.scrollRequest)
 
+        # 画布性能监视, 通过View菜单开启
+        self.perfMonitor = PerfMonitor(logInterval=300)
+        self.perfHud = PerfHud(self.perfMonitor, scroll)
+
         self.canvas.newShape.connect(self.newShape)
         self.canvas.shapeMoved.connect(self.setDirty)
+        self.canvas.shapesEdited.connect(self.shapesEdited)
         self.canvas.selectionChanged.connect(self.shapeSelectionChanged)
         self.canvas.drawingPolygon.connect(self.toggleDrawingSensitive)
         # 与画布的方法关联
@@ -238,6 +314,9 @@ class MainWindow(QMainWindow, WindowMixin):
         self.addDockWidget(Qt.RightDockWidgetArea, self.dock)
         self.addDockWidget(Qt.RightDockWidgetArea, self.filedock)
         self.filedock.setFeatures(QDockWidget.DockWidgetFloatable)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.statsDock)
+        self.tabifyDockWidget(self.filedock, self.statsDock)
+        self.filedock.raise_()
 
         self.dockFeatures = QDockWidget.DockWidgetClosable | QDockWidget.DockWidgetFloatable
         self.dock.setFeatures(self.dock.features() ^ self.dockFeatures)
@@ -298,6 +377,9 @@ class MainWindow(QMainWindow, WindowMixin):
         openPrevImg = action(getStr('prevImg'), self.openPrevImg,
                              'a', 'prev', getStr('prevImgDetail'))
 
+        jumpToDir = action('跳转到文件夹', self.jumpToDir,
+                           'Ctrl+G', 'open', '按序号跳转到指定文件夹的第一个图片')
+
         verify = action(getStr('verifyImg'), self.verifyImg,
                         'space', 'verify', getStr('verifyImgDetail'))
 
@@ -386,6 +468,11 @@ class MainWindow(QMainWindow, WindowMixin):
             self.MANUAL_ZOOM: lambda: 1,
         }
 
+        undo = action('撤销', self.undoEdit,
+                      'Ctrl+Z', 'undo', '撤销上一次标注修改', enabled=False)
+        redo = action('重做', self.redoEdit,
+                      'Ctrl+Y', 'redo', '重做撤销的标注修改', enabled=False)
+
         edit = action(getStr('editLabel'), self.editLabel,
                       'Ctrl+E', 'edit', getStr('editLabelDetail'),
                       enabled=False)
@@ -402,6 +489,8 @@ class MainWindow(QMainWindow, WindowMixin):
         labels.setText(getStr('showHide'))
         labels.setShortcut('Ctrl+Shift+L')
 
+        labelStats = self.statsDock.toggleViewAction()
+
         # Label list context menu.
         labelMenu = QMenu()
         addActions(labelMenu, (edit, delete, add_auto, add_auto_all))
@@ -419,6 +508,7 @@ class MainWindow(QMainWindow, WindowMixin):
         # Store actions for further handling.
         self.actions = struct(save=save, save_format=save_format, saveAs=saveAs, open=open, close=close, resetAll=resetAll,
                               lineColor=color1, create=create, delete=delete, edit=edit, copy=copy,
+                              undo=undo, redo=redo,
                               createMode=createMode, editMode=editMode, advancedMode=advancedMode,
                               shapeLineColor=shapeLineColor, shapeFillColor=shapeFillColor,
                               zoom=zoom, zoomIn=zoomIn, zoomOut=zoomOut, zoomOrg=zoomOrg,
@@ -427,7 +517,7 @@ class MainWindow(QMainWindow, WindowMixin):
                               fileMenuActions=(
                                   open, opendir, save, saveAs, close, resetAll, quit),
                               beginner=(), advanced=(),
-                              editMenu=(edit, copy, delete,
+                              editMenu=(undo, redo, None, edit, copy, delete,
                                         None, color1, self.drawSquaresOption),
                               beginnerContext=(create, edit, copy, delete),
                               advancedContext=(createMode, editMode, edit, copy,
@@ -463,19 +553,27 @@ class MainWindow(QMainWindow, WindowMixin):
         self.displayLabelOption.setCheckable(True)
         self.displayLabelOption.setChecked(settings.get(SETTING_PAINT_LABEL, False))
         self.displayLabelOption.triggered.connect(self.togglePaintLabelsOption)
+        # 画布性能监视
+        self.perfMonitorOption = QAction('性能监视', self)
+        self.perfMonitorOption.setShortcut('Ctrl+Shift+M')
+        self.perfMonitorOption.setCheckable(True)
+        self.perfMonitorOption.triggered.connect(self.togglePerfMonitor)
+        exportPerfData = action('导出性能数据', self.exportPerfData,
+                                None, 'save', '将记录的画布绘制性能数据导出为CSV文件')
 
         # 添加子菜单
         addActions(self.menus.file,
-                   (open, opendir, changeSavedir, openAnnotation, self.menus.recentFiles, save, save_format, saveAs, close, resetAll, quit))
+                   (open, opendir, changeSavedir, openAnnotation, self.menus.recentFiles, jumpToDir, save, save_format, saveAs, close, resetAll, quit))
         addActions(self.menus.help, (help, showInfo))
         addActions(self.menus.view, (
             self.autoSaving,
             self.singleClassMode,
             self.displayLabelOption,
-            labels, advancedMode, None,
+            labels, labelStats, advancedMode, None,
             hideAll, showAll, None,
             zoomIn, zoomOut, zoomOrg, None,
-            fitWindow, fitWidth))
+            fitWindow, fitWidth, None,
+            self.perfMonitorOption, exportPerfData))
 
         # 扩展子菜单
         addActions(
@@ -512,6 +610,8 @@ class MainWindow(QMainWindow, WindowMixin):
 
         # Application state.
         self.image = QImage()
+        # 图片原始尺寸, self.image可能是缩小尺寸解码的结果
+        self.imageSize = QSize()
         self.filePath = ustr(defaultFilename)
         self.recentFiles = []
         self.maxRecent = 7
@@ -551,13 +651,11 @@ class MainWindow(QMainWindow, WindowMixin):
             self.statusBar().show()
 
         self.restoreState(settings.get(SETTING_WIN_STATE, QByteArray()))
-        Shape.line_color = self.lineColor = QColor(
+        Shape.default_line_color = self.lineColor = QColor(
             settings.get(SETTING_LINE_COLOR, DEFAULT_LINE_COLOR))
-        Shape.fill_color = self.fillColor = QColor(
+        Shape.default_fill_color = self.fillColor = QColor(
             settings.get(SETTING_FILL_COLOR, DEFAULT_FILL_COLOR))
         self.canvas.setDrawingColor(self.lineColor)
-        # Add chris
-        Shape.difficult = self.difficult
 
         def xbool(x):
             if isinstance(x, QVariant):
@@ -776,15 +874,21 @@ class MainWindow(QMainWindow, WindowMixin):
         self.statusBar().showMessage(message, delay)
 
     def resetState(self):
+        self.autoLabelWorker.cancel()
+        self.fullImageLoader.cancel()
         self.itemsToShapes.clear()
         self.shapesToItems.clear()
+        self.labelItems.clear()
         self.labelList.clear()
         self.filePath = None
         self.imageData = None
         self.labelFile = None
         self.canvas.resetState()
         self.labelCoordinates.clear()
-        self.comboBox.cb.clear()
+        self.labelHistogram.clear()
+        self.comboBox.update_items([''])
+        self.undoJournal.clear()
+        self.updateUndoActions()
 
     def currentItem(self):
         items = self.labelList.selectedItems()
@@ -820,8 +924,11 @@ class MainWindow(QMainWindow, WindowMixin):
         subprocess.Popen(self.screencastViewer + [self.screencast])
 
     def showInfoDialog(self):
-        msg = u'Name:{0} \nApp Version:{1} \n{2} '.format(
-            __appname__, __version__, sys.version_info)
+        cacheStats = self.imageCache.stats()
+        msg = u'Name:{0} \nApp Version:{1} \n{2} \nImage cache: {3} hits / {4} misses, {5:.1f} / {6:.1f} MB'.format(
+            __appname__, __version__, sys.version_info,
+            cacheStats['hits'], cacheStats['misses'],
+            cacheStats['bytes'] / 1048576.0, cacheStats['maxBytes'] / 1048576.0)
         QMessageBox.information(self, u'Information', msg)
 
     def createShape(self):
@@ -880,18 +987,63 @@ class MainWindow(QMainWindow, WindowMixin):
             return
         text = self.labelDialog.popUp(item.text())
         if text is not None:
-            item.setText(text)
-            item.setBackground(generateColorByText(text))
+            self.labelHist.use(text)
+            # 多选时所有选中的标注一起修改
+            shapes = self.canvas.selectedShapes or [self.itemsToShapes[item]]
+            _old = [(shape.label, shape.line_color) for shape in shapes]
+            self.labelList.blockSignals(True)
+            for shape in shapes:
+                _item = self.shapesToItems[shape]
+                self.labelRenamed(_item, shape.label, text)
+                _item.setText(text)
+                _item.setBackground(generateColorByText(text))
+                shape.label = text
+                shape.line_color = generateColorByText(text)
+            self.labelList.blockSignals(False)
+            self.recordUndo(RelabelCommand(
+                (shape.uid, old, (shape.label, shape.line_color)) for shape, old in zip(shapes, _old)
+            ))
+            self.canvas.updateShapes(*shapes)
             self.setDirty()
-            self.updateComboBox()
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def fileitemDoubleClicked(self, item=None):
-        currIndex = self.mImgList.index(ustr(item.text()))
-        if currIndex < len(self.mImgList):
-            filename = self.mImgList[currIndex]
-            if filename:
-                self.loadFile(filename)
+    def fileitemDoubleClicked(self, index=None):
+        filename = self.fileListModel.pathAt(index.row())
+        if filename:
+            self.loadFile(filename)
+
+    def fileAnnotationStatus(self, filePath):
+        """
+        获取图片的标注状态, 供文件清单显示使用
+
+        @param {str} filePath - 图片路径
+
+        @returns {int} - STATUS_NONE/STATUS_ANNOTATED/STATUS_VERIFIED
+        """
+        if self.indexReconciled:
+            record = self.datasetIndex.get(filePath)
+            if record is not None:
+                if record['format'] is None:
+                    return STATUS_NONE
+                return STATUS_VERIFIED if record['verified'] else STATUS_ANNOTATED
+
+        if self.defaultSaveDir is not None:
+            basename = os.path.join(self.defaultSaveDir, os.path.basename(os.path.splitext(filePath)[0]))
+        else:
+            basename = os.path.splitext(filePath)[0]
+
+        xmlPath = basename + XML_EXT
+        if os.path.isfile(xmlPath):
+            # verified属性写在annotation节点上, 只需读取文件头
+            try:
+                with open(xmlPath, 'rb') as f:
+                    head = f.read(256)
+            except (IOError, OSError):
+                head = b''
+            return STATUS_VERIFIED if b'verified="yes"' in head else STATUS_ANNOTATED
+        elif os.path.isfile(basename + TXT_EXT):
+            return STATUS_ANNOTATED
+        return STATUS_NONE
 
     # Add chris
     def btnstate(self, item=None):
@@ -925,11 +1077,11 @@ class MainWindow(QMainWindow, WindowMixin):
         if self._noSelectionSlot:
             self._noSelectionSlot = False
         else:
-            shape = self.canvas.selectedShape
-            if shape:
+            self.labelList.blockSignals(True)
+            self.labelList.clearSelection()
+            for shape in self.canvas.selectedShapes:
                 self.shapesToItems[shape].setSelected(True)
-            else:
-                self.labelList.clearSelection()
+            self.labelList.blockSignals(False)
         self.actions.delete.setEnabled(selected)
         self.actions.copy.setEnabled(selected)
         self.actions.edit.setEnabled(selected)
@@ -937,67 +1089,124 @@ class MainWindow(QMainWindow, WindowMixin):
         self.actions.shapeFillColor.setEnabled(selected)
 
     def addLabel(self, shape):
-        shape.paintLabel = self.displayLabelOption.isChecked()
-        item = HashableQListWidgetItem(shape.label)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked)
-        item.setBackground(generateColorByText(shape.label))
-        self.itemsToShapes[item] = shape
-        self.shapesToItems[shape] = item
-        self.labelList.addItem(item)
+        self.addLabels([shape])
+
+    def addLabels(self, shapes, rows=None):
+        """
+        为多个标注添加列表项并按当前筛选设置显示, 列表只刷新一次
+
+        @param {list} shapes - 标注清单
+        @param {list} rows=None - 各标注插入的行号(升序), 不传则添加到末尾
+        """
+        if not shapes:
+            return
+        self.labelList.blockSignals(True)
+        self.labelList.setUpdatesEnabled(False)
+        _paintLabel = self.displayLabelOption.isChecked()
+        for _i, shape in enumerate(shapes):
+            shape.paintLabel = _paintLabel
+            item = HashableQListWidgetItem(shape.label)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            item.setBackground(generateColorByText(shape.label))
+            self.itemsToShapes[item] = shape
+            self.shapesToItems[shape] = item
+            self.labelItems[shape.label].add(item)
+            if rows is None:
+                self.labelList.addItem(item)
+            else:
+                self.labelList.insertItem(rows[_i], item)
+        self.labelList.setUpdatesEnabled(True)
+        self.labelList.blockSignals(False)
+        self.labelHistogram.addAll([shape.label for shape in shapes])
+        if self.labelFilter is not None:
+            self.setItemsVisible([(self.shapesToItems[shape], bool(self.labelFilter(shape.label)))
+                                  for shape in shapes])
         for action in self.actions.onShapesPresent:
             action.setEnabled(True)
-        self.updateComboBox()
 
     def remLabel(self, shape):
         if shape is None:
             # print('rm empty label')
             return
-        item = self.shapesToItems[shape]
-        self.labelList.takeItem(self.labelList.row(item))
-        del self.shapesToItems[shape]
-        del self.itemsToShapes[item]
-        self.updateComboBox()
+        self.remLabels([shape])
+
+    def remLabels(self, shapes):
+        """
+        删除多个标注对应的列表项, 列表只刷新一次
+
+        @param {list} shapes - 标注清单
+        """
+        if not shapes:
+            return
+        self.labelList.blockSignals(True)
+        for shape in shapes:
+            item = self.shapesToItems.pop(shape)
+            del self.itemsToShapes[item]
+            self.unindexLabelItem(item, shape.label)
+            self.labelList.takeItem(self.labelList.row(item))
+            self.labelHistogram.remove(shape.label)
+        self.labelList.blockSignals(False)
+
+    def loadLabels(self, shapes, append=False):
+        """
+        批量加载标注: 先创建所有形状, 一次性修正超出图片的坐标,
+        再批量添加列表项, 最后只刷新一次画布
 
-    def loadLabels(self, shapes):
+        @param {list} shapes - (标签, 坐标清单, 线条颜色, 填充颜色, 是否困难)清单
+        @param {bool} append=False - 是否追加到画布已有的形状之后
+        """
         s = []
         for label, points, line_color, fill_color, difficult in shapes:
             shape = Shape(label=label)
-            for x, y in points:
-
-                # Ensure the labels are within the bounds of the image. If not, fix them.
-                x, y, snapped = self.canvas.snapPointToCanvas(x, y)
-                if snapped:
-                    self.setDirty()
-
-                shape.addPoint(QPointF(x, y))
+            # 与addPoint一致, 最多保留4个点
+            shape.setCoords(coordsOf(points)[:4])
             shape.difficult = difficult
             shape.close()
             s.append(shape)
 
-            if line_color:
-                shape.line_color = QColor(*line_color)
-            else:
-                shape.line_color = generateColorByText(label)
+            shape.line_color = QColor(*line_color) if line_color else generateColorByText(label)
+            shape.fill_color = QColor(*fill_color) if fill_color else generateColorByText(label)
 
-            if fill_color:
-                shape.fill_color = QColor(*fill_color)
-            else:
-                shape.fill_color = generateColorByText(label)
+        # Ensure the labels are within the bounds of the image. If not, fix them.
+        if self.canvas.clampShapes(s):
+            self.setDirty()
 
-            self.addLabel(shape)
-        self.updateComboBox()
-        self.canvas.loadShapes(s)
+        self.addLabels(s)
+        if append:
+            self.canvas.addShapes(s)
+        else:
+            self.canvas.loadShapes(s)
 
-    def updateComboBox(self):
-        # Get the unique labels and add them to the Combobox.
-        itemsTextList = [str(self.labelList.item(i).text()) for i in range(self.labelList.count())]
+    def requestAutoLabel(self, shapes):
+        """
+        提交当前图片的后台自动标注请求
 
-        uniqueTextList = list(set(itemsTextList))
-        # Add a null row for showing all the labels
-        uniqueTextList.append("")
-        uniqueTextList.sort()
+        @param {list} shapes - 已有的标注形状
+        """
+        if self.autoLabelWorker.request(self.filePath, shapes) is not None:
+            self.status('Auto labeling %s ...' % os.path.basename(self.filePath))
 
+    def autoLabelDetected(self, token, filePath, shapes):
+        """
+        后台自动标注完成, 将auto_开头的形状添加到画布
+        如果已切换到其他图片则丢弃结果
+
+        @param {int} token - 请求令牌
+        @param {str} filePath - 识别的图片路径
+        @param {list} shapes - 识别出的形状
+        """
+        if not self.autoLabelWorker.isCurrent(token) or filePath != self.filePath:
+            return
+
+        if shapes:
+            self.loadLabels(shapes, append=True)
+        self.status('Auto labeled %d objects in %s' % (len(shapes), os.path.basename(filePath)))
+
+    def updateComboBox(self):
+        # 按标签统计完整重建下拉框, 日常的增删改由labelHistogram的信号增量更新
+        # Add a null row for showing all the labels
+        uniqueTextList = [''] + [label for label in self.labelHistogram.labels() if label]
         self.comboBox.update_items(uniqueTextList)
 
     def saveLabels(self, annotationFilePath):
@@ -1021,18 +1230,23 @@ class MainWindow(QMainWindow, WindowMixin):
             if not shape.label.startswith('auto_'):
                 shapes.append(format_shape(shape))
 
+        # 使用已解码图片的尺寸, 保存时不再重新解码图片
+        imageShape = LabelFile.imageShapeOf(self.image, self.imageSize)
+
         # Can add differrent annotation formats here
         try:
             if self.usingPascalVocFormat is True:
                 if annotationFilePath[-4:].lower() != ".xml":
                     annotationFilePath += XML_EXT
                 self.labelFile.savePascalVocFormat(annotationFilePath, shapes, self.filePath, self.imageData,
-                                                   self.lineColor.getRgb(), self.fillColor.getRgb())
+                                                   self.lineColor.getRgb(), self.fillColor.getRgb(),
+                                                   imageShape=imageShape)
             elif self.usingYoloFormat is True:
                 if annotationFilePath[-4:].lower() != ".txt":
                     annotationFilePath += TXT_EXT
                 self.labelFile.saveYoloFormat(annotationFilePath, shapes, self.filePath, self.imageData, self.labelHist,
-                                              self.lineColor.getRgb(), self.fillColor.getRgb())
+                                              self.lineColor.getRgb(), self.fillColor.getRgb(),
+                                              imageShape=imageShape)
             else:
                 self.labelFile.save(annotationFilePath, shapes, self.filePath, self.imageData,
                                     self.lineColor.getRgb(), self.fillColor.getRgb())
@@ -1043,35 +1257,99 @@ class MainWindow(QMainWindow, WindowMixin):
             return False
 
     def copySelectedShape(self):
-        self.addLabel(self.canvas.copySelectedShape())
+        shape = self.canvas.copySelectedShape()
+        if shape is None:
+            return
+        self.addLabel(shape)
+        self.recordUndo(CreateCommand([(len(self.canvas.shapes) - 1, shape)]))
         # fix copy and delete
         self.shapeSelectionChanged(True)
 
     def comboSelectionChanged(self, index):
         text = self.comboBox.cb.itemText(index)
-        for i in range(self.labelList.count()):
-            if text == "":
-                self.labelList.item(i).setCheckState(2)
-            elif text != self.labelList.item(i).text():
-                self.labelList.item(i).setCheckState(0)
-            else:
-                self.labelList.item(i).setCheckState(2)
+        if text == "":
+            self.filterLabels(None)
+        else:
+            self.filterLabels(lambda label: label == text)
+
+    def labelFilterChanged(self, text):
+        """
+        筛选框内容变化, 按多个标签或正则表达式筛选显示的标注
+
+        @param {str} text - 筛选内容, 见labelMatcher
+        """
+        try:
+            _matcher = labelMatcher(text)
+        except re.error as e:
+            self.status('正则表达式错误: %s' % e)
+            return
+        self.filterLabels(_matcher)
+
+    def filterLabels(self, matcher):
+        """
+        按标签筛选显示的标注, 只对每个标签判断一次
+
+        @param {function} matcher - 判断标签是否显示的函数, 为None代表全部显示
+        """
+        self.labelFilter = matcher
+        _changes = []
+        for _label, _items in self.labelItems.items():
+            _visible = matcher is None or bool(matcher(_label))
+            _changes.extend((_item, _visible) for _item in _items)
+        self.setItemsVisible(_changes)
+
+    def setItemsVisible(self, changes):
+        """
+        批量设置列表项勾选状态及对应标注的显示, 画布只刷新一次
+
+        @param {list} changes - (列表项, 是否显示)清单
+        """
+        _visibility = {}
+        self.labelList.blockSignals(True)
+        for _item, _visible in changes:
+            _state = Qt.Checked if _visible else Qt.Unchecked
+            if _item.checkState() != _state:
+                _item.setCheckState(_state)
+            _visibility[self.itemsToShapes[_item]] = _visible
+        self.labelList.blockSignals(False)
+        self.canvas.setShapesVisible(_visibility)
+
+    def labelRenamed(self, item, old, new):
+        """
+        列表项的标签由old改为new, 更新标签统计及筛选索引
+
+        @param {QListWidgetItem} item - 列表项
+        @param {str} old - 原标签
+        @param {str} new - 新标签
+        """
+        self.labelHistogram.rename(old, new)
+        self.unindexLabelItem(item, old)
+        self.labelItems[new].add(item)
+
+    def unindexLabelItem(self, item, label):
+        _items = self.labelItems.get(label, None)
+        if _items is not None:
+            _items.discard(item)
+            if not _items:
+                del self.labelItems[label]
 
     def labelSelectionChanged(self):
-        item = self.currentItem()
-        if item and self.canvas.editing():
+        items = self.labelList.selectedItems()
+        if items and self.canvas.editing():
             self._noSelectionSlot = True
-            self.canvas.selectShape(self.itemsToShapes[item])
-            shape = self.itemsToShapes[item]
+            shapes = [self.itemsToShapes[item] for item in items]
+            self.canvas.selectShapes(shapes)
             # Add Chris
-            self.diffcButton.setChecked(shape.difficult)
+            self.diffcButton.setChecked(shapes[0].difficult)
 
     def labelItemChanged(self, item):
         shape = self.itemsToShapes[item]
         label = item.text()
         if label != shape.label:
+            self.labelRenamed(item, shape.label, label)
             shape.label = item.text()
             shape.line_color = generateColorByText(shape.label)
+            self.canvas.updateShapes(shape)
             self.setDirty()
         else:  # User probably changed item visibility
             self.canvas.setShapeVisible(shape, item.checkState() == Qt.Checked)
@@ -1083,10 +1361,6 @@ class MainWindow(QMainWindow, WindowMixin):
         position MUST be in global coordinates.
         """
         if not self.useDefaultLabelCheckbox.isChecked() or not self.defaultLabelTextLine.text():
-            if len(self.labelHist) > 0:
-                self.labelDialog = LabelDialog(
-                    parent=self, listItem=self.labelHist)
-
             # Sync single class mode from PR#106
             if self.singleClassMode.isChecked() and self.lastLabel:
                 text = self.lastLabel
@@ -1103,6 +1377,7 @@ class MainWindow(QMainWindow, WindowMixin):
             generate_color = generateColorByText(text)
             shape = self.canvas.setLastLabel(text, generate_color, generate_color)
             self.addLabel(shape)
+            self.recordUndo(CreateCommand([(len(self.canvas.shapes) - 1, shape)]))
             if self.beginner():  # Switch to edit mode.
                 self.canvas.setEditing(True)
                 self.actions.create.setEnabled(True)
@@ -1110,8 +1385,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 self.actions.editMode.setEnabled(True)
             self.setDirty()
 
-            if text not in self.labelHist:
-                self.labelHist.append(text)
+            self.labelHist.use(text)
         else:
             # self.canvas.undoLastLine()
             self.canvas.resetAllLines()
@@ -1195,8 +1469,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.adjustScale()
 
     def togglePolygons(self, value):
-        for item, shape in self.itemsToShapes.items():
-            item.setCheckState(Qt.Checked if value else Qt.Unchecked)
+        self.setItemsVisible([(item, value) for item in self.itemsToShapes])
 
     def loadFile(self, filePath=None):
         """Load the specified file, or the last opened file if None."""
@@ -1218,16 +1491,16 @@ class MainWindow(QMainWindow, WindowMixin):
         unicodeFilePath = os.path.abspath(unicodeFilePath)
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
-        if unicodeFilePath and self.fileListWidget.count() > 0:
-            if unicodeFilePath in self.mImgList:
-                index = self.mImgList.index(unicodeFilePath)
-                fileWidgetItem = self.fileListWidget.item(index)
-                fileWidgetItem.setSelected(True)
+        if unicodeFilePath and len(self.mImgList) > 0:
+            index = self.mImgList.setCurrent(unicodeFilePath)
+            if index >= 0:
+                self.fileListView.setCurrentIndex(self.fileListModel.index(index))
             else:
-                self.fileListWidget.clear()
-                self.mImgList.clear()
+                self.fileListModel.clear()
 
         if unicodeFilePath and os.path.exists(unicodeFilePath):
+            image = None
+            imageSize = None
             if LabelFile.isLabelFile(unicodeFilePath):
                 try:
                     self.labelFile = LabelFile(unicodeFilePath)
@@ -1245,11 +1518,19 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 # Load image:
                 # read data first and store for saving into label file.
-                self.imageData = read(unicodeFilePath, None)
+                # 优先使用预读缓存中已解码的图片
+                cached = self.imageCache.get(unicodeFilePath)
+                if cached is not None:
+                    self.imageData, image, imageSize = cached
+                else:
+                    self.imageData = read(unicodeFilePath, None)
                 self.labelFile = None
                 self.canvas.verified = False
 
-            image = QImage.fromData(self.imageData)
+            if image is None:
+                image, imageSize = decodeImageData(self.imageData, self.decodeSize())
+                if not image.isNull() and self.labelFile is None:
+                    self.imageCache.put(unicodeFilePath, self.imageData, image, imageSize=imageSize)
             if image.isNull():
                 self.errorMessage(u'Error opening file',
                                   u"<p>Make sure <i>%s</i> is a valid image file." % unicodeFilePath)
@@ -1257,8 +1538,15 @@ class MainWindow(QMainWindow, WindowMixin):
                 return False
             self.status("Loaded %s" % os.path.basename(unicodeFilePath))
             self.image = image
+            self.imageSize = imageSize
             self.filePath = unicodeFilePath
-            self.canvas.loadPixmap(QPixmap.fromImage(image))
+            self.canvas.loadPixmap(QPixmap.fromImage(image), imageSize)
+            if imageSize.width() * imageSize.height() > TILED_IMAGE_PIXELS:
+                # 超大图片放大时只按分块加载可见区域, 不加载完整原图
+                tiledImage = TiledImage(unicodeFilePath, imageSize, image.size(), cacheRoot=self.tileCacheDir,
+                                        cacheSize=self.tileCacheSize, parent=self)
+                tiledImage.failed.connect(self.status)
+                self.canvas.setTiledImage(tiledImage)
             if self.labelFile:
                 self.loadLabels(self.labelFile.shapes)
             self.setClean()
@@ -1284,10 +1572,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 elif os.path.isfile(txtPath):
                     self.loadYOLOTXTByFilename(txtPath)
                 else:
-                    shapes = self.auto_label_tool.detect_object(
-                        self.filePath, []
-                    )
-                    self.loadLabels(shapes)
+                    self.requestAutoLabel([])
             else:
                 xmlPath = os.path.splitext(filePath)[0] + XML_EXT
                 txtPath = os.path.splitext(filePath)[0] + TXT_EXT
@@ -1296,10 +1581,7 @@ class MainWindow(QMainWindow, WindowMixin):
                 elif os.path.isfile(txtPath):
                     self.loadYOLOTXTByFilename(txtPath)
                 else:
-                    shapes = self.auto_label_tool.detect_object(
-                        self.filePath, [],
-                    )
-                    self.loadLabels(shapes)
+                    self.requestAutoLabel([])
 
             self.setWindowTitle(__appname__ + ' ' + filePath)
 
@@ -1318,9 +1600,22 @@ class MainWindow(QMainWindow, WindowMixin):
                 # self.labelList.item(self.labelList.count() - 1).setSelected(True)
 
             self.canvas.setFocus(True)
+            self.prefetchNeighbours()
             return True
         return False
 
+    def prefetchNeighbours(self):
+        """
+        在后台预读当前图片前后的图片
+        """
+        currIndex = self.mImgList.current
+        if self.filePath is None or currIndex < 0:
+            return
+
+        paths = self.mImgList[currIndex + 1:currIndex + 1 + self.prefetchNext]
+        paths.extend(reversed(self.mImgList[max(0, currIndex - self.prefetchPrev):currIndex]))
+        self.imagePrefetcher.prefetch(paths)
+
     def resizeEvent(self, event):
         if self.canvas and not self.image.isNull()\
            and self.zoomMode != self.MANUAL_ZOOM:
@@ -1332,6 +1627,36 @@ class MainWindow(QMainWindow, WindowMixin):
         self.canvas.scale = 0.01 * self.zoomWidget.value()
         self.canvas.adjustSize()
         self.canvas.update()
+        self.loadFullImageIfNeeded()
+
+    def decodeSize(self):
+        """
+        获取图片首次解码的最大尺寸, 即屏幕的物理分辨率
+
+        @returns {QSize} - 解码的最大尺寸
+        """
+        size = QApplication.desktop().screenGeometry(self).size()
+        if hasattr(self, 'devicePixelRatioF'):
+            size = size * self.devicePixelRatioF()
+        return size
+
+    def loadFullImageIfNeeded(self):
+        """
+        缩小解码的图片放大显示超过阈值时, 在后台加载原始尺寸的图片
+        """
+        if self.filePath is None or self.image.size() == self.imageSize or self.canvas.tiledImage is not None:
+            return
+
+        if self.canvas.scale * self.imageSize.width() > self.image.width() * FULL_IMAGE_ZOOM_THRESHOLD:
+            self.fullImageLoader.request(self.filePath)
+
+    def fullImageLoaded(self, filePath, image):
+        if image is None or filePath != self.filePath or image.size() != self.imageSize:
+            # 已切换到其它图片
+            return
+
+        self.image = image
+        self.canvas.setDisplayPixmap(QPixmap.fromImage(image))
 
     def adjustScale(self, initial=False):
         value = self.scalers[self.FIT_WINDOW if initial else self.zoomMode]()
@@ -1344,19 +1669,27 @@ class MainWindow(QMainWindow, WindowMixin):
         h1 = self.centralWidget().height() - e
         a1 = w1 / h1
         # Calculate a new scale value based on the pixmap's aspect ratio.
-        w2 = self.canvas.pixmap.width() - 0.0
-        h2 = self.canvas.pixmap.height() - 0.0
+        w2 = self.canvas.imageSize.width() - 0.0
+        h2 = self.canvas.imageSize.height() - 0.0
         a2 = w2 / h2
         return w1 / w2 if a2 >= a1 else h1 / h2
 
     def scaleFitWidth(self):
         # The epsilon does not seem to work too well here.
         w = self.centralWidget().width() - 2.0
-        return w / self.canvas.pixmap.width()
+        return w / self.canvas.imageSize.width()
 
     def closeEvent(self, event):
         if not self.mayContinue():
             event.ignore()
+            # 取消关闭时保持后台任务及数据集索引继续工作
+            return
+        self.imagePrefetcher.shutdown()
+        self.fullImageLoader.shutdown()
+        self.autoLabelWorker.shutdown()
+        self.stopDirScan(wait=True)
+        self.closeDatasetIndex()
+        self.saveLabelPalette()
         settings = self.settings
         # If it loads images from dir, don't load it at the begining
         if self.dirname is None:
@@ -1385,25 +1718,23 @@ class MainWindow(QMainWindow, WindowMixin):
         settings[SETTING_SINGLE_CLASS] = self.singleClassMode.isChecked()
         settings[SETTING_PAINT_LABEL] = self.displayLabelOption.isChecked()
         settings[SETTING_DRAW_SQUARE] = self.drawSquaresOption.isChecked()
+        settings[SETTING_IMAGE_CACHE_SIZE] = self.imageCache.maxBytes // (1024 * 1024)
+        settings[SETTING_PREFETCH_NEXT] = self.prefetchNext
+        settings[SETTING_PREFETCH_PREV] = self.prefetchPrev
+        settings[SETTING_TILE_CACHE_DIR] = self.tileCacheDir or ''
+        settings[SETTING_TILE_CACHE_SIZE] = self.tileCacheSize
         settings.save()
 
     def loadRecent(self, filename):
         if self.mayContinue():
             self.loadFile(filename)
 
+    def imageExtensions(self):
+        return tuple('.%s' % fmt.data().decode("ascii").lower()
+                     for fmt in QImageReader.supportedImageFormats())
+
     def scanAllImages(self, folderPath):
-        extensions = ['.%s' % fmt.data().decode("ascii").lower()
-                      for fmt in QImageReader.supportedImageFormats()]
-        images = []
-
-        for root, dirs, files in os.walk(folderPath):
-            for file in files:
-                if file.lower().endswith(tuple(extensions)):
-                    relativePath = os.path.join(root, file)
-                    path = ustr(os.path.abspath(relativePath))
-                    images.append(path)
-        natural_sort(images, key=lambda x: x.lower())
-        return images
+        return list(iterImageFiles(folderPath, self.imageExtensions()))
 
     def changeSavedirDialog(self, _value=False):
         if self.defaultSaveDir is not None:
@@ -1417,6 +1748,8 @@ class MainWindow(QMainWindow, WindowMixin):
 
         if dirpath is not None and len(dirpath) > 1:
             self.defaultSaveDir = dirpath
+            self.fileListModel.refreshStatus()
+            self.reconcileDatasetIndex()
 
         self.statusBar().showMessage('%s . Annotation will be saved to %s' %
                                      ('Change saved folder', self.defaultSaveDir))
@@ -1462,14 +1795,143 @@ class MainWindow(QMainWindow, WindowMixin):
             return
 
         self.lastOpenDir = dirpath
+        self.saveLabelPalette()
         self.dirname = dirpath
         self.filePath = None
-        self.fileListWidget.clear()
-        self.mImgList = self.scanAllImages(dirpath)
-        self.openNextImg()
-        for imgPath in self.mImgList:
-            item = QListWidgetItem(imgPath)
-            self.fileListWidget.addItem(item)
+        self.fileListModel.clear()
+        LABEL_PALETTE.load(os.path.join(dirpath, PALETTE_FILE_NAME))
+
+        # 有索引时直接使用上次的图片清单, 扫描结果在完成后再核对
+        self.stopDirScan()
+        self.openDatasetIndex(dirpath)
+        self.scanBuffer = None
+        if self.datasetIndex is not None:
+            indexed = self.datasetIndex.paths()
+            if indexed:
+                self.scanBuffer = []
+                self.fileListModel.appendPaths(indexed)
+                self.openNextImg()
+
+        # 在后台线程扫描目录, 找到的图片分批加入文件清单
+        self.dirScanner = DirScanner(dirpath, self.imageExtensions(), parent=self)
+        self.dirScanner.imagesFound.connect(self.dirImagesFound)
+        self.dirScanner.scanFinished.connect(self.dirScanFinished)
+        self.dirScanner.finished.connect(self.dirScanner.deleteLater)
+        self.dirScanner.start()
+        self.status('Scanning %s ...' % dirpath, 0)
+
+    def stopDirScan(self, wait=False):
+        """
+        停止正在进行的目录扫描
+
+        @param {bool} wait=False - 是否等待扫描线程结束
+        """
+        if self.dirScanner is not None:
+            self.dirScanner.stop()
+            if wait:
+                self.dirScanner.wait()
+            self.dirScanner = None
+        self.scanBuffer = None
+
+    def dirImagesFound(self, paths):
+        """
+        目录扫描找到一批图片, 加入文件清单, 找到第一张图片时马上打开
+
+        @param {list} paths - 本批次找到的图片路径
+        """
+        if self.dirScanner is None or self.sender() is not self.dirScanner:
+            # 已被取消的扫描
+            return
+
+        if self.scanBuffer is not None:
+            self.scanBuffer.extend(paths)
+            return
+
+        openFirst = len(self.mImgList) == 0 and self.filePath is None
+        self.fileListModel.appendPaths(paths)
+
+        if openFirst:
+            self.openNextImg()
+
+    def dirScanFinished(self, total):
+        if self.dirScanner is None or self.sender() is not self.dirScanner:
+            return
+
+        self.dirScanner = None
+        if self.scanBuffer is not None:
+            paths, self.scanBuffer = self.scanBuffer, None
+            if paths != list(self.mImgList):
+                # 索引中的清单已过期, 替换为扫描结果
+                filePath = self.filePath
+                self.fileListModel.clear()
+                self.fileListModel.appendPaths(paths)
+                if filePath is not None and filePath in self.mImgList:
+                    self.mImgList.setCurrent(filePath)
+                    self.fileListView.setCurrentIndex(self.fileListModel.index(self.mImgList.current))
+                elif filePath is None:
+                    self.openNextImg()
+        self.status('Found %d images in %s' % (total, self.dirname))
+        self.reconcileDatasetIndex()
+
+    def openDatasetIndex(self, dirpath):
+        """
+        打开数据集目录对应的索引, 索引文件无法创建时不使用索引
+
+        @param {str} dirpath - 数据集目录
+        """
+        self.closeDatasetIndex()
+        try:
+            self.datasetIndex = DatasetIndex(dirpath)
+        except sqlite3.Error:
+            self.datasetIndex = None
+
+    def saveLabelPalette(self):
+        """
+        将标签颜色表保存到当前打开的图片目录, 目录不可写时忽略
+        """
+        if self.dirname is None:
+            return
+        try:
+            LABEL_PALETTE.save(os.path.join(self.dirname, PALETTE_FILE_NAME))
+        except (IOError, OSError):
+            pass
+
+    def closeDatasetIndex(self):
+        self.stopIndexReconcile()
+        if self.datasetIndex is not None:
+            self.datasetIndex.close()
+            self.datasetIndex = None
+
+    def stopIndexReconcile(self):
+        self.indexReconciled = False
+        if self.indexReconciler is not None:
+            self.indexReconciler.stop()
+            self.indexReconciler.wait()
+            self.indexReconciler = None
+
+    def reconcileDatasetIndex(self):
+        """
+        在后台线程按文件修改时间增量更新数据集索引
+        """
+        self.stopIndexReconcile()
+        if self.datasetIndex is None or self.dirScanner is not None:
+            return
+
+        self.indexReconciler = IndexReconciler(
+            self.datasetIndex, list(self.mImgList), self.defaultSaveDir, parent=self)
+        self.indexReconciler.reconciled.connect(self.datasetIndexReconciled)
+        self.indexReconciler.finished.connect(self.indexReconciler.deleteLater)
+        self.indexReconciler.start()
+
+    def datasetIndexReconciled(self, updated, removed):
+        if self.indexReconciler is None or self.sender() is not self.indexReconciler:
+            return
+
+        self.indexReconciler = None
+        self.indexReconciled = True
+        if updated or removed:
+            self.fileListModel.refreshStatus()
+        self.status('Dataset index updated: %d changed, %d removed' % (updated, removed))
 
     def verifyImg(self, _value=False):
         # Proceding next image without dialog if having any label
@@ -1511,11 +1973,9 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.filePath is None:
             return
 
-        currIndex = self.mImgList.index(self.filePath)
-        if currIndex - 1 >= 0:
-            filename = self.mImgList[currIndex - 1]
-            if filename:
-                self.loadFile(filename)
+        filename = self.mImgList.prevPath()
+        if filename:
+            self.loadFile(filename)
 
     def openNextImg(self, _value=False):
         # Proceding prev image without dialog if having any label
@@ -1539,9 +1999,7 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.filePath is None:
             filename = self.mImgList[0]
         else:
-            currIndex = self.mImgList.index(self.filePath)
-            if currIndex + 1 < len(self.mImgList):
-                filename = self.mImgList[currIndex + 1]
+            filename = self.mImgList.nextPath()
 
         if filename:
             self.loadFile(filename)
@@ -1812,8 +2270,13 @@ class MainWindow(QMainWindow, WindowMixin):
 
         timer = QtCore.QTimer(pd)
 
+        # 标注文件与图片同目录且索引已更新时, 直接从索引统计
+        _index = None
+        if self.indexReconciled and self.defaultSaveDir is None and self.datasetIndex.contains(_deal_dir):
+            _index = self.datasetIndex
+
         _iter_list = TFRecordCreater.labelimg_flags_count(
-            _deal_dir, self.mapping
+            _deal_dir, self.mapping, index=_index
         )
 
         RunTool.set_global_var(
@@ -2177,7 +2640,6 @@ class MainWindow(QMainWindow, WindowMixin):
                     return
 
             _file = self.filePath
-            _row = self.fileListWidget.currentRow()
 
             # 转到下一个图片
             self.openNextImg()
@@ -2188,11 +2650,13 @@ class MainWindow(QMainWindow, WindowMixin):
                 if _file == self.filePath:
                     self.closeFile()
 
-            # 从列表清单中删除_row
-            self.mImgList.remove(_file)
-            self.fileListWidget.takeItem(_row)
+            # 从列表清单中删除
+            self.fileListModel.removePath(_file)
 
             # 开始执行删除文件操作
+            self.imageCache.remove(_file)
+            if self.datasetIndex is not None:
+                self.datasetIndex.remove(_file)
             FileTool.remove_file(_file)
 
             # 提示
@@ -2219,22 +2683,10 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.filePath is None:
             filename = self.mImgList[0]
         else:
-            currIndex = self.mImgList.index(self.filePath)
-            _path = os.path.split(self.filePath)[0]
-            _is_found = False
-            while currIndex > 0:
-                currIndex -= 1
-                if _is_found:
-                    # 已找到，只是需要找第一个
-                    if os.path.split(self.mImgList[currIndex])[0] != _path:
-                        currIndex += 1
-                        filename = self.mImgList[currIndex]
-                        break
-                else:
-                    if os.path.split(self.mImgList[currIndex])[0] != _path:
-                        # 找到了上一个文件夹, 设置标签，还要继续循环找第一个
-                        _path = os.path.split(self.mImgList[currIndex])[0]
-                        _is_found = True
+            # 通过目录起始位置索引找到上一个文件夹的第一个图片
+            _index = self.mImgList.prevDirStart(self.mImgList.current)
+            if _index >= 0:
+                filename = self.mImgList[_index]
 
         if filename:
             self.loadFile(filename)
@@ -2260,18 +2712,42 @@ class MainWindow(QMainWindow, WindowMixin):
         if self.filePath is None:
             filename = self.mImgList[0]
         else:
-            currIndex = self.mImgList.index(self.filePath)
-            _path = os.path.split(self.filePath)[0]
-            while currIndex < len(self.mImgList) - 1:
-                currIndex += 1
-                if os.path.split(self.mImgList[currIndex])[0] != _path:
-                    # 找到了下一个文件夹
-                    filename = self.mImgList[currIndex]
-                    break
+            # 通过目录起始位置索引找到下一个文件夹的第一个图片
+            _index = self.mImgList.nextDirStart(self.mImgList.current)
+            if _index >= 0:
+                filename = self.mImgList[_index]
 
         if filename:
             self.loadFile(filename)
 
+    def jumpToDir(self, _value=False):
+        """
+        跳转到指定序号的文件夹
+
+        @param {bool} _value=False - <description>
+        """
+        _count = self.mImgList.dirCount()
+        if _count <= 0:
+            return
+
+        _current = max(self.mImgList.dirIndex(self.mImgList.current), 0) + 1
+        _num, ok = QInputDialog.getInt(
+            self, "跳转到文件夹", "请输入文件夹序号(1-%d)：" % _count, _current, 1, _count)
+        if not ok:
+            return
+
+        # 切换前保存
+        if self.autoSaving.isChecked():
+            if self.dirty is True:
+                self.saveFile()
+
+        if not self.mayContinue():
+            return
+
+        _index = self.mImgList.dirStart(_num - 1)
+        if _index >= 0:
+            self.loadFile(self.mImgList[_index])
+
     def saveFileAs(self, _value=False):
         assert not self.image.isNull(), "cannot save empty image"
         self._saveFile(self.saveFileDialog())
@@ -2296,6 +2772,9 @@ class MainWindow(QMainWindow, WindowMixin):
 
     def _saveFile(self, annotationFilePath):
         if annotationFilePath and self.saveLabels(annotationFilePath):
+            if self.datasetIndex is not None and self.datasetIndex.contains(self.filePath):
+                self.datasetIndex.refresh(self.filePath, self.defaultSaveDir)
+            self.fileListModel.refreshStatus(self.filePath)
             self.setClean()
             self.statusBar().showMessage('Saved to  %s' % annotationFilePath)
             self.statusBar().show()
@@ -2335,13 +2814,17 @@ class MainWindow(QMainWindow, WindowMixin):
                                           default=DEFAULT_LINE_COLOR)
         if color:
             self.lineColor = color
-            Shape.line_color = color
+            Shape.default_line_color = color
             self.canvas.setDrawingColor(color)
             self.canvas.update()
             self.setDirty()
 
     def deleteSelectedShape(self):
-        self.remLabel(self.canvas.deleteSelected())
+        _positions = dict((shape, _i) for _i, shape in enumerate(self.canvas.shapes))
+        shapes = self.canvas.deleteSelected()
+        if shapes:
+            self.recordUndo(DeleteCommand((_positions[shape], shape) for shape in shapes))
+        self.remLabels(shapes)
         self.setDirty()
         if self.noShapes():
             for action in self.actions.onShapesPresent:
@@ -2358,29 +2841,33 @@ class MainWindow(QMainWindow, WindowMixin):
 
         _label = item.text()
         if _label.startswith('auto_'):
+            _shape = self.itemsToShapes[item]
+            _old = (_shape.label, _shape.line_color)
             _label = _label[_label.find('_', 5) + 1:]
             item.setText(_label)
             item.setBackground(generateColorByText(_label))
+            self.recordUndo(RelabelCommand([(_shape.uid, _old, (_shape.label, _shape.line_color))]))
             self.setDirty()
-            self.updateComboBox()
 
     def addAllSelectedAutoShape(self):
         """
         将所有勾选的自动批注设置为正式批注
         """
-        _is_change = False
+        _changes = []
         for i in range(self.labelList.count()):
             item = self.labelList.item(i)
             _label = item.text()
             if item.checkState() == 2 and _label.startswith('auto_'):
+                _shape = self.itemsToShapes[item]
+                _old = (_shape.label, _shape.line_color)
                 _label = _label[_label.find('_', 5) + 1:]
                 item.setText(_label)
                 item.setBackground(generateColorByText(_label))
-                _is_change = True
+                _changes.append((_shape.uid, _old, (_shape.label, _shape.line_color)))
 
-        if _is_change:
+        if _changes:
+            self.recordUndo(RelabelCommand(_changes))
             self.setDirty()
-            self.updateComboBox()
 
     def chshapeLineColor(self):
         color = self.colorDialog.getColor(self.lineColor, u'Choose line color',
@@ -2401,8 +2888,73 @@ class MainWindow(QMainWindow, WindowMixin):
     def copyShape(self):
         self.canvas.endMove(copy=True)
         self.addLabel(self.canvas.selectedShape)
+        self.recordUndo(CreateCommand([(len(self.canvas.shapes) - 1, self.canvas.selectedShape)]))
         self.setDirty()
 
+    def shapesEdited(self, changes):
+        """
+        画布上完成了形状的移动或顶点编辑
+
+        @param {list} changes - (形状id, 修改前坐标, 修改后坐标)清单
+        """
+        self.recordUndo(MoveCommand(changes))
+
+    def recordUndo(self, command):
+        self.undoJournal.push(command)
+        self.updateUndoActions()
+
+    def updateUndoActions(self):
+        self.actions.undo.setEnabled(self.undoJournal.canUndo())
+        self.actions.redo.setEnabled(self.undoJournal.canRedo())
+
+    def undoEdit(self):
+        if self.canvas.current is not None:
+            return
+        if self.undoJournal.undo(self) is not None:
+            self.setDirty()
+        self.updateUndoActions()
+
+    def redoEdit(self):
+        if self.canvas.current is not None:
+            return
+        if self.undoJournal.redo(self) is not None:
+            self.setDirty()
+        self.updateUndoActions()
+
+    #############################
+    # 撤销日志的执行接口, 见UndoCommand
+    #############################
+    def shapesById(self, uids):
+        _uids = set(uids)
+        return dict((shape.uid, shape) for shape in self.canvas.shapes if shape.uid in _uids)
+
+    def restoreShapes(self, entries):
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.canvas.insertShapes(entries)
+        self.addLabels([shape for _index, shape in entries], [_index for _index, shape in entries])
+
+    def removeShapes(self, shapes):
+        self.canvas.removeShapes(shapes)
+        self.remLabels(shapes)
+        if self.noShapes():
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(False)
+
+    def damageOf(self, shapes):
+        return self.canvas.shapesRegion(shapes)
+
+    def shapesChanged(self, shapes, damage):
+        self.labelList.blockSignals(True)
+        for shape in shapes:
+            self.canvas.reindexShape(shape)
+            item = self.shapesToItems.get(shape, None)
+            if item is not None and item.text() != shape.label:
+                self.labelRenamed(item, item.text(), shape.label)
+                item.setText(shape.label)
+                item.setBackground(generateColorByText(shape.label))
+        self.labelList.blockSignals(False)
+        self.canvas.update(damage.united(self.canvas.shapesRegion(shapes)))
+
     def moveShape(self):
         self.canvas.endMove(copy=False)
         self.setDirty()
@@ -2411,11 +2963,7 @@ class MainWindow(QMainWindow, WindowMixin):
         if os.path.exists(predefClassesFile) is True:
             with codecs.open(predefClassesFile, 'r', 'utf8') as f:
                 for line in f:
-                    line = line.strip()
-                    if self.labelHist is None:
-                        self.labelHist = [line]
-                    else:
-                        self.labelHist.append(line)
+                    self.labelHist.append(line.strip())
 
     def loadPascalXMLByFilename(self, xmlPath):
         if self.filePath is None:
@@ -2428,16 +2976,12 @@ class MainWindow(QMainWindow, WindowMixin):
         tVocParseReader = PascalVocReader(xmlPath)
         shapes = tVocParseReader.getShapes()
 
-        # 增加auto_label的形状显示
-        shapes.extend(
-            self.auto_label_tool.detect_object(
-                self.filePath, shapes
-            )
-        )
-
         self.loadLabels(shapes)
         self.canvas.verified = tVocParseReader.verified
 
+        # 增加auto_label的形状显示, 在后台识别完成后添加
+        self.requestAutoLabel(shapes)
+
     def loadYOLOTXTByFilename(self, txtPath):
         if self.filePath is None:
             return
@@ -2445,7 +2989,8 @@ class MainWindow(QMainWindow, WindowMixin):
             return
 
         self.set_format(FORMAT_YOLO)
-        tYoloParseReader = YoloReader(txtPath, self.image)
+        tYoloParseReader = YoloReader(txtPath, self.image,
+                                      imageShape=LabelFile.imageShapeOf(self.image, self.imageSize))
         shapes = tYoloParseReader.getShapes()
         print(shapes)
         self.loadLabels(shapes)
@@ -2458,6 +3003,35 @@ class MainWindow(QMainWindow, WindowMixin):
     def toogleDrawSquare(self):
         self.canvas.setDrawingShapeToSquare(self.drawSquaresOption.isChecked())
 
+    def togglePerfMonitor(self, checked):
+        """
+        开启或关闭画布性能监视, 开启时清空之前的记录
+        """
+        if checked:
+            self.perfMonitor.clear()
+            self.canvas.perfMonitor = self.perfMonitor
+        else:
+            self.canvas.perfMonitor = None
+        self.perfHud.setActive(checked)
+
+    def exportPerfData(self):
+        """
+        导出画布性能数据为CSV文件
+        """
+        if len(self.perfMonitor) == 0:
+            QMessageBox.information(self, u'Information', '没有性能数据, 请先在View菜单开启性能监视')
+            return
+        _path = QFileDialog.getSaveFileName(
+            self, '%s - 导出性能数据' % __appname__, 'canvas_perf.csv', 'CSV (*.csv)'
+        )
+        if isinstance(_path, (tuple, list)):
+            _path = _path[0]
+        _path = ustr(_path)
+        if not _path:
+            return
+        _count = self.perfMonitor.exportCsv(_path)
+        self.statusBar().showMessage('已导出%d帧性能数据: %s' % (_count, _path))
+
 
 def inverted(color):
     return QColor(*[255 - v for v in color.getRgb()])
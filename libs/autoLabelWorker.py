@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台执行自动标注的工作线程
+@module autoLabelWorker
+@file autoLabelWorker.py
+"""
+
+import traceback
+
+try:
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtCore import *
+
+
+class AutoLabelTask(QRunnable):
+    """
+    执行一次物体识别的任务
+    """
+
+    def __init__(self, worker, token, path, shapes):
+        super(AutoLabelTask, self).__init__()
+        self.worker = worker
+        self.token = token
+        self.path = path
+        self.shapes = shapes
+
+    def run(self):
+        try:
+            _shapes = self.worker.detector.detect_object(self.path, self.shapes)
+        except:
+            print('auto label error: %s\r\n%s' % (self.path, traceback.format_exc()))
+            _shapes = []
+
+        self.worker.detected.emit(self.token, self.path, _shapes)
+
+
+class AutoLabelWorker(QObject):
+    """
+    将自动标注放到后台线程执行, 识别结果通过detected信号返回主线程
+    每次请求会生成新的令牌, 令牌不是最新的识别结果应丢弃
+    """
+    # 参数为: 令牌, 图片路径, 识别出的形状清单
+    detected = pyqtSignal(int, str, object)
+
+    def __init__(self, detector, parent=None):
+        """
+        构造函数
+
+        @param {TFObjectDetect} detector - 物体识别对象
+        @param {QObject} parent=None - 父对象
+        """
+        super(AutoLabelWorker, self).__init__(parent)
+        self.detector = detector
+        self.token = 0
+        # 识别模型的session只在一个线程中串行执行
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+
+    def isEnabled(self):
+        """
+        是否有启用的识别模型
+
+        @returns {bool} - 有启用的模型返回True
+        """
+        return len(self.detector.graphs) > 0
+
+    def request(self, path, shapes):
+        """
+        提交自动标注请求, 同时取消排队中的旧请求
+
+        @param {str} path - 要识别的图片路径
+        @param {list} shapes - 已有的形状, 与其重复的识别结果将被忽略
+
+        @returns {int} - 本次请求的令牌, 没有启用识别模型时返回None
+        """
+        self.cancel()
+        if not self.isEnabled():
+            return None
+
+        self.pool.start(AutoLabelTask(self, self.token, path, list(shapes)))
+        return self.token
+
+    def cancel(self):
+        """
+        取消排队中的请求, 并使正在执行的请求结果失效
+        """
+        self.token += 1
+        self.pool.clear()
+
+    def isCurrent(self, token):
+        """
+        判断识别结果是否为最新请求的结果
+
+        @param {int} token - 识别结果对应的令牌
+
+        @returns {bool} - 是最新请求返回True
+        """
+        return token == self.token
+
+    def shutdown(self, msecs=1000):
+        """
+        停止处理并等待正在执行的任务完成
+
+        @param {int} msecs=1000 - 最长等待时间(毫秒)
+        """
+        self.cancel()
+        self.pool.waitForDone(msecs)
@@ -9,8 +9,35 @@ except ImportError:
 
 #from PyQt4.QtOpenGL import *
 
-from libs.shape import Shape
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from libs.shape import Shape, MIN_Y_LABEL
 from libs.utils import distance
+from libs.spatialIndex import SpatialIndex, DEFAULT_CELL_SIZE, encloses
+
+# Minimum seconds between two status bar coordinate updates.
+STATUS_INTERVAL = 0.1
+
+# Level of detail, in screen pixels: unselected boxes whose shorter side is
+# smaller than LOD_VERTEX_SIZE are drawn without vertex handles, labels need
+# boxes of at least LOD_LABEL_SIZE and a text height of LOD_LABEL_HEIGHT, and
+# boxes under LOD_TINY_SIZE are drawn as their bounding rect.
+LOD_VERTEX_SIZE = 24
+LOD_LABEL_SIZE = 32
+LOD_LABEL_HEIGHT = 6
+LOD_TINY_SIZE = 3
+
+# Memory budget, in bytes, for the copies of the pixmap pre-scaled to recent
+# zoom levels. A zoom level whose copy alone exceeds it is drawn through the
+# painter instead.
+SCALED_PIXMAP_CACHE_BYTES = 256 * 1024 * 1024
+
+# Above this many changed shapes a whole-widget update is cheaper than
+# building the union of their regions.
+BULK_UPDATE_SHAPES = 64
 
 CURSOR_DEFAULT = Qt.ArrowCursor
 CURSOR_POINT = Qt.PointingHandCursor
@@ -18,6 +45,22 @@ CURSOR_DRAW = Qt.CrossCursor
 CURSOR_MOVE = Qt.ClosedHandCursor
 CURSOR_GRAB = Qt.OpenHandCursor
 
+
+class ScalePixmapTask(QRunnable):
+    """Smooth-scale the canvas image for a zoom level off the GUI thread."""
+
+    def __init__(self, canvas, token, key, image, size):
+        super(ScalePixmapTask, self).__init__()
+        self.canvas = canvas
+        self.token = token
+        self.key = key
+        self.image = image
+        self.size = size
+
+    def run(self):
+        scaled = self.image.scaled(self.size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self.canvas.pixmapScaled.emit(self.token, self.key, scaled)
+
 # class Canvas(QGLWidget):
 
 
@@ -27,7 +70,11 @@ class Canvas(QWidget):
     newShape = pyqtSignal()
     selectionChanged = pyqtSignal(bool)
     shapeMoved = pyqtSignal()
+    # Finished geometry edits: list of (shape uid, old coords, new coords).
+    shapesEdited = pyqtSignal(object)
     drawingPolygon = pyqtSignal(bool)
+    # Internal: token, key, scaled image from ScalePixmapTask.
+    pixmapScaled = pyqtSignal(int, object, object)
 
     # 通过这里进行关联父对象函数
     openPrevDir = pyqtSignal(bool)
@@ -45,8 +92,18 @@ class Canvas(QWidget):
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
+        # Grid index over shape bounding rects for hit-testing, kept in sync
+        # with self.shapes on every add, move and delete.
+        self.spatialIndex = SpatialIndex()
         self.current = None
         self.selectedShape = None  # save the selected shape here
+        # All selected shapes; selectedShape is the last of them.
+        self.selectedShapes = []
+        # Rubber band selection, in image coordinates, while dragging on empty space.
+        self.bandOrigin = None
+        self.bandRect = None
+        # (shape, coords) of the shapes being dragged, see beginEdit().
+        self._editStart = []
         self.selectedShapeCopy = None
         self.drawingLineColor = QColor(0, 0, 255)
         self.drawingRectColor = QColor(0, 0, 255)
@@ -55,13 +112,50 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.pixmap = QPixmap()
+        # Size of the original image; shapes are in this coordinate space even
+        # when the pixmap was decoded at a reduced resolution.
+        self.imageSize = QSize()
+        # Tiled backend for very large images, painted over the preview pixmap.
+        self.tiledImage = None
+        # Copies of the pixmap pre-scaled to recent zoom levels, least recently
+        # used first: (scale, pixmap cacheKey) -> QPixmap. Missing levels are
+        # built in the background after the zoom changes.
+        self._scaledPixmaps = OrderedDict()
+        self._scaledBytes = 0
+        self._scaleRequest = None
+        self._scaleToken = 0
+        self._sourceImage = (None, None)
+        self._scalePool = QThreadPool()
+        self._scalePool.setMaxThreadCount(1)
+        self.pixmapScaled.connect(self._pixmapScaled)
         self.visible = {}
         self._hideBackround = False
         self.hideBackround = False
         self.hShape = None
         self.hVertex = None
+        self._labelSizes = {}
+        # Widest label measured so far, in image coordinates. Every label is
+        # measured when its shape is added, relabelled or repainted, so this
+        # bounds how far any label can reach left of its shape.
+        self._maxLabelWidth = 0.0
         self._painter = QPainter()
         self._cursor = CURSOR_DEFAULT
+        # Optional PerfMonitor recording paint timings; _moveTime is the time
+        # of the oldest mouse move not yet painted.
+        self.perfMonitor = None
+        self._moveTime = None
+        # Pointer motion is coalesced: only the latest move (pos, buttons) is
+        # applied once per display frame, and the status text is throttled.
+        self._pendingMove = None
+        self._lastMovePos = None
+        self._moveTimer = QTimer(self)
+        self._moveTimer.setSingleShot(True)
+        self._moveTimer.timeout.connect(self.flushMouseMove)
+        self._statusText = None
+        self._statusTime = 0.0
+        self._statusTimer = QTimer(self)
+        self._statusTimer.setSingleShot(True)
+        self._statusTimer.timeout.connect(self.flushStatus)
         # Menus:
         self.menus = (QMenu(), QMenu())
         # Set widget options.
@@ -78,6 +172,8 @@ class Canvas(QWidget):
         self.overrideCursor(self._cursor)
 
     def leaveEvent(self, ev):
+        self.flushMouseMove()
+        self.flushStatus()
         self.restoreCursor()
 
     def focusOutEvent(self, ev):
@@ -98,7 +194,7 @@ class Canvas(QWidget):
             self.unHighlight()
             self.deSelectShape()
         self.prevPoint = QPointF()
-        self.repaint()
+        self.update()
 
     def unHighlight(self):
         if self.hShape:
@@ -109,23 +205,64 @@ class Canvas(QWidget):
         return self.hVertex is not None
 
     def mouseMoveEvent(self, ev):
+        """Queue the move; only the latest one is applied on the next frame."""
+        if self.perfMonitor is not None and self._moveTime is None:
+            self._moveTime = time.perf_counter()
+        self._pendingMove = (QPoint(ev.pos()), ev.buttons())
+        if not self._moveTimer.isActive():
+            self._moveTimer.start(self.frameInterval())
+
+    def frameInterval(self):
+        """Milliseconds per frame of the primary screen."""
+        screen = QApplication.primaryScreen() if hasattr(QApplication, 'primaryScreen') else None
+        rate = screen.refreshRate() if screen is not None else 60.0
+        return max(1, int(1000.0 / max(rate, 1.0)))
+
+    def flushMouseMove(self):
+        """Apply the pending mouse move now, if any."""
+        self._moveTimer.stop()
+        if self._pendingMove is not None:
+            pos, buttons = self._pendingMove
+            self._pendingMove = None
+            self.applyMouseMove(pos, buttons)
+
+    def showStatus(self, text, force=False):
+        """Show text in the coordinates label, at most once per STATUS_INTERVAL
+        unless forced; the latest text is always shown eventually."""
+        self._statusText = text
+        wait = STATUS_INTERVAL - (time.time() - self._statusTime)
+        if force or wait <= 0:
+            self.flushStatus()
+        elif not self._statusTimer.isActive():
+            self._statusTimer.start(int(wait * 1000) + 1)
+
+    def flushStatus(self):
+        self._statusTimer.stop()
+        if self._statusText is None:
+            return
+        self.parent().window().labelCoordinates.setText(self._statusText)
+        self._statusText = None
+        self._statusTime = time.time()
+
+    def applyMouseMove(self, widgetPos, buttons):
         """Update line with last point and current coordinates."""
-        pos = self.transformPos(ev.pos())
+        self._lastMovePos = widgetPos
+        pos = self.transformPos(widgetPos)
 
         # Update coordinates in status bar if image is opened
         window = self.parent().window()
         if window.filePath is not None:
-            self.parent().window().labelCoordinates.setText(
-                'X: %d; Y: %d' % (pos.x(), pos.y()))
+            self.showStatus('X: %d; Y: %d' % (pos.x(), pos.y()))
 
         # Polygon drawing.
         if self.drawing():
             self.overrideCursor(CURSOR_DRAW)
+            damage = self.drawingRegion()
             if self.current:
                 # Display annotation width and height while drawing
                 currentWidth = abs(self.current[0].x() - pos.x())
                 currentHeight = abs(self.current[0].y() - pos.y())
-                self.parent().window().labelCoordinates.setText(
+                self.showStatus(
                     'Width: %d, Height: %d / X: %d; Y: %d' % (currentWidth, currentHeight, pos.x(), pos.y()))
 
                 color = self.drawingLineColor
@@ -133,7 +270,7 @@ class Canvas(QWidget):
                     # Don't allow the user to draw outside the pixmap.
                     # Clip the coordinates to 0 or max,
                     # if they are outside the range [0, max]
-                    size = self.pixmap.size()
+                    size = self.imageSize
                     clipped_x = min(max(0, pos.x()), size.width())
                     clipped_y = min(max(0, pos.y()), size.height())
                     pos = QPointF(clipped_x, clipped_y)
@@ -162,31 +299,38 @@ class Canvas(QWidget):
                 self.current.highlightClear()
             else:
                 self.prevPoint = pos
-            self.repaint()
+            self.update(damage.united(self.drawingRegion()))
             return
 
         # Polygon copy moving.
-        if Qt.RightButton & ev.buttons():
+        if Qt.RightButton & buttons:
             if self.selectedShapeCopy and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
+                damage = self.shapeRect(self.selectedShapeCopy)
                 self.boundedMoveShape(self.selectedShapeCopy, pos)
-                self.repaint()
+                self.update(damage.united(self.shapeRect(self.selectedShapeCopy)))
             elif self.selectedShape:
                 self.selectedShapeCopy = self.selectedShape.copy()
-                self.repaint()
+                self.updateShapes(self.selectedShapeCopy)
             return
 
         # Polygon/Vertex moving.
-        if Qt.LeftButton & ev.buttons():
-            if self.selectedVertex():
+        if Qt.LeftButton & buttons:
+            if self.bandOrigin is not None:
+                damage = self.bandRegion()
+                self.bandRect = QRectF(self.bandOrigin, pos).normalized()
+                self.update(damage.united(self.bandRegion()))
+            elif self.selectedVertex():
+                damage = self.shapeRect(self.hShape)
                 self.boundedMoveVertex(pos)
                 self.shapeMoved.emit()
-                self.repaint()
-            elif self.selectedShape and self.prevPoint:
+                self.update(damage.united(self.shapeRect(self.hShape)))
+            elif self.selectedShapes and self.prevPoint:
                 self.overrideCursor(CURSOR_MOVE)
-                self.boundedMoveShape(self.selectedShape, pos)
+                damage = self.shapesRegion(self.selectedShapes)
+                self.boundedMoveShapes(self.selectedShapes, pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update(damage.united(self.shapesRegion(self.selectedShapes)))
             return
 
         # Just hovering over the canvas, 2 posibilities:
@@ -194,7 +338,9 @@ class Canvas(QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip("Image")
-        for shape in reversed([s for s in self.shapes if self.isVisible(s)]):
+        previous = self.hShape
+        candidates = self.spatialIndex.queryPoint(pos, self.epsilon)
+        for shape in reversed([s for s in candidates if self.isVisible(s)]):
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
             index = shape.nearestVertex(pos, self.epsilon)
@@ -206,7 +352,7 @@ class Canvas(QWidget):
                 self.overrideCursor(CURSOR_POINT)
                 self.setToolTip("Click & drag to move point")
                 self.setStatusTip(self.toolTip())
-                self.update()
+                self.updateShapes(previous, shape)
                 break
             elif shape.containsPoint(pos):
                 if self.selectedVertex():
@@ -216,40 +362,52 @@ class Canvas(QWidget):
                     "Click & drag to move shape '%s'" % shape.label)
                 self.setStatusTip(self.toolTip())
                 self.overrideCursor(CURSOR_GRAB)
-                self.update()
+                self.updateShapes(previous, shape)
                 break
         else:  # Nothing found, clear highlights, reset state.
             if self.hShape:
                 self.hShape.highlightClear()
-                self.update()
+                self.updateShapes(self.hShape)
             self.hVertex, self.hShape = None, None
             self.overrideCursor(CURSOR_DEFAULT)
 
     def mousePressEvent(self, ev):
+        self.flushMouseMove()
         pos = self.transformPos(ev.pos())
 
         if ev.button() == Qt.LeftButton:
             if self.drawing():
                 self.handleDrawing(pos)
             else:
-                self.selectShapePoint(pos)
+                if self.selectShapePoint(pos, bool(ev.modifiers() & Qt.ShiftModifier)) is None:
+                    # Pressed on empty space: start a rubber band selection.
+                    self.bandOrigin = pos
+                    self.bandRect = QRectF(pos, pos)
+                else:
+                    self.beginEdit(self.selectedShapes)
                 self.prevPoint = pos
-                self.repaint()
         elif ev.button() == Qt.RightButton and self.editing():
             self.selectShapePoint(pos)
             self.prevPoint = pos
-            self.repaint()
 
     def mouseReleaseEvent(self, ev):
+        # Apply the exact release position before finishing the drag.
+        self.flushMouseMove()
+        if ev.pos() != self._lastMovePos and (ev.buttons() | ev.button()) & (Qt.LeftButton | Qt.RightButton):
+            self.applyMouseMove(QPoint(ev.pos()), ev.buttons() | ev.button())
+        self.flushStatus()
         if ev.button() == Qt.RightButton:
             menu = self.menus[bool(self.selectedShapeCopy)]
             self.restoreCursor()
             if not menu.exec_(self.mapToGlobal(ev.pos()))\
                and self.selectedShapeCopy:
                 # Cancel the move by deleting the shadow copy.
+                self.updateShapes(self.selectedShapeCopy)
                 self.selectedShapeCopy = None
-                self.repaint()
+        elif ev.button() == Qt.LeftButton and self.bandOrigin is not None:
+            self.finishRubberBand(bool(ev.modifiers() & Qt.ShiftModifier))
         elif ev.button() == Qt.LeftButton and self.selectedShape:
+            self.commitEdit()
             if self.selectedVertex():
                 self.overrideCursor(CURSOR_POINT)
             else:
@@ -266,20 +424,42 @@ class Canvas(QWidget):
         #del shape.line_color
         if copy:
             self.shapes.append(shape)
-            self.selectedShape.selected = False
+            self.spatialIndex.insert(shape)
+            damage = self.shapesRegion(self.selectedShapes + [shape])
+            for selected in self.selectedShapes:
+                selected.selected = False
+            shape.selected = True
+            self.selectedShapes = [shape]
             self.selectedShape = shape
-            self.repaint()
+            self.update(damage)
         else:
-            self.selectedShape.points = [p for p in shape.points]
+            damage = self.shapeRect(self.selectedShape)
+            self.beginEdit([self.selectedShape])
+            self.selectedShape.setCoords(shape.coords.copy())
+            self.reindexShape(self.selectedShape)
+            self.commitEdit()
+            self.update(damage.united(self.shapeRect(self.selectedShape)))
         self.selectedShapeCopy = None
 
+    def beginEdit(self, shapes):
+        """Remember the coordinates of shapes before a geometry edit."""
+        self._editStart = [(shape, shape.coords.copy()) for shape in shapes]
+
+    def commitEdit(self):
+        """Emit shapesEdited for the shapes changed since beginEdit()."""
+        changes = [(shape.uid, old, shape.coords.copy()) for shape, old in self._editStart
+                   if not np.array_equal(old, shape.coords)]
+        self._editStart = []
+        if changes:
+            self.shapesEdited.emit(changes)
+
     def hideBackroundShapes(self, value):
         self.hideBackround = value
         if self.selectedShape:
             # Only hide other shapes if there is a current selection.
             # Otherwise the user will not be able to select a shape.
             self.setHiding(True)
-            self.repaint()
+            self.update()
 
     def handleDrawing(self, pos):
         if self.current and self.current.reachMaxPoints() is False:
@@ -299,7 +479,10 @@ class Canvas(QWidget):
             self.line.points = [pos, pos]
             self.setHiding()
             self.drawingPolygon.emit(True)
-            self.update()
+            if self._hideBackround:
+                self.update()
+            else:
+                self.update(self.drawingRegion())
 
     def setHiding(self, enable=True):
         self._hideBackround = self.hideBackround if enable else False
@@ -315,29 +498,74 @@ class Canvas(QWidget):
             self.finalise()
 
     def selectShape(self, shape):
-        self.deSelectShape()
-        shape.selected = True
-        self.selectedShape = shape
-        self.setHiding()
-        self.selectionChanged.emit(True)
-        self.update()
+        self.selectShapes([shape])
+
+    def selectShapes(self, shapes):
+        """Replace the selection with shapes, repainting and notifying once."""
+        damage = self.shapesRegion(self.selectedShapes)
+        for shape in self.selectedShapes:
+            shape.selected = False
+        self.selectedShapes = list(shapes)
+        for shape in self.selectedShapes:
+            shape.selected = True
+        self.selectedShape = self.selectedShapes[-1] if self.selectedShapes else None
+        self.setHiding(bool(self.selectedShapes))
+        self.selectionChanged.emit(bool(self.selectedShapes))
+        if self.hideBackround:
+            self.update()
+        else:
+            self.update(damage.united(self.shapesRegion(self.selectedShapes)))
 
-    def selectShapePoint(self, point):
-        """Select the first shape created which contains this point."""
-        self.deSelectShape()
+    def toggleShapeSelection(self, shape):
+        if shape.selected:
+            self.selectShapes([s for s in self.selectedShapes if s is not shape])
+        else:
+            self.selectShapes(self.selectedShapes + [shape])
+
+    def selectShapePoint(self, point, additive=False):
+        """Select the first shape created which contains this point, or toggle
+        it in the selection when additive. Clicking a shape that is already
+        selected keeps the selection so it can be dragged as a group.
+        Returns the shape hit, or None."""
         if self.selectedVertex():  # A vertex is marked for selection.
             index, shape = self.hVertex, self.hShape
             shape.highlightVertex(index, shape.MOVE_VERTEX)
             self.selectShape(shape)
-            return
-        for shape in reversed(self.shapes):
+            return shape
+        for shape in reversed(self.spatialIndex.queryPoint(point, self.epsilon)):
             if self.isVisible(shape) and shape.containsPoint(point):
-                self.selectShape(shape)
-                self.calculateOffsets(shape, point)
-                return
-
-    def calculateOffsets(self, shape, point):
-        rect = shape.boundingRect()
+                if additive:
+                    self.toggleShapeSelection(shape)
+                elif not shape.selected:
+                    self.selectShape(shape)
+                self.calculateOffsets(self.selectedShapes, point)
+                return shape
+        if not additive:
+            self.deSelectShape()
+        return None
+
+    def finishRubberBand(self, additive=False):
+        """Select the visible shapes lying inside the rubber band."""
+        rect = self.bandRect
+        damage = self.bandRegion()
+        self.bandOrigin = self.bandRect = None
+        self.update(damage)
+        if rect is None or rect.isEmpty():
+            return
+        shapes = [shape for shape in self.spatialIndex.query(rect)
+                  if self.isVisible(shape) and encloses(rect, self.spatialIndex.rect(shape))]
+        if additive:
+            shapes = self.selectedShapes + [shape for shape in shapes if not shape.selected]
+        if shapes or self.selectedShapes:
+            self.selectShapes(shapes)
+
+    def bandRegion(self):
+        if self.bandRect is None:
+            return QRegion()
+        return QRegion(self.widgetRect(self.bandRect).adjusted(-2, -2, 2, 2))
+
+    def calculateOffsets(self, shapes, point):
+        rect = self.boundingRectOf(shapes)
         x1 = rect.x() - point.x()
         y1 = rect.y() - point.y()
         x2 = (rect.x() + rect.width()) - point.x()
@@ -349,20 +577,38 @@ class Canvas(QWidget):
         Moves a point x,y to within the boundaries of the canvas.
         :return: (x,y,snapped) where snapped is True if x or y were changed, False if not.
         """
-        if x < 0 or x > self.pixmap.width() or y < 0 or y > self.pixmap.height():
+        if x < 0 or x > self.imageSize.width() or y < 0 or y > self.imageSize.height():
             x = max(x, 0)
             y = max(y, 0)
-            x = min(x, self.pixmap.width())
-            y = min(y, self.pixmap.height())
+            x = min(x, self.imageSize.width())
+            y = min(y, self.imageSize.height())
             return x, y, True
 
         return x, y, False
 
+    def clampShapes(self, shapes):
+        """
+        Clip the vertices of many shapes to the image in one vectorized pass.
+        :return: True if any vertex was moved.
+        """
+        if not shapes:
+            return False
+        coords = np.concatenate([shape.coords for shape in shapes])
+        clipped = np.clip(coords, 0, (self.imageSize.width(), self.imageSize.height()))
+        moved = np.any(clipped != coords, axis=1)
+        if not moved.any():
+            return False
+        bounds = np.cumsum([0] + [len(shape.coords) for shape in shapes])
+        for shape, start, end in zip(shapes, bounds[:-1], bounds[1:]):
+            if moved[start:end].any():
+                shape.setCoords(clipped[start:end].copy())
+        return True
+
     def boundedMoveVertex(self, pos):
         index, shape = self.hVertex, self.hShape
         point = shape[index]
         if self.outOfPixmap(pos):
-            size = self.pixmap.size()
+            size = self.imageSize
             clipped_x = min(max(0, pos.x()), size.width())
             clipped_y = min(max(0, pos.y()), size.height())
             pos = QPointF(clipped_x, clipped_y)
@@ -393,8 +639,14 @@ class Canvas(QWidget):
             rshift = QPointF(0, shiftPos.y())
         shape.moveVertexBy(rindex, rshift)
         shape.moveVertexBy(lindex, lshift)
+        self.reindexShape(shape)
 
     def boundedMoveShape(self, shape, pos):
+        return self.boundedMoveShapes([shape], pos)
+
+    def boundedMoveShapes(self, shapes, pos):
+        """Move shapes together so that the cursor follows pos, keeping their
+        common bounding rect (self.offsets) inside the image."""
         if self.outOfPixmap(pos):
             return False  # No need to move
         o1 = pos + self.offsets[0]
@@ -402,8 +654,8 @@ class Canvas(QWidget):
             pos -= QPointF(min(0, o1.x()), min(0, o1.y()))
         o2 = pos + self.offsets[1]
         if self.outOfPixmap(o2):
-            pos += QPointF(min(0, self.pixmap.width() - o2.x()),
-                           min(0, self.pixmap.height() - o2.y()))
+            pos += QPointF(min(0, self.imageSize.width() - o2.x()),
+                           min(0, self.imageSize.height() - o2.y()))
         # The next line tracks the new position of the cursor
         # relative to the shape, but also results in making it
         # a bit "shaky" when nearing the border and allows it to
@@ -411,35 +663,46 @@ class Canvas(QWidget):
         #self.calculateOffsets(self.selectedShape, pos)
         dp = pos - self.prevPoint
         if dp:
-            shape.moveBy(dp)
+            for shape in shapes:
+                shape.moveBy(dp)
+                self.reindexShape(shape)
             self.prevPoint = pos
             return True
         return False
 
     def deSelectShape(self):
-        if self.selectedShape:
-            self.selectedShape.selected = False
-            self.selectedShape = None
-            self.setHiding(False)
-            self.selectionChanged.emit(False)
-            self.update()
+        if self.selectedShapes:
+            self.selectShapes([])
 
     def deleteSelected(self):
-        if self.selectedShape:
-            shape = self.selectedShape
-            self.shapes.remove(self.selectedShape)
-            self.selectedShape = None
+        """Remove all selected shapes and return them."""
+        shapes = self.selectedShapes
+        if not shapes:
+            return []
+        damage = self.shapesRegion(shapes)
+        removed = set(shapes)
+        self.shapes = [shape for shape in self.shapes if shape not in removed]
+        for shape in shapes:
+            self.spatialIndex.remove(shape)
+        self.selectedShapes = []
+        self.selectedShape = None
+        if self._hideBackround:
             self.update()
-            return shape
+        else:
+            self.update(damage)
+        return shapes
 
     def copySelectedShape(self):
         if self.selectedShape:
             shape = self.selectedShape.copy()
             self.deSelectShape()
             self.shapes.append(shape)
+            self.spatialIndex.insert(shape)
             shape.selected = True
+            self.selectedShapes = [shape]
             self.selectedShape = shape
             self.boundedShiftShape(shape)
+            self.updateShapes(shape)
             return shape
 
     def boundedShiftShape(self, shape):
@@ -447,7 +710,7 @@ class Canvas(QWidget):
         # Give up if both fail.
         point = shape[0]
         offset = QPointF(2.0, 2.0)
-        self.calculateOffsets(shape, point)
+        self.calculateOffsets([shape], point)
         self.prevPoint = point
         if not self.boundedMoveShape(shape, point - offset):
             self.boundedMoveShape(shape, point + offset)
@@ -456,6 +719,7 @@ class Canvas(QWidget):
         if not self.pixmap:
             return super(Canvas, self).paintEvent(event)
 
+        start = time.perf_counter()
         p = self._painter
         p.begin(self)
         p.setRenderHint(QPainter.Antialiasing)
@@ -465,18 +729,27 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offsetToCenter())
 
-        p.drawPixmap(0, 0, self.pixmap)
+        # Only the exposed part of the image and the shapes around it are drawn.
+        exposed = self.imageRect(event.rect())
+        imageStart = time.perf_counter()
+        self.drawImage(p, event.rect(), exposed)
+        if self.tiledImage is not None:
+            self.tiledImage.paint(p, exposed, self.scale)
+        imageTime = time.perf_counter() - imageStart
         Shape.scale = self.scale
-        for shape in self.shapes:
-            if (shape.selected or not self._hideBackround) and self.isVisible(shape):
-                shape.fill = shape.selected or shape == self.hShape
-                shape.paint(p)
+        shapeCount = self.paintShapes(p, [shape for shape in self.shapesIn(exposed)
+                             if (shape.selected or not self._hideBackround) and self.isVisible(shape)])
         if self.current:
             self.current.paint(p)
             self.line.paint(p)
         if self.selectedShapeCopy:
             self.selectedShapeCopy.paint(p)
 
+        if self.bandRect is not None:
+            p.setPen(QPen(self.drawingRectColor, 0, Qt.DashLine))
+            p.setBrush(Qt.NoBrush)
+            p.drawRect(self.bandRect)
+
         # Paint rect
         if self.current is not None and len(self.line) == 2:
             leftTop = self.line[0]
@@ -490,8 +763,8 @@ class Canvas(QWidget):
 
         if self.drawing() and not self.prevPoint.isNull() and not self.outOfPixmap(self.prevPoint):
             p.setPen(QColor(0, 0, 0))
-            p.drawLine(self.prevPoint.x(), 0, self.prevPoint.x(), self.pixmap.height())
-            p.drawLine(0, self.prevPoint.y(), self.pixmap.width(), self.prevPoint.y())
+            p.drawLine(self.prevPoint.x(), 0, self.prevPoint.x(), self.imageSize.height())
+            p.drawLine(0, self.prevPoint.y(), self.imageSize.width(), self.prevPoint.y())
 
         self.setAutoFillBackground(True)
         if self.verified:
@@ -505,37 +778,260 @@ class Canvas(QWidget):
 
         p.end()
 
+        if self.perfMonitor is not None:
+            end = time.perf_counter()
+            latency = None
+            if self._moveTime is not None:
+                latency = (end - self._moveTime) * 1000
+                self._moveTime = None
+            self.perfMonitor.record((end - start) * 1000, shapeCount, imageTime * 1000, latency)
+
+    def paintShapes(self, p, shapes):
+        """Paint shapes, drawing plain shapes that share a pen as one combined path.
+        Selected, hovered and highlighted shapes are painted individually on top
+        in full detail; plain shapes follow the LOD_* rules for their size on
+        screen. Returns the number of shapes painted."""
+        batches = OrderedDict()
+        special = []
+        labels = []
+        labelsVisible = self.labelSize('')[1] * self.scale >= LOD_LABEL_HEIGHT
+        for shape in shapes:
+            shape.fill = shape.selected or shape == self.hShape
+            if not shape.points:
+                continue
+            if not shape.isPlain():
+                special.append(shape)
+                continue
+            key = (shape.line_color.rgba(), shape.vertex_fill_color.rgba())
+            batch = batches.get(key)
+            if batch is None:
+                batch = batches[key] = (shape.line_color, shape.vertex_fill_color,
+                                        QPainterPath(), QPainterPath())
+            rect = shape.boundingRect()
+            size = min(rect.width(), rect.height()) * self.scale
+            if max(rect.width(), rect.height()) * self.scale < LOD_TINY_SIZE:
+                batch[2].addRect(rect)
+                continue
+            batch[2].addPath(shape.linePath())
+            if size >= LOD_VERTEX_SIZE:
+                batch[3].addPath(shape.vertexPath())
+            if shape.paintLabel and labelsVisible and size >= LOD_LABEL_SIZE:
+                labels.append(shape)
+
+        width = max(1, int(round(2.0 / self.scale)))
+        for color, vertexColor, linePath, vertexPath in batches.values():
+            p.setPen(Shape.pen(color, width))
+            p.drawPath(linePath)
+            p.drawPath(vertexPath)
+            p.fillPath(vertexPath, vertexColor)
+        for shape in labels:
+            shape.paintLabelText(p)
+        for shape in special:
+            shape.paint(p)
+        return len(shapes)
+
     def transformPos(self, point):
         """Convert from widget-logical coordinates to painter-logical coordinates."""
         return point / self.scale - self.offsetToCenter()
 
+    def imageRect(self, rect):
+        """Map a rect in widget coordinates to image coordinates."""
+        return QRectF(self.transformPos(QPointF(rect.topLeft())),
+                      self.transformPos(QPointF(rect.bottomRight() + QPoint(1, 1))))
+
+    def widgetRect(self, rect):
+        """Map a rect in image coordinates to the widget rect covering it."""
+        s = self.scale
+        offset = self.offsetToCenter()
+        return QRectF((rect.x() + offset.x()) * s, (rect.y() + offset.y()) * s,
+                      rect.width() * s, rect.height() * s).toAlignedRect()
+
+    def shapeRect(self, shape):
+        """Widget rect covering everything shape.paint() draws: outline, vertices and label."""
+        if shape is None or not shape.points:
+            return QRect()
+        rect = shape.boundingRect()
+        if shape.paintLabel and shape.label:
+            width, height = self.labelSize(shape.label)
+            rect = rect.united(QRectF(rect.left(), rect.top() - height,
+                                      width, height + MIN_Y_LABEL))
+        # Largest highlighted vertex plus pen width, in widget pixels.
+        margin = Shape.point_size * 2 + 2
+        return self.widgetRect(rect).adjusted(-margin, -margin, margin, margin)
+
+    def labelSize(self, label):
+        """Size of a shape label in image coordinates (the label font is scaled with the image)."""
+        size = self._labelSizes.get(label)
+        if size is None:
+            metrics = QFontMetricsF(Shape.labelFont())
+            size = (metrics.boundingRect(label).width(), metrics.height())
+            self._labelSizes[label] = size
+            self._maxLabelWidth = max(self._maxLabelWidth, size[0])
+        return size
+
+    def measureLabels(self, shapes):
+        """Make sure the labels of shapes are counted in the label width bound."""
+        for shape in shapes:
+            if shape is not None and shape.label and shape.label not in self._labelSizes:
+                self.labelSize(shape.label)
+
+    def updateShapes(self, *shapes):
+        """Schedule a repaint of the area covered by the given shapes."""
+        self.measureLabels(shapes)
+        self.update(self.shapesRegion(shapes))
+
+    def shapesRegion(self, shapes):
+        """Widget region covering the given shapes."""
+        region = QRegion()
+        for shape in shapes:
+            region = region.united(QRegion(self.shapeRect(shape)))
+        return region
+
+    def boundingRectOf(self, shapes):
+        """Union of the bounding rects of shapes, in image coordinates."""
+        rect = QRectF()
+        for shape in shapes:
+            rect = rect.united(shape.boundingRect())
+        return rect
+
+    def drawingRegion(self):
+        """Area covered by the shape being drawn, the rubber band line and the crosshair."""
+        region = QRegion()
+        if self.current:
+            region = region.united(QRegion(self.shapeRect(self.current)))
+            region = region.united(QRegion(self.shapeRect(self.line)))
+        elif self.drawing() and not self.prevPoint.isNull():
+            w, h = self.imageSize.width(), self.imageSize.height()
+            x, y = self.prevPoint.x(), self.prevPoint.y()
+            region = region.united(QRegion(self.widgetRect(QRectF(x, 0, 0, h)).adjusted(-2, -2, 2, 2)))
+            region = region.united(QRegion(self.widgetRect(QRectF(0, y, w, 0)).adjusted(-2, -2, 2, 2)))
+        return region
+
+    def shapesIn(self, rect):
+        """Shapes that may paint inside rect (image coordinates), in z-order."""
+        margin = (Shape.point_size * 2 + 2) / self.scale
+        rect = rect.adjusted(-margin, -margin, margin, margin)
+        if self._maxLabelWidth > 0:
+            # Labels extend to the right of and above their shape.
+            height = self.labelSize('')[1]
+            rect = rect.adjusted(-self._maxLabelWidth, 0, 0, height + MIN_Y_LABEL)
+        return self.spatialIndex.query(rect)
+
+    def drawImage(self, p, exposed, rect):
+        """Draw the part of the image under the exposed widget rect; rect is
+        the same area in image coordinates."""
+        size = self.scaledSize()
+        if size == self.pixmap.size() or size.width() * size.height() * 4 > SCALED_PIXMAP_CACHE_BYTES:
+            # Shown at pixmap resolution, or too large a copy to keep around.
+            self.drawPixmapRect(p, rect)
+            return
+
+        # Draw the cached copy for this zoom 1:1, or a nearest-neighbour
+        # preview while it is being built.
+        key = (self.scale, self.pixmap.cacheKey())
+        scaled = self._scaledPixmaps.get(key)
+        if scaled is None:
+            self.requestScaledPixmap(key)
+            p.setRenderHint(QPainter.SmoothPixmapTransform, False)
+            self.drawPixmapRect(p, rect)
+            p.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            return
+        self._scaledPixmaps.move_to_end(key)
+
+        offset = self.offsetToCenter() * self.scale
+        x, y = int(round(offset.x())), int(round(offset.y()))
+        target = exposed.intersected(QRect(x, y, scaled.width(), scaled.height()))
+        if target.isEmpty():
+            return
+        p.save()
+        p.resetTransform()
+        p.drawPixmap(target, scaled, target.translated(-x, -y))
+        p.restore()
+
+    def scaledSize(self):
+        """Widget size of the image at the current zoom."""
+        return QSize(max(1, int(round(self.imageSize.width() * self.scale))),
+                     max(1, int(round(self.imageSize.height() * self.scale))))
+
+    def drawPixmapRect(self, p, rect):
+        """Draw the part of the pixmap under rect (image coordinates) through the painter scale."""
+        w, h = self.imageSize.width(), self.imageSize.height()
+        target = rect.toAlignedRect().intersected(QRect(0, 0, w, h))
+        if target.isEmpty():
+            return
+        sx = self.pixmap.width() / float(w)
+        sy = self.pixmap.height() / float(h)
+        source = QRectF(target.x() * sx, target.y() * sy, target.width() * sx, target.height() * sy)
+        p.drawPixmap(QRectF(target), self.pixmap, source)
+
+    def requestScaledPixmap(self, key):
+        """Start building the pixmap scaled for key = (scale, pixmap cacheKey)."""
+        if self._scaleRequest == key:
+            return
+        self._scaleRequest = key
+        self._scaleToken += 1
+        if self._sourceImage[0] != self.pixmap.cacheKey():
+            self._sourceImage = (self.pixmap.cacheKey(), self.pixmap.toImage())
+        size = self.scaledSize()
+        # Drop zoom levels still queued, only the latest one matters.
+        self._scalePool.clear()
+        self._scalePool.start(ScalePixmapTask(self, self._scaleToken, key, self._sourceImage[1], size))
+
+    def _pixmapScaled(self, token, key, image):
+        if token != self._scaleToken or self.pixmap is None or key[1] != self.pixmap.cacheKey():
+            return
+        scaled = QPixmap.fromImage(image)
+        self._scaledPixmaps[key] = scaled
+        self._scaledBytes += self.pixmapBytes(scaled)
+        # Evict the least recently drawn zoom levels, never the new one.
+        while self._scaledBytes > SCALED_PIXMAP_CACHE_BYTES and len(self._scaledPixmaps) > 1:
+            _, evicted = self._scaledPixmaps.popitem(last=False)
+            self._scaledBytes -= self.pixmapBytes(evicted)
+        self._scaleRequest = None
+        self.update()
+
+    @staticmethod
+    def pixmapBytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def releaseScaledPixmap(self):
+        self._scaleToken += 1
+        self._scaledPixmaps.clear()
+        self._scaledBytes = 0
+        self._scaleRequest = None
+        self._sourceImage = (None, None)
+
     def offsetToCenter(self):
         s = self.scale
         area = super(Canvas, self).size()
-        w, h = self.pixmap.width() * s, self.pixmap.height() * s
+        w, h = self.imageSize.width() * s, self.imageSize.height() * s
         aw, ah = area.width(), area.height()
         x = (aw - w) / (2 * s) if aw > w else 0
         y = (ah - h) / (2 * s) if ah > h else 0
         return QPointF(x, y)
 
     def outOfPixmap(self, p):
-        w, h = self.pixmap.width(), self.pixmap.height()
+        w, h = self.imageSize.width(), self.imageSize.height()
         return not (0 <= p.x() <= w and 0 <= p.y() <= h)
 
     def finalise(self):
         assert self.current
+        damage = self.drawingRegion()
         if self.current.points[0] == self.current.points[-1]:
             self.current = None
             self.drawingPolygon.emit(False)
-            self.update()
+            self.update(damage)
             return
 
         self.current.close()
         self.shapes.append(self.current)
+        self.spatialIndex.insert(self.current)
         self.current = None
+        if self._hideBackround:
+            damage = self.rect()
         self.setHiding(False)
         self.newShape.emit()
-        self.update()
+        self.update(damage)
 
     def closeEnough(self, p1, p2):
         #d = distance(p1 - p2)
@@ -550,7 +1046,7 @@ class Canvas(QWidget):
 
     def minimumSizeHint(self):
         if self.pixmap:
-            return self.scale * self.pixmap.size()
+            return self.scale * self.imageSize
         return super(Canvas, self).minimumSizeHint()
 
     def wheelEvent(self, ev):
@@ -579,9 +1075,10 @@ class Canvas(QWidget):
         key = ev.key()
         if key == Qt.Key_Escape and self.current:
             print('ESC press')
+            damage = self.drawingRegion()
             self.current = None
             self.drawingPolygon.emit(False)
-            self.update()
+            self.update(damage)
         elif key == Qt.Key_Return and self.canCloseShape():
             self.finalise()
         elif key == Qt.Key_Left:
@@ -617,41 +1114,33 @@ class Canvas(QWidget):
                 self.deleteCurrentFile.emit(False)
 
     def moveOnePixel(self, direction):
-        # print(self.selectedShape.points)
-        if direction == 'Left' and not self.moveOutOfBound(QPointF(-1.0, 0)):
-            # print("move Left one pixel")
-            self.selectedShape.points[0] += QPointF(-1.0, 0)
-            self.selectedShape.points[1] += QPointF(-1.0, 0)
-            self.selectedShape.points[2] += QPointF(-1.0, 0)
-            self.selectedShape.points[3] += QPointF(-1.0, 0)
-        elif direction == 'Right' and not self.moveOutOfBound(QPointF(1.0, 0)):
-            # print("move Right one pixel")
-            self.selectedShape.points[0] += QPointF(1.0, 0)
-            self.selectedShape.points[1] += QPointF(1.0, 0)
-            self.selectedShape.points[2] += QPointF(1.0, 0)
-            self.selectedShape.points[3] += QPointF(1.0, 0)
-        elif direction == 'Up' and not self.moveOutOfBound(QPointF(0, -1.0)):
-            # print("move Up one pixel")
-            self.selectedShape.points[0] += QPointF(0, -1.0)
-            self.selectedShape.points[1] += QPointF(0, -1.0)
-            self.selectedShape.points[2] += QPointF(0, -1.0)
-            self.selectedShape.points[3] += QPointF(0, -1.0)
-        elif direction == 'Down' and not self.moveOutOfBound(QPointF(0, 1.0)):
-            # print("move Down one pixel")
-            self.selectedShape.points[0] += QPointF(0, 1.0)
-            self.selectedShape.points[1] += QPointF(0, 1.0)
-            self.selectedShape.points[2] += QPointF(0, 1.0)
-            self.selectedShape.points[3] += QPointF(0, 1.0)
+        """Nudge all selected shapes one pixel, unless that leaves the image."""
+        step = {
+            'Left': QPointF(-1.0, 0),
+            'Right': QPointF(1.0, 0),
+            'Up': QPointF(0, -1.0),
+            'Down': QPointF(0, 1.0),
+        }[direction]
+        shapes = self.selectedShapes
+        damage = self.shapesRegion(shapes)
+        if not self.moveOutOfBound(step):
+            self.beginEdit(shapes)
+            for shape in shapes:
+                shape.moveBy(step)
+                self.reindexShape(shape)
+            self.commitEdit()
         self.shapeMoved.emit()
-        self.repaint()
+        self.update(damage.united(self.shapesRegion(shapes)))
 
     def moveOutOfBound(self, step):
-        points = [p1 + p2 for p1, p2 in zip(self.selectedShape.points, [step] * 4)]
-        return True in map(self.outOfPixmap, points)
+        rect = self.boundingRectOf(self.selectedShapes).translated(step)
+        w, h = self.imageSize.width(), self.imageSize.height()
+        return rect.left() < 0 or rect.top() < 0 or rect.right() > w or rect.bottom() > h
 
     def setLastLabel(self, text, line_color=None, fill_color=None):
         assert text
         self.shapes[-1].label = text
+        self.measureLabels(self.shapes[-1:])
         if line_color:
             self.shapes[-1].line_color = line_color
 
@@ -663,6 +1152,7 @@ class Canvas(QWidget):
     def undoLastLine(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.spatialIndex.remove(self.current)
         self.current.setOpen()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -670,6 +1160,7 @@ class Canvas(QWidget):
     def resetAllLines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.spatialIndex.remove(self.current)
         self.current.setOpen()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -677,19 +1168,103 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
-    def loadPixmap(self, pixmap):
+    def loadPixmap(self, pixmap, imageSize=None):
+        """Load a new image. imageSize is the original size when the pixmap
+        was decoded at a reduced resolution."""
         self.pixmap = pixmap
+        self.imageSize = QSize(imageSize) if imageSize is not None else pixmap.size()
+        self.releaseScaledPixmap()
         self.shapes = []
-        self.repaint()
+        # About 64 cells along the longer side, so large images do not get a huge grid.
+        self.spatialIndex = SpatialIndex(
+            max(DEFAULT_CELL_SIZE, max(self.imageSize.width(), self.imageSize.height()) / 64.0))
+        self.update()
+
+    def setTiledImage(self, tiledImage):
+        """Use a TiledImage to paint the visible part of the current image at full detail."""
+        if self.tiledImage is not None:
+            self.tiledImage.tileReady.disconnect(self.update)
+            self.tiledImage.shutdown()
+            self.tiledImage.deleteLater()
+        self.tiledImage = tiledImage
+        if tiledImage is not None:
+            tiledImage.tileReady.connect(self.update)
+        self.update()
+
+    def setDisplayPixmap(self, pixmap):
+        """Swap in another resolution of the current image, keeping the shapes."""
+        self.pixmap = pixmap
+        self.update()
 
     def loadShapes(self, shapes):
         self.shapes = list(shapes)
+        self.rebuildSpatialIndex()
         self.current = None
-        self.repaint()
+        self.update()
+
+    def rebuildSpatialIndex(self):
+        self.spatialIndex.clear()
+        for shape in self.shapes:
+            self.spatialIndex.insert(shape)
+        self.measureLabels(self.shapes)
+
+    def insertShapes(self, entries):
+        """Insert shapes back at their positions; entries are (index, shape)."""
+        entries = sorted(entries, key=lambda entry: entry[0])
+        for index, shape in entries:
+            shape.selected = False
+            self.shapes.insert(index, shape)
+        if entries and entries[0][0] < len(self.shapes) - len(entries):
+            # Keep the index order equal to the paint order.
+            self.rebuildSpatialIndex()
+        else:
+            for index, shape in entries:
+                self.spatialIndex.insert(shape)
+            self.measureLabels([shape for index, shape in entries])
+        self.update(self.shapesRegion([shape for index, shape in entries]))
+
+    def removeShapes(self, shapes):
+        """Remove shapes, dropping them from the selection first."""
+        removed = set(shapes)
+        if removed.intersection(self.selectedShapes):
+            self.selectShapes([shape for shape in self.selectedShapes if shape not in removed])
+        damage = self.shapesRegion(shapes)
+        self.shapes = [shape for shape in self.shapes if shape not in removed]
+        for shape in shapes:
+            self.spatialIndex.remove(shape)
+        if self.hShape in removed:
+            self.hVertex = self.hShape = None
+        self.update(damage)
+
+    def addShapes(self, shapes):
+        """Append shapes without touching the one being drawn."""
+        self.shapes.extend(shapes)
+        for shape in shapes:
+            self.spatialIndex.insert(shape)
+        self.measureLabels(shapes)
+        self.update()
+
+    def reindexShape(self, shape):
+        """Update the spatial index after the points of a shape changed."""
+        if shape in self.spatialIndex:
+            self.spatialIndex.update(shape)
+        self.measureLabels([shape])
 
     def setShapeVisible(self, shape, value):
         self.visible[shape] = value
-        self.repaint()
+        self.updateShapes(shape)
+
+    def setShapesVisible(self, visibility):
+        """Apply a {shape: visible} mapping and schedule a single repaint."""
+        changed = [shape for shape, value in visibility.items() if self.isVisible(shape) != value]
+        if not changed:
+            return
+        for shape in changed:
+            self.visible[shape] = visibility[shape]
+        if len(changed) > BULK_UPDATE_SHAPES:
+            self.update()
+        else:
+            self.updateShapes(*changed)
 
     def currentCursor(self):
         cursor = QApplication.overrideCursor()
@@ -710,6 +1285,11 @@ class Canvas(QWidget):
     def resetState(self):
         self.restoreCursor()
         self.pixmap = None
+        self.imageSize = QSize()
+        self.setTiledImage(None)
+        self.releaseScaledPixmap()
+        self._moveTimer.stop()
+        self._pendingMove = None
         self.update()
 
     def setDrawingShapeToSquare(self, status):
@@ -16,3 +16,8 @@ FORMAT_PASCALVOC='PascalVOC'
 FORMAT_YOLO='YOLO'
 SETTING_DRAW_SQUARE = 'draw/square'
 DEFAULT_ENCODING = 'utf-8'
+SETTING_IMAGE_CACHE_SIZE = 'imageCache/size'
+SETTING_PREFETCH_NEXT = 'imageCache/prefetchNext'
+SETTING_PREFETCH_PREV = 'imageCache/prefetchPrev'
+SETTING_TILE_CACHE_DIR = 'tileCache/dir'
+SETTING_TILE_CACHE_SIZE = 'tileCache/size'
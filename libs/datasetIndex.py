@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据集的SQLite持久化索引
+@module datasetIndex
+@file datasetIndex.py
+"""
+
+import os
+import ast
+import json
+import sqlite3
+import threading
+import traceback
+from xml.etree import ElementTree
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.pascal_voc_io import XML_EXT
+from libs.yolo_io import TXT_EXT
+
+
+# 索引文件名, 保存在数据集根目录下
+INDEX_FILE_NAME = '.labelImg_index.sqlite'
+
+# 标注格式
+FORMAT_VOC = 'VOC'
+FORMAT_YOLO = 'YOLO'
+
+# 每次提交的记录数
+COMMIT_BATCH = 500
+
+_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS images (
+        path TEXT PRIMARY KEY,
+        seq INTEGER,
+        mtime REAL,
+        size INTEGER,
+        width INTEGER,
+        height INTEGER,
+        format TEXT,
+        ann_mtime REAL,
+        box_count INTEGER,
+        verified INTEGER,
+        labels TEXT,
+        info_mtime REAL,
+        info TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS images_seq ON images (seq)',
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+)
+
+_COLUMNS = ('path', 'seq', 'mtime', 'size', 'width', 'height', 'format', 'ann_mtime',
+            'box_count', 'verified', 'labels', 'info_mtime', 'info')
+
+
+def annotationPaths(imagePath, annotationDir=None):
+    """
+    获取图片对应的VOC及YOLO标注文件路径
+
+    @param {str} imagePath - 图片路径
+    @param {str} annotationDir=None - 标注文件保存目录, 不传代表与图片同目录
+
+    @returns {tuple} - (xml路径, txt路径)
+    """
+    _base = os.path.splitext(imagePath)[0]
+    if annotationDir is not None:
+        _base = os.path.join(annotationDir, os.path.basename(_base))
+    return _base + XML_EXT, _base + TXT_EXT
+
+
+def infoPath(imagePath):
+    """
+    获取图片对应的信息文件路径, 优先使用图片独有的信息文件
+
+    @param {str} imagePath - 图片路径
+
+    @returns {str} - 信息文件路径, 不存在返回None
+    """
+    _path = os.path.splitext(imagePath)[0] + '.info'
+    if os.path.exists(_path):
+        return _path
+    _path = os.path.join(os.path.dirname(imagePath), 'info.json')
+    if os.path.exists(_path):
+        return _path
+    return None
+
+
+def readInfo(path):
+    """
+    读取信息文件内容
+
+    @param {str} path - 信息文件路径
+
+    @returns {dict} - 信息字典, 读取失败返回None
+    """
+    try:
+        with open(path, 'rb') as f:
+            _text = str(f.read(), encoding='utf-8')
+        try:
+            # 信息文件通过str(dict)生成
+            return ast.literal_eval(_text)
+        except (ValueError, SyntaxError):
+            return json.loads(_text)
+    except:
+        return None
+
+
+def readVocAnnotation(path):
+    """
+    读取VOC标注文件的标签清单及检查状态
+
+    @param {str} path - xml文件路径
+
+    @returns {tuple} - (标签清单, 是否已检查)
+    """
+    _root = ElementTree.parse(path).getroot()
+    _labels = [_obj.findtext('name', '') for _obj in _root.findall('object')]
+    return _labels, _root.get('verified') == 'yes'
+
+
+def readYoloAnnotation(path):
+    """
+    读取YOLO标注文件的标签清单
+
+    @param {str} path - txt文件路径
+
+    @returns {tuple} - (标签清单, 是否已检查), YOLO格式没有检查状态
+    """
+    _classes = []
+    _classes_file = os.path.join(os.path.dirname(path), 'classes.txt')
+    if os.path.exists(_classes_file):
+        with open(_classes_file, 'r', encoding='utf-8') as f:
+            _classes = f.read().strip('\n').split('\n')
+
+    _labels = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for _line in f:
+            _parts = _line.split()
+            if not _parts:
+                continue
+            _index = int(_parts[0])
+            _labels.append(_classes[_index] if _index < len(_classes) else _parts[0])
+    return _labels, False
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class DatasetIndex(object):
+    """
+    每个数据集一个SQLite索引, 每张图片一行记录:
+    路径、修改时间、文件大小、像素尺寸、标注格式、标注数量、检查状态、标签清单及信息文件属性
+    重新打开数据集时根据修改时间增量更新, 连接可在多个线程中使用
+    """
+
+    def __init__(self, rootDir, dbPath=None):
+        """
+        构造函数
+
+        @param {str} rootDir - 数据集根目录
+        @param {str} dbPath=None - 索引文件路径, 不传则保存在数据集根目录下
+        """
+        self.rootDir = os.path.abspath(rootDir)
+        self.dbPath = dbPath if dbPath is not None else os.path.join(self.rootDir, INDEX_FILE_NAME)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.dbPath, check_same_thread=False)
+        with self._lock:
+            for _sql in _SCHEMA:
+                self._conn.execute(_sql)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def contains(self, path):
+        """
+        判断路径是否在数据集根目录下
+
+        @param {str} path - 文件或目录路径
+
+        @returns {bool} - 在根目录下返回True
+        """
+        _path = os.path.abspath(path)
+        return _path == self.rootDir or _path.startswith(self.rootDir + os.sep)
+
+    def get(self, path):
+        """
+        获取图片的索引记录
+
+        @param {str} path - 图片路径
+
+        @returns {dict} - 索引记录, 不存在返回None
+        """
+        with self._lock:
+            _row = self._conn.execute(
+                'SELECT %s FROM images WHERE path = ?' % ', '.join(_COLUMNS), (self._key(path),)
+            ).fetchone()
+        if _row is None:
+            return None
+        return self._toRecord(_row)
+
+    def paths(self):
+        """
+        按上次扫描的顺序获取所有图片路径
+
+        @returns {list} - 图片绝对路径清单
+        """
+        with self._lock:
+            _rows = self._conn.execute('SELECT path FROM images ORDER BY seq').fetchall()
+        return [os.path.join(self.rootDir, _row[0]) for _row in _rows]
+
+    def records(self, path=None):
+        """
+        遍历索引记录
+
+        @param {str} path=None - 只返回该目录下的图片记录, 不传代表所有记录
+
+        @returns {iter} - 索引记录
+        """
+        _sql = 'SELECT %s FROM images' % ', '.join(_COLUMNS)
+        _args = ()
+        if path is not None and os.path.abspath(path) != self.rootDir:
+            _sql += ' WHERE path LIKE ? ESCAPE \'\\\''
+            _prefix = self._key(path).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            _args = (_prefix + os.sep.replace('\\', '\\\\') + '%',)
+        with self._lock:
+            _rows = self._conn.execute(_sql + ' ORDER BY seq', _args).fetchall()
+        for _row in _rows:
+            yield self._toRecord(_row)
+
+    def reconcile(self, paths, annotationDir=None, stopFlag=None):
+        """
+        根据文件修改时间增量更新索引, 不在清单中的记录将被删除
+
+        @param {list} paths - 数据集当前的图片路径清单(有序)
+        @param {str} annotationDir=None - 标注文件保存目录, 不传代表与图片同目录
+        @param {function} stopFlag=None - 返回True时中止更新
+
+        @returns {tuple} - (更新的记录数, 删除的记录数), 中止时返回None
+        """
+        with self._lock:
+            _known = dict(
+                (_row[0], _row[1:]) for _row in self._conn.execute(
+                    'SELECT path, seq, mtime, size, ann_mtime, info_mtime FROM images')
+            )
+            # 标注目录变化后所有记录的标注信息都需要重新读取
+            _row = self._conn.execute('SELECT value FROM meta WHERE key = ?', ('annotationDir',)).fetchone()
+            _same_dir = _row is not None and _row[0] == (annotationDir or '')
+
+        _updated = 0
+        _batch = []
+        _seqs = []
+        _keys = set()
+        for _seq, _path in enumerate(paths):
+            if stopFlag is not None and stopFlag():
+                return None
+
+            _key = self._key(_path)
+            _keys.add(_key)
+            _old = _known.get(_key, None)
+            try:
+                _stat = os.stat(_path)
+            except OSError:
+                continue
+
+            _xml, _txt = annotationPaths(_path, annotationDir)
+            _ann_mtime = _mtime(_xml) or _mtime(_txt)
+            _info = infoPath(_path)
+            _info_mtime = _mtime(_info) if _info else None
+            if _same_dir and _old is not None and \
+                    _old[1:] == (_stat.st_mtime, _stat.st_size, _ann_mtime, _info_mtime):
+                if _old[0] != _seq:
+                    _seqs.append((_seq, _key))
+                continue
+
+            _batch.append(self._scan(_path, _seq, _stat, annotationDir))
+            _updated += 1
+            if len(_batch) + len(_seqs) >= COMMIT_BATCH:
+                self._write(_batch, _seqs)
+                _batch, _seqs = [], []
+
+        self._write(_batch, _seqs)
+
+        _removed = [(_key,) for _key in _known if _key not in _keys]
+        with self._lock:
+            self._conn.executemany('DELETE FROM images WHERE path = ?', _removed)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('annotationDir', annotationDir or ''))
+            self._conn.commit()
+        return _updated, len(_removed)
+
+    def refresh(self, path, annotationDir=None):
+        """
+        重新登记单个图片的索引记录, 用于保存标注后更新
+
+        @param {str} path - 图片路径
+        @param {str} annotationDir=None - 标注文件保存目录, 不传代表与图片同目录
+        """
+        _key = self._key(path)
+        with self._lock:
+            _row = self._conn.execute('SELECT seq FROM images WHERE path = ?', (_key,)).fetchone()
+            _seq = _row[0] if _row is not None else len(self)
+        try:
+            _stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._conn.execute('DELETE FROM images WHERE path = ?', (_key,))
+                self._conn.commit()
+            return
+        self._write([self._scan(path, _seq, _stat, annotationDir)], [])
+
+    def remove(self, path):
+        """
+        删除图片的索引记录
+
+        @param {str} path - 图片路径
+        """
+        with self._lock:
+            self._conn.execute('DELETE FROM images WHERE path = ?', (self._key(path),))
+            self._conn.commit()
+
+    #############################
+    # 内部函数
+    #############################
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.rootDir)
+
+    def _toRecord(self, row):
+        _record = dict(zip(_COLUMNS, row))
+        _record['path'] = os.path.join(self.rootDir, _record['path'])
+        _record['verified'] = bool(_record['verified'])
+        _record['labels'] = json.loads(_record['labels']) if _record['labels'] else []
+        _record['info'] = json.loads(_record['info']) if _record['info'] else None
+        return _record
+
+    def _scan(self, path, seq, stat, annotationDir):
+        """
+        读取图片文件头、标注文件及信息文件, 生成索引记录
+        """
+        _size = QImageReader(path).size()
+        _xml, _txt = annotationPaths(path, annotationDir)
+        _format = None
+        _ann_mtime = None
+        _labels = []
+        _verified = False
+        try:
+            if os.path.isfile(_xml):
+                _format = FORMAT_VOC
+                _ann_mtime = _mtime(_xml)
+                _labels, _verified = readVocAnnotation(_xml)
+            elif os.path.isfile(_txt):
+                _format = FORMAT_YOLO
+                _ann_mtime = _mtime(_txt)
+                _labels, _verified = readYoloAnnotation(_txt)
+        except:
+            print('index annotation error: %s\r\n%s' % (path, traceback.format_exc()))
+
+        _info = None
+        _info_mtime = None
+        _info_file = infoPath(path)
+        if _info_file is not None:
+            _info_mtime = _mtime(_info_file)
+            _info = readInfo(_info_file)
+
+        return (
+            self._key(path), seq, stat.st_mtime, stat.st_size,
+            _size.width() if _size.isValid() else None,
+            _size.height() if _size.isValid() else None,
+            _format, _ann_mtime, len(_labels), int(_verified),
+            json.dumps(_labels, ensure_ascii=False),
+            _info_mtime,
+            json.dumps(_info, ensure_ascii=False) if _info is not None else None,
+        )
+
+    def _write(self, records, seqs):
+        if not records and not seqs:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO images (%s) VALUES (%s)' % (
+                    ', '.join(_COLUMNS), ', '.join('?' * len(_COLUMNS))),
+                records
+            )
+            self._conn.executemany('UPDATE images SET seq = ? WHERE path = ?', seqs)
+            self._conn.commit()
+
+
+class IndexReconciler(QThread):
+    """
+    在后台线程增量更新数据集索引
+    """
+    # 参数为: 更新的记录数, 删除的记录数
+    reconciled = pyqtSignal(int, int)
+
+    def __init__(self, index, paths, annotationDir=None, parent=None):
+        """
+        构造函数
+
+        @param {DatasetIndex} index - 数据集索引
+        @param {list} paths - 数据集当前的图片路径清单
+        @param {str} annotationDir=None - 标注文件保存目录
+        @param {QObject} parent=None - 父对象
+        """
+        super(IndexReconciler, self).__init__(parent)
+        self.index = index
+        self.paths = paths
+        self.annotationDir = annotationDir
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        try:
+            _result = self.index.reconcile(
+                self.paths, self.annotationDir, stopFlag=lambda: self._stopped)
+        except:
+            print('index reconcile error: %s\r\n%s' % (self.index.dbPath, traceback.format_exc()))
+            return
+        if _result is not None:
+            self.reconciled.emit(*_result)
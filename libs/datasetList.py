@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图片数据集清单
+@module datasetList
+@file datasetList.py
+"""
+
+import os
+from bisect import bisect_right
+
+
+class DatasetList(object):
+    """
+    有序的图片路径清单, 同时维护路径到位置的字典及当前位置
+    按路径查找位置、前后移动均为O(1), 可以像list一样使用
+    清单中的路径不允许重复
+
+    同时维护目录起始位置索引: 清单中连续的同一目录图片视为一个目录,
+    记录每个目录第一张图片的位置, 前后目录的查找为二分查找
+    """
+
+    def __init__(self, paths=None):
+        """
+        构造函数
+
+        @param {list} paths=None - 初始的图片路径清单
+        """
+        self._paths = []
+        self._positions = {}
+        # 各目录第一张图片的位置, None代表需要重建
+        self._dirStarts = []
+        # 当前图片的位置, -1代表没有当前图片
+        self.current = -1
+        if paths:
+            self.extend(paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __getitem__(self, key):
+        return self._paths[key]
+
+    def __contains__(self, path):
+        return path in self._positions
+
+    def index(self, path):
+        """
+        获取路径所在位置
+
+        @param {str} path - 图片路径
+
+        @returns {int} - 位置, 不存在时抛出ValueError异常
+        """
+        try:
+            return self._positions[path]
+        except KeyError:
+            raise ValueError('%s is not in list' % path)
+
+    def append(self, path):
+        self.extend([path])
+
+    def extend(self, paths):
+        _start = len(self._paths)
+        self._paths.extend(paths)
+        for _pos in range(_start, len(self._paths)):
+            self._positions[self._paths[_pos]] = _pos
+        if self._dirStarts is not None:
+            self._indexDirs(_start)
+
+    def remove(self, path):
+        """
+        删除指定路径, 并更新后续路径的位置及当前位置
+
+        @param {str} path - 要删除的图片路径
+        """
+        _pos = self.index(path)
+        del self._paths[_pos]
+        del self._positions[path]
+        for _i in range(_pos, len(self._paths)):
+            self._positions[self._paths[_i]] = _i
+        # 删除后可能合并相邻目录, 使用时再重建
+        self._dirStarts = None
+
+        if self.current > _pos:
+            self.current -= 1
+        elif self.current == _pos:
+            self.current = -1
+
+    def clear(self):
+        self._paths = []
+        self._positions = {}
+        self._dirStarts = []
+        self.current = -1
+
+    def setCurrent(self, path):
+        """
+        设置当前图片
+
+        @param {str} path - 图片路径
+
+        @returns {int} - 当前位置, 路径不在清单中返回-1
+        """
+        self.current = self._positions.get(path, -1)
+        return self.current
+
+    def currentPath(self):
+        """
+        获取当前图片路径
+
+        @returns {str} - 当前图片路径, 没有当前图片返回None
+        """
+        if self.current < 0:
+            return None
+        return self._paths[self.current]
+
+    def nextPath(self):
+        """
+        获取当前图片的下一张图片
+
+        @returns {str} - 图片路径, 没有当前图片或已是最后一张返回None
+        """
+        if self.current < 0 or self.current + 1 >= len(self._paths):
+            return None
+        return self._paths[self.current + 1]
+
+    def prevPath(self):
+        """
+        获取当前图片的上一张图片
+
+        @returns {str} - 图片路径, 没有当前图片或已是第一张返回None
+        """
+        if self.current <= 0:
+            return None
+        return self._paths[self.current - 1]
+
+    def dirCount(self):
+        """
+        获取目录数量
+
+        @returns {int} - 目录数量
+        """
+        return len(self._getDirStarts())
+
+    def dirIndex(self, pos):
+        """
+        获取指定位置图片所在目录的序号
+
+        @param {int} pos - 图片位置
+
+        @returns {int} - 目录序号(从0开始), 位置无效返回-1
+        """
+        if pos < 0 or pos >= len(self._paths):
+            return -1
+        return bisect_right(self._getDirStarts(), pos) - 1
+
+    def dirStart(self, index):
+        """
+        获取指定目录第一张图片的位置
+
+        @param {int} index - 目录序号(从0开始)
+
+        @returns {int} - 图片位置, 序号无效返回-1
+        """
+        _starts = self._getDirStarts()
+        if 0 <= index < len(_starts):
+            return _starts[index]
+        return -1
+
+    def nextDirStart(self, pos):
+        """
+        获取下一个目录第一张图片的位置
+
+        @param {int} pos - 当前图片位置
+
+        @returns {int} - 图片位置, 没有下一个目录返回-1
+        """
+        _index = self.dirIndex(pos)
+        if _index < 0:
+            return -1
+        return self.dirStart(_index + 1)
+
+    def prevDirStart(self, pos):
+        """
+        获取上一个目录第一张图片的位置
+
+        @param {int} pos - 当前图片位置
+
+        @returns {int} - 图片位置, 没有上一个目录返回-1
+        """
+        _index = self.dirIndex(pos)
+        if _index <= 0:
+            return -1
+        return self.dirStart(_index - 1)
+
+    #############################
+    # 内部函数
+    #############################
+    def _getDirStarts(self):
+        if self._dirStarts is None:
+            self._dirStarts = []
+            self._indexDirs(0)
+        return self._dirStarts
+
+    def _indexDirs(self, start):
+        """
+        从指定位置开始登记目录起始位置
+        """
+        _last_dir = os.path.dirname(self._paths[start - 1]) if start > 0 else None
+        for _pos in range(start, len(self._paths)):
+            _dir = os.path.dirname(self._paths[_pos])
+            if _dir != _last_dir:
+                self._dirStarts.append(_pos)
+                _last_dir = _dir
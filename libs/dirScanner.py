@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台流式扫描目录中的图片文件
+@module dirScanner
+@file dirScanner.py
+"""
+
+import os
+import time
+
+try:
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtCore import *
+
+from libs.utils import natural_key
+from libs.ustr import ustr
+
+
+def iterImageFiles(folderPath, extensions):
+    """
+    按自然排序顺序遍历目录下的所有图片文件
+
+    每个目录的内容按名称自然排序后深度优先遍历(子目录名称后补'/'参与排序),
+    得到的顺序与对完整路径做自然排序的结果一致, 因此可以边扫描边使用
+
+    @param {str} folderPath - 要扫描的目录
+    @param {tuple} extensions - 图片文件扩展名清单(小写, 带'.')
+
+    @returns {iter} - 图片文件的绝对路径
+    """
+    _stack = [(True, os.path.abspath(folderPath))]
+    while _stack:
+        _is_dir, _path = _stack.pop()
+        if not _is_dir:
+            yield ustr(_path)
+            continue
+
+        _entries = []
+        try:
+            with os.scandir(_path) as _it:
+                for _entry in _it:
+                    try:
+                        _entry_is_dir = _entry.is_dir()
+                    except OSError:
+                        _entry_is_dir = False
+                    if _entry_is_dir:
+                        if not _entry.is_symlink():
+                            # 与os.walk一致, 不进入链接的目录
+                            _entries.append((natural_key(_entry.name.lower() + '/'), True, _entry.path))
+                    elif _entry.name.lower().endswith(extensions):
+                        _entries.append((natural_key(_entry.name.lower()), False, _entry.path))
+        except OSError:
+            continue
+
+        # 逆序压栈, 出栈时即为排序后的顺序
+        _entries.sort(key=lambda _e: _e[0], reverse=True)
+        _stack.extend((_e[1], _e[2]) for _e in _entries)
+
+
+class DirScanner(QThread):
+    """
+    在后台线程扫描目录, 按批次通过imagesFound信号返回找到的图片
+    """
+    # 参数为: 本批次找到的图片路径清单
+    imagesFound = pyqtSignal(object)
+    # 参数为: 找到的图片总数
+    scanFinished = pyqtSignal(int)
+
+    def __init__(self, folderPath, extensions, chunkSize=2000, interval=0.2, parent=None):
+        """
+        构造函数
+
+        @param {str} folderPath - 要扫描的目录
+        @param {tuple} extensions - 图片文件扩展名清单(小写, 带'.')
+        @param {int} chunkSize=2000 - 每批次最多返回的图片数量
+        @param {float} interval=0.2 - 两个批次之间的最长间隔(秒)
+        @param {QObject} parent=None - 父对象
+        """
+        super(DirScanner, self).__init__(parent)
+        self.folderPath = folderPath
+        self.extensions = tuple(extensions)
+        self.chunkSize = chunkSize
+        self.interval = interval
+        self._stopped = False
+
+    def stop(self):
+        """
+        通知扫描线程停止
+        """
+        self._stopped = True
+
+    def run(self):
+        _total = 0
+        _chunk = []
+        _last_emit = time.time()
+        for _path in iterImageFiles(self.folderPath, self.extensions):
+            if self._stopped:
+                return
+
+            _chunk.append(_path)
+            # 第一张图片马上返回, 以便尽快打开
+            if _total == 0 or len(_chunk) >= self.chunkSize or time.time() - _last_emit >= self.interval:
+                _total += len(_chunk)
+                self.imagesFound.emit(_chunk)
+                _chunk = []
+                _last_emit = time.time()
+
+        if self._stopped:
+            return
+
+        if _chunk:
+            _total += len(_chunk)
+            self.imagesFound.emit(_chunk)
+        self.scanFinished.emit(_total)
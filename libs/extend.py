@@ -250,16 +250,21 @@ class TFRecordCreater(object):
             yield [-1, -1, False, {}]
 
     @classmethod
-    def labelimg_flags_count(cls, input_path: str, mapping: dict):
+    def labelimg_flags_count(cls, input_path: str, mapping: dict, index=None):
         """
         统计指定目录中的labelimg标记对应标签的数量
 
         @param {str} input_path - 要统计的目录
         @param {dict} mapping - mapping.json的字典
+        @param {DatasetIndex} index=None - 数据集索引, 传入时直接从索引统计, 不再解析标注文件
 
         @returns {iter_list} - 通过yield返回的处理进度信息清单
             [总文件数int, 当前已处理文件数int, 是否成功, 统计结果字典(标签名, 数量)]
         """
+        if index is not None:
+            yield from cls._labelimg_flags_count_by_index(input_path, mapping, index)
+            return
+
         try:
             # 遍历所有文件夹，获取需要处理的文件数量
             _file_list = cls._get_labelimg_annotation_file_list(input_path)
@@ -307,6 +312,49 @@ class TFRecordCreater(object):
             print('labelimg_flags_count error: %s\r\n%s' % (input_path, traceback.format_exc()))
             yield [-1, -1, False]
 
+    @classmethod
+    def _labelimg_flags_count_by_index(cls, input_path: str, mapping: dict, index):
+        """
+        通过数据集索引统计labelimg标记对应标签的数量, 返回信息与labelimg_flags_count一致
+        """
+        try:
+            # 与标注文件清单的规则一致: 只统计有VOC标注的jpg图片
+            _records = [
+                _record for _record in index.records(input_path)
+                if _record['format'] == 'VOC' and _record['path'].endswith('.jpg')
+            ]
+            _total = len(_records)
+            _flags_count = dict()
+            yield [0, _total, True, _flags_count]
+
+            for _deal_num, _record in enumerate(_records):
+                if _deal_num > 0 and _deal_num % 1000 == 0:
+                    yield [_deal_num, _total, True, _flags_count]
+
+                _info_dict = dict()
+                if _record['info'] is not None:
+                    _info_dict = copy.deepcopy(mapping['info_key_dict'])
+                    for _key in _info_dict:
+                        if _key in _record['info'].keys():
+                            _info_dict[_key] = _record['info'][_key]
+
+                for _member_class in _record['labels']:
+                    if _member_class == mapping['set_by_info']['class_name']:
+                        # 需要转换为当前类型
+                        if mapping['set_by_info']['info_tag'] in _info_dict.keys():
+                            _member_class = _info_dict[mapping['set_by_info']['info_tag']]
+
+                    if _member_class in _flags_count.keys():
+                        _flags_count[_member_class] += 1
+                    else:
+                        _flags_count[_member_class] = 1
+
+            # 返回结果
+            yield [_total, _total, True, _flags_count]
+        except:
+            print('labelimg_flags_count error: %s\r\n%s' % (input_path, traceback.format_exc()))
+            yield [-1, -1, False]
+
     @classmethod
     def labelimg_copy_flags_pics(cls, input_path: str, output_path: str, use_mapping: bool = False,
                                  mapping: dict = None):
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件清单的数据模型
+@module fileListModel
+@file fileListModel.py
+"""
+
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+from libs.utils import newIcon
+
+
+# 标注状态
+STATUS_NONE, STATUS_ANNOTATED, STATUS_VERIFIED = range(3)
+
+
+class FileListModel(QAbstractListModel):
+    """
+    直接基于图片路径清单的列表模型, 配合QListView使用
+    行内容在显示时才生成, 标注状态在显示时才获取并只缓存有限数量,
+    内存占用不随数据集大小增长
+    """
+
+    def __init__(self, images, statusProvider=None, maxStatusCache=4096, parent=None):
+        """
+        构造函数
+
+        @param {DatasetList} images - 图片路径清单, 修改清单需通过模型的方法处理
+        @param {function} statusProvider=None - 获取标注状态的函数, 传入图片路径,
+            返回STATUS_NONE/STATUS_ANNOTATED/STATUS_VERIFIED
+        @param {int} maxStatusCache=4096 - 最多缓存的标注状态数量
+        @param {QObject} parent=None - 父对象
+        """
+        super(FileListModel, self).__init__(parent)
+        self.images = images
+        self.statusProvider = statusProvider
+        self.maxStatusCache = maxStatusCache
+        self._status = OrderedDict()
+        self._icons = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.images):
+            return None
+
+        path = self.images[index.row()]
+        if role == Qt.DisplayRole:
+            return path
+        elif role == Qt.DecorationRole:
+            status = self.status(path)
+            if status == STATUS_NONE:
+                return None
+            if self._icons is None:
+                self._icons = {
+                    STATUS_ANNOTATED: newIcon('done'),
+                    STATUS_VERIFIED: newIcon('verify'),
+                }
+            return self._icons[status]
+        elif role == Qt.ToolTipRole:
+            return path
+        return None
+
+    def pathAt(self, row):
+        """
+        获取指定行的图片路径
+
+        @param {int} row - 行号
+
+        @returns {str} - 图片路径, 行号无效返回None
+        """
+        if 0 <= row < len(self.images):
+            return self.images[row]
+        return None
+
+    def status(self, path):
+        """
+        获取图片的标注状态, 结果按LRU缓存
+
+        @param {str} path - 图片路径
+
+        @returns {int} - 标注状态
+        """
+        status = self._status.get(path, None)
+        if status is not None:
+            self._status.move_to_end(path)
+            return status
+
+        status = self.statusProvider(path) if self.statusProvider else STATUS_NONE
+        self._status[path] = status
+        while len(self._status) > self.maxStatusCache:
+            self._status.popitem(last=False)
+        return status
+
+    def appendPaths(self, paths):
+        """
+        在清单末尾添加图片
+
+        @param {list} paths - 图片路径清单
+        """
+        if not paths:
+            return
+        start = len(self.images)
+        self.beginInsertRows(QModelIndex(), start, start + len(paths) - 1)
+        self.images.extend(paths)
+        self.endInsertRows()
+
+    def removePath(self, path):
+        """
+        从清单中删除图片
+
+        @param {str} path - 图片路径
+        """
+        if path not in self.images:
+            return
+        row = self.images.index(path)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.images.remove(path)
+        self._status.pop(path, None)
+        self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.images.clear()
+        self._status.clear()
+        self.endResetModel()
+
+    def refreshStatus(self, path=None):
+        """
+        标注文件变化后刷新标注状态
+
+        @param {str} path=None - 图片路径, 不传代表刷新所有图片
+        """
+        if path is None:
+            self._status.clear()
+            if len(self.images) > 0:
+                self.dataChanged.emit(self.index(0), self.index(len(self.images) - 1))
+            return
+
+        self._status.pop(path, None)
+        if path in self.images:
+            index = self.index(self.images.index(path))
+            self.dataChanged.emit(index, index)
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图片预读及解码缓存
+@module imageCache
+@file imageCache.py
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+# 默认缓存大小(MB)
+DEFAULT_CACHE_SIZE = 512
+# 默认预读的后续图片数量
+DEFAULT_PREFETCH_NEXT = 3
+# 默认预读的前面图片数量
+DEFAULT_PREFETCH_PREV = 1
+# 缩小解码的图片显示尺寸超过解码尺寸的倍数后加载原图
+FULL_IMAGE_ZOOM_THRESHOLD = 1.2
+
+
+def imageBytes(image):
+    """
+    获取解码后图片占用的内存大小
+
+    @param {QImage} image - 图片对象
+
+    @returns {int} - 字节数
+    """
+    if hasattr(image, 'sizeInBytes'):
+        return image.sizeInBytes()
+    return image.byteCount()
+
+
+def decodeImageData(data, maxSize=None):
+    """
+    解码图片数据, 图片超过指定大小时直接按缩小的尺寸解码
+    JPEG等格式的解码插件支持缩放解码, 比解码完整图片后再缩放快得多
+
+    @param {bytes} data - 图片文件原始数据
+    @param {QSize} maxSize=None - 解码的最大尺寸, 不传代表按原始尺寸解码
+
+    @returns {tuple} - (image, imageSize), imageSize为图片原始尺寸, 解码失败时image.isNull()
+    """
+    _buffer = QBuffer()
+    _buffer.setData(QByteArray(data))
+    _buffer.open(QIODevice.ReadOnly)
+    _reader = QImageReader(_buffer)
+    _size = _reader.size()
+    if maxSize is not None and _size.isValid() and \
+            (_size.width() > maxSize.width() or _size.height() > maxSize.height()):
+        _reader.setScaledSize(_size.scaled(maxSize, Qt.KeepAspectRatio))
+
+    _image = _reader.read()
+    if not _size.isValid():
+        _size = _image.size()
+    return _image, _size
+
+
+def decodeImageFile(path, maxSize=None):
+    """
+    读取并解码图片文件
+
+    @param {str} path - 图片文件路径
+    @param {QSize} maxSize=None - 解码的最大尺寸, 不传代表按原始尺寸解码
+
+    @returns {tuple} - (mtime, data, image, imageSize), 读取或解码失败返回None
+    """
+    try:
+        _mtime = os.path.getmtime(path)
+        with open(path, 'rb') as f:
+            _data = f.read()
+    except (IOError, OSError):
+        return None
+
+    _image, _size = decodeImageData(_data, maxSize)
+    if _image.isNull():
+        return None
+
+    return _mtime, _data, _image, _size
+
+
+class ImageCache(object):
+    """
+    按内存大小限制的LRU图片缓存, 线程安全
+    缓存内容为图片文件原始数据、解码后的QImage及图片原始尺寸,
+    QImage可能是缩小尺寸解码的结果
+    """
+
+    def __init__(self, maxBytes=DEFAULT_CACHE_SIZE * 1024 * 1024):
+        """
+        构造函数
+
+        @param {int} maxBytes - 缓存允许占用的最大字节数
+        """
+        self.maxBytes = maxBytes
+        self.currentBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # path -> (mtime, data, image, imageSize, cost)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._items
+
+    def get(self, path):
+        """
+        获取缓存的图片, 文件修改时间发生变化的缓存将失效
+
+        @param {str} path - 图片文件路径
+
+        @returns {tuple} - (data, image, imageSize), 未命中返回None
+        """
+        try:
+            _mtime = os.path.getmtime(path)
+        except OSError:
+            _mtime = None
+
+        with self._lock:
+            _item = self._items.get(path, None)
+            if _item is not None and _item[0] != _mtime:
+                # 文件已被修改, 丢弃缓存
+                self._discard(path)
+                _item = None
+
+            if _item is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(path)
+            self.hits += 1
+            return _item[1], _item[2], _item[3]
+
+    def put(self, path, data, image, mtime=None, imageSize=None):
+        """
+        放入缓存, 超出大小限制时淘汰最久未使用的图片
+
+        @param {str} path - 图片文件路径
+        @param {bytes} data - 图片文件原始数据
+        @param {QImage} image - 解码后的图片
+        @param {float} mtime=None - 读取时的文件修改时间, 不传则重新获取
+        @param {QSize} imageSize=None - 图片原始尺寸, 不传代表与image尺寸一致
+        """
+        if mtime is None:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return
+
+        _cost = len(data) + imageBytes(image)
+        with self._lock:
+            self._discard(path)
+            if _cost > self.maxBytes:
+                # 单张图片已超过缓存大小, 不缓存
+                return
+
+            self._items[path] = (mtime, data, image, imageSize if imageSize is not None else image.size(), _cost)
+            self.currentBytes += _cost
+            self._evict()
+
+    def remove(self, path):
+        """
+        删除指定图片的缓存
+
+        @param {str} path - 图片文件路径
+        """
+        with self._lock:
+            self._discard(path)
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._items.clear()
+            self.currentBytes = 0
+
+    def setMaxBytes(self, maxBytes):
+        """
+        修改缓存大小限制
+
+        @param {int} maxBytes - 缓存允许占用的最大字节数
+        """
+        with self._lock:
+            self.maxBytes = maxBytes
+            self._evict()
+
+    def stats(self):
+        """
+        获取缓存统计信息
+
+        @returns {dict} - 统计信息字典
+        """
+        with self._lock:
+            _total = self.hits + self.misses
+            return {
+                'count': len(self._items),
+                'bytes': self.currentBytes,
+                'maxBytes': self.maxBytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': (self.hits / _total) if _total > 0 else 0.0,
+            }
+
+    #############################
+    # 内部函数
+    #############################
+    def _discard(self, path):
+        _item = self._items.pop(path, None)
+        if _item is not None:
+            self.currentBytes -= _item[4]
+
+    def _evict(self):
+        while self.currentBytes > self.maxBytes and self._items:
+            _path, _item = self._items.popitem(last=False)
+            self.currentBytes -= _item[4]
+
+
+class DecodeTask(QRunnable):
+    """
+    后台解码图片的任务
+    """
+
+    def __init__(self, prefetcher, path, maxSize=None):
+        super(DecodeTask, self).__init__()
+        self.prefetcher = prefetcher
+        self.path = path
+        self.maxSize = maxSize
+
+    def run(self):
+        try:
+            _result = decodeImageFile(self.path, self.maxSize)
+            if _result is not None:
+                _mtime, _data, _image, _size = _result
+                self.prefetcher.cache.put(self.path, _data, _image, mtime=_mtime, imageSize=_size)
+        finally:
+            self.prefetcher.taskDone(self.path)
+
+
+class ImagePrefetcher(object):
+    """
+    通过工作线程预读图片到缓存中
+    """
+
+    def __init__(self, cache, threadCount=2, maxSize=None):
+        """
+        构造函数
+
+        @param {ImageCache} cache - 存放解码结果的缓存
+        @param {int} threadCount=2 - 工作线程数量
+        @param {QSize} maxSize=None - 解码的最大尺寸, 不传代表按原始尺寸解码
+        """
+        self.cache = cache
+        self.maxSize = maxSize
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(threadCount)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def prefetch(self, paths):
+        """
+        预读图片清单, 清单顺序即为优先级顺序
+        之前排队但尚未开始的任务会被取消
+
+        @param {list} paths - 要预读的图片路径清单
+        """
+        self.cancel()
+        _priority = len(paths)
+        for _path in paths:
+            _priority -= 1
+            if _path in self.cache:
+                continue
+
+            with self._lock:
+                if _path in self._pending:
+                    continue
+                self._pending.add(_path)
+
+            _task = DecodeTask(self, _path, self.maxSize)
+            _task.setAutoDelete(True)
+            self.pool.start(_task, _priority)
+
+    def cancel(self):
+        """
+        取消排队中尚未开始的预读任务
+        """
+        self.pool.clear()
+        with self._lock:
+            self._pending.clear()
+
+    def taskDone(self, path):
+        with self._lock:
+            self._pending.discard(path)
+
+    def shutdown(self, msecs=1000):
+        """
+        停止预读并等待正在执行的任务完成
+
+        @param {int} msecs=1000 - 最长等待时间(毫秒)
+        """
+        self.cancel()
+        self.pool.waitForDone(msecs)
+
+
+class FullImageTask(QRunnable):
+    """
+    后台按原始尺寸解码图片的任务
+    """
+
+    def __init__(self, loader, path):
+        super(FullImageTask, self).__init__()
+        self.loader = loader
+        self.path = path
+
+    def run(self):
+        _result = decodeImageFile(self.path)
+        if _result is None:
+            self.loader.loaded.emit(self.path, None)
+            return
+
+        _mtime, _data, _image, _size = _result
+        self.loader.cache.put(self.path, _data, _image, mtime=_mtime, imageSize=_size)
+        self.loader.loaded.emit(self.path, _image)
+
+
+class FullImageLoader(QObject):
+    """
+    缩小尺寸显示的图片放大后, 在后台加载原始尺寸的图片
+    结果通过loaded信号返回主线程, 并放入缓存替换缩小的图片
+    """
+    # 参数为: 图片路径, 原始尺寸的图片(失败为None)
+    loaded = pyqtSignal(str, object)
+
+    def __init__(self, cache, parent=None):
+        """
+        构造函数
+
+        @param {ImageCache} cache - 存放解码结果的缓存
+        @param {QObject} parent=None - 父对象
+        """
+        super(FullImageLoader, self).__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self._pending = None
+        self.loaded.connect(self._loaded)
+
+    def request(self, path):
+        """
+        请求加载原始尺寸的图片, 同一图片只加载一次
+
+        @param {str} path - 图片路径
+        """
+        if path == self._pending:
+            return
+
+        self.cancel()
+        self._pending = path
+        _task = FullImageTask(self, path)
+        _task.setAutoDelete(True)
+        self.pool.start(_task)
+
+    def cancel(self):
+        self.pool.clear()
+        self._pending = None
+
+    def shutdown(self, msecs=1000):
+        self.cancel()
+        self.pool.waitForDone(msecs)
+
+    #############################
+    # 内部函数
+    #############################
+    def _loaded(self, path, image):
+        if path == self._pending:
+            self._pending = None
@@ -7,25 +7,32 @@ except ImportError:
     from PyQt4.QtCore import *
 
 from libs.utils import newIcon, labelValidator
+from libs.labelVocabulary import LabelVocabulary, DEFAULT_SEARCH_LIMIT
 
 BB = QDialogButtonBox
 
 
 class LabelDialog(QDialog):
+    """Label input dialog, meant to be created once and reused.
 
-    def __init__(self, text="Enter object label", parent=None, listItem=None):
+    The list below the edit shows at most listLimit labels from the shared
+    LabelVocabulary, filtered by prefix and fuzzy match as the user types, so
+    labels added to the vocabulary show up without rebuilding the dialog.
+    """
+
+    def __init__(self, text="Enter object label", parent=None, listItem=None,
+                 listLimit=DEFAULT_SEARCH_LIMIT):
         super(LabelDialog, self).__init__(parent)
 
+        self.labels = listItem if isinstance(listItem, LabelVocabulary) else LabelVocabulary(listItem)
+        self.listLimit = listLimit
+
         self.edit = QLineEdit()
         self.edit.setText(text)
         self.edit.setValidator(labelValidator())
         self.edit.editingFinished.connect(self.postProcess)
-
-        model = QStringListModel()
-        model.setStringList(listItem)
-        completer = QCompleter()
-        completer.setModel(model)
-        self.edit.setCompleter(completer)
+        self.edit.textEdited.connect(self.updateList)
+        self.edit.installEventFilter(self)
 
         layout = QVBoxLayout()
         layout.addWidget(self.edit)
@@ -36,16 +43,41 @@ class LabelDialog(QDialog):
         bb.rejected.connect(self.reject)
         layout.addWidget(bb)
 
-        if listItem is not None and len(listItem) > 0:
-            self.listWidget = QListWidget(self)
-            for item in listItem:
-                self.listWidget.addItem(item)
-            self.listWidget.itemClicked.connect(self.listItemClick)
-            self.listWidget.itemDoubleClicked.connect(self.listItemDoubleClick)
-            layout.addWidget(self.listWidget)
+        self.listWidget = QListWidget(self)
+        self.listWidget.setUniformItemSizes(True)
+        self.listWidget.itemClicked.connect(self.listItemClick)
+        self.listWidget.itemDoubleClicked.connect(self.listItemDoubleClick)
+        self.listWidget.currentItemChanged.connect(self.listCurrentChanged)
+        layout.addWidget(self.listWidget)
+        self.updateList()
 
         self.setLayout(layout)
 
+    def setLabels(self, labels):
+        self.labels = labels if isinstance(labels, LabelVocabulary) else LabelVocabulary(labels)
+        self.updateList()
+
+    def updateList(self, text=''):
+        """Show the best matches for text, or the recent labels followed by
+        the rest in their original order when empty."""
+        labels = self.labels.search(text, self.listLimit)
+        self.listWidget.blockSignals(True)
+        self.listWidget.setUpdatesEnabled(False)
+        self.listWidget.clear()
+        self.listWidget.addItems(labels)
+        self.listWidget.setUpdatesEnabled(True)
+        self.listWidget.blockSignals(False)
+        self.listWidget.setVisible(len(self.labels) > 0)
+
+    def eventFilter(self, obj, event):
+        # Down arrow in the edit moves into the match list.
+        if obj is self.edit and event.type() == QEvent.KeyPress \
+                and event.key() == Qt.Key_Down and self.listWidget.count():
+            self.listWidget.setFocus()
+            self.listWidget.setCurrentRow(0)
+            return True
+        return super(LabelDialog, self).eventFilter(obj, event)
+
     def validate(self):
         try:
             if self.edit.text().trimmed():
@@ -63,6 +95,7 @@ class LabelDialog(QDialog):
             self.edit.setText(self.edit.text())
 
     def popUp(self, text='', move=True):
+        self.updateList()
         self.edit.setText(text)
         self.edit.setSelection(0, len(text))
         self.edit.setFocus(Qt.PopupFocusReason)
@@ -81,3 +114,7 @@ class LabelDialog(QDialog):
     def listItemDoubleClick(self, tQListWidgetItem):
         self.listItemClick(tQListWidgetItem)
         self.validate()
+
+    def listCurrentChanged(self, current, previous):
+        if current is not None:
+            self.listItemClick(current)
@@ -2,9 +2,9 @@
 # Create by TzuTaLin <tzu.ta.lin@gmail.com>
 
 try:
-    from PyQt5.QtGui import QImage
+    from PyQt5.QtGui import QImage, QImageReader
 except ImportError:
-    from PyQt4.QtGui import QImage
+    from PyQt4.QtGui import QImage, QImageReader
 
 from base64 import b64encode, b64decode
 from libs.pascal_voc_io import PascalVocWriter
@@ -30,17 +30,15 @@ class LabelFile(object):
         self.verified = False
 
     def savePascalVocFormat(self, filename, shapes, imagePath, imageData,
-                            lineColor=None, fillColor=None, databaseSrc=None):
+                            lineColor=None, fillColor=None, databaseSrc=None, imageShape=None):
         imgFolderPath = os.path.dirname(imagePath)
         imgFolderName = os.path.split(imgFolderPath)[-1]
         imgFileName = os.path.basename(imagePath)
         #imgFileNameWithoutExt = os.path.splitext(imgFileName)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        image = QImage()
-        image.load(imagePath)
-        imageShape = [image.height(), image.width(),
-                      1 if image.isGrayscale() else 3]
+        if imageShape is None:
+            imageShape = LabelFile.readImageShape(imagePath)
         writer = PascalVocWriter(imgFolderName, imgFileName,
                                  imageShape, localImgPath=imagePath)
         writer.verified = self.verified
@@ -57,17 +55,15 @@ class LabelFile(object):
         return
 
     def saveYoloFormat(self, filename, shapes, imagePath, imageData, classList,
-                            lineColor=None, fillColor=None, databaseSrc=None):
+                            lineColor=None, fillColor=None, databaseSrc=None, imageShape=None):
         imgFolderPath = os.path.dirname(imagePath)
         imgFolderName = os.path.split(imgFolderPath)[-1]
         imgFileName = os.path.basename(imagePath)
         #imgFileNameWithoutExt = os.path.splitext(imgFileName)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        image = QImage()
-        image.load(imagePath)
-        imageShape = [image.height(), image.width(),
-                      1 if image.isGrayscale() else 3]
+        if imageShape is None:
+            imageShape = LabelFile.readImageShape(imagePath)
         writer = YOLOWriter(imgFolderName, imgFileName,
                                  imageShape, localImgPath=imagePath)
         writer.verified = self.verified
@@ -115,6 +111,37 @@ class LabelFile(object):
                     f, ensure_ascii=True, indent=2)
     '''
 
+    @staticmethod
+    def imageShapeOf(image, imageSize=None):
+        """[height, width, depth] of a decoded image. imageSize overrides the
+        size when the image was decoded at a reduced resolution."""
+        size = imageSize if imageSize is not None else image.size()
+        return [size.height(), size.width(), 1 if image.isGrayscale() else 3]
+
+    @staticmethod
+    def readImageShape(imagePath):
+        """[height, width, depth] of an image file, read from the file header.
+        Falls back to decoding when the header format does not tell whether
+        the image is grayscale (e.g. palette images)."""
+        reader = QImageReader(imagePath)
+        size = reader.size()
+        fmt = reader.imageFormat()
+        grayFormats = [QImage.Format_Mono, QImage.Format_MonoLSB]
+        colorFormats = [QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied,
+                        QImage.Format_RGB888, QImage.Format_RGB16]
+        if hasattr(QImage, 'Format_Grayscale8'):
+            grayFormats.append(QImage.Format_Grayscale8)
+        if hasattr(QImage, 'Format_Grayscale16'):
+            grayFormats.append(QImage.Format_Grayscale16)
+        if size.isValid() and fmt in grayFormats:
+            return [size.height(), size.width(), 1]
+        if size.isValid() and fmt in colorFormats:
+            return [size.height(), size.width(), 3]
+
+        image = QImage()
+        image.load(imagePath)
+        return LabelFile.imageShapeOf(image)
+
     @staticmethod
     def isLabelFile(filename):
         fileSuffix = os.path.splitext(filename)[1].lower()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+当前图片的标签数量统计
+@module labelHistogram
+@file labelHistogram.py
+"""
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+class LabelHistogram(QObject):
+    """
+    标签 -> 数量的统计, 增加/删除/改名均为O(1)
+    只有标签首次出现或数量减为0时才发出labelAdded/labelRemoved信号
+    """
+    # 新出现的标签
+    labelAdded = pyqtSignal(str)
+    # 数量减为0的标签
+    labelRemoved = pyqtSignal(str)
+    # 标签数量变化, 参数为: 标签, 新的数量
+    countChanged = pyqtSignal(str, int)
+    # 统计被清空
+    cleared = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(LabelHistogram, self).__init__(parent)
+        self._counts = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, label):
+        return label in self._counts
+
+    def count(self, label):
+        return self._counts.get(label, 0)
+
+    def labels(self):
+        """
+        获取所有标签
+
+        @returns {list} - 排序后的标签清单
+        """
+        return sorted(self._counts)
+
+    def items(self):
+        """
+        获取所有标签及数量
+
+        @returns {list} - (标签, 数量)清单, 按标签排序
+        """
+        return sorted(self._counts.items())
+
+    def add(self, label, count=1):
+        """
+        增加标签数量
+
+        @param {str} label - 标签
+        @param {int} count=1 - 增加的数量
+        """
+        label = label or ''
+        _count = self._counts.get(label, 0) + count
+        self._counts[label] = _count
+        if _count == count:
+            self.labelAdded.emit(label)
+        self.countChanged.emit(label, _count)
+
+    def addAll(self, labels):
+        """
+        批量增加标签数量, 每个标签只发出一次信号
+
+        @param {iterable} labels - 标签清单, 重复的标签累加数量
+        """
+        _counts = {}
+        for _label in labels:
+            _label = _label or ''
+            _counts[_label] = _counts.get(_label, 0) + 1
+        for _label, _count in _counts.items():
+            self.add(_label, _count)
+
+    def remove(self, label, count=1):
+        """
+        减少标签数量, 减为0时删除标签
+
+        @param {str} label - 标签
+        @param {int} count=1 - 减少的数量
+        """
+        label = label or ''
+        if label not in self._counts:
+            return
+        _count = self._counts[label] - count
+        if _count > 0:
+            self._counts[label] = _count
+            self.countChanged.emit(label, _count)
+        else:
+            del self._counts[label]
+            self.countChanged.emit(label, 0)
+            self.labelRemoved.emit(label)
+
+    def rename(self, old, new):
+        """
+        一个标注的标签由old改为new
+
+        @param {str} old - 原标签
+        @param {str} new - 新标签
+        """
+        if (old or '') == (new or ''):
+            return
+        self.remove(old)
+        self.add(new)
+
+    def clear(self):
+        self._counts.clear()
+        self.cleared.emit()
+
+
+class LabelStatsWidget(QTreeWidget):
+    """
+    标签统计面板, 按信号增量更新
+    """
+
+    def __init__(self, histogram, parent=None):
+        """
+        构造函数
+
+        @param {LabelHistogram} histogram - 标签统计
+        @param {QWidget} parent=None - 父控件
+        """
+        super(LabelStatsWidget, self).__init__(parent)
+        self.histogram = histogram
+        self._items = {}  # 标签 -> QTreeWidgetItem
+        self.setColumnCount(2)
+        self.setHeaderLabels(['标签', '数量'])
+        self.setRootIsDecorated(False)
+        self.setSortingEnabled(True)
+        self.sortByColumn(0, Qt.AscendingOrder)
+        histogram.countChanged.connect(self._countChanged)
+        histogram.cleared.connect(self._cleared)
+        for _label, _count in histogram.items():
+            self._countChanged(_label, _count)
+
+    #############################
+    # 内部函数
+    #############################
+    def _countChanged(self, label, count):
+        _item = self._items.get(label, None)
+        if count <= 0:
+            if _item is not None:
+                self.takeTopLevelItem(self.indexOfTopLevelItem(_item))
+                del self._items[label]
+            return
+
+        if _item is None:
+            _item = QTreeWidgetItem([label])
+            self._items[label] = _item
+            self.addTopLevelItem(_item)
+        # 按数值排序
+        _item.setData(1, Qt.DisplayRole, count)
+
+    def _cleared(self):
+        self._items.clear()
+        self.clear()
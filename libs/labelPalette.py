@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+标签颜色表, 缓存标签对应的颜色
+@module labelPalette
+@file labelPalette.py
+"""
+
+import hashlib
+import json
+import os
+
+try:
+    from PyQt5.QtGui import *
+except ImportError:
+    from PyQt4.QtGui import *
+
+from libs.ustr import ustr
+
+
+# 项目颜色表文件名, 保存在图片目录下
+PALETTE_FILE_NAME = '.labelImg_colors.json'
+# 未指定透明度时使用的默认透明度
+DEFAULT_ALPHA = 100
+
+
+def hashColor(text):
+    """
+    根据文本的哈希值生成颜色
+
+    @param {str} text - 文本
+
+    @returns {QColor} - 颜色
+    """
+    s = ustr(text)
+    hashCode = int(hashlib.sha256(s.encode('utf-8')).hexdigest(), 16)
+    r = int((hashCode / 255) % 255)
+    g = int((hashCode / 65025) % 255)
+    b = int((hashCode / 16581375) % 255)
+    return QColor(r, g, b, DEFAULT_ALPHA)
+
+
+def parseColor(value):
+    """
+    解析配置中的颜色值
+
+    @param {str|list} value - '#RRGGBB'格式的字符串(未指定透明度使用DEFAULT_ALPHA)、'#AARRGGBB'格式的字符串,
+        或[r, g, b]/[r, g, b, a]数组
+
+    @returns {QColor} - 颜色, 格式不正确返回None
+    """
+    if isinstance(value, (list, tuple)):
+        if len(value) not in (3, 4):
+            return None
+        _color = QColor(*[int(_v) for _v in value])
+        if len(value) == 3:
+            _color.setAlpha(DEFAULT_ALPHA)
+        return _color if _color.isValid() else None
+
+    _color = QColor(ustr(value))
+    if not _color.isValid():
+        return None
+    if len(ustr(value)) == 7:
+        _color.setAlpha(DEFAULT_ALPHA)
+    return _color
+
+
+def colorValue(color):
+    """
+    将颜色转换为可保存到json的数组
+
+    @param {QColor} color - 颜色
+
+    @returns {list} - [r, g, b, a]
+    """
+    return [color.red(), color.green(), color.blue(), color.alpha()]
+
+
+class LabelPalette(object):
+    """
+    标签 -> 颜色的缓存, 颜色来源优先级为: 固定颜色(mapping.json的label_colors) > 项目颜色表 > 哈希生成
+    返回的QColor对象为共享对象, 调用方不应修改
+    """
+
+    def __init__(self):
+        self._colors = {}  # 标签 -> QColor
+        self._pinned = {}  # 标签 -> QColor
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._colors)
+
+    def color(self, label):
+        """
+        获取标签对应的颜色
+
+        @param {str} label - 标签
+
+        @returns {QColor} - 颜色
+        """
+        _color = self._colors.get(label, None)
+        if _color is None:
+            _color = self._pinned.get(label, None)
+            if _color is None:
+                _color = hashColor(label)
+            self._colors[label] = _color
+            self._dirty = True
+        return _color
+
+    def pin(self, label, color):
+        """
+        固定标签的颜色
+
+        @param {str} label - 标签
+        @param {QColor} color - 颜色
+        """
+        self._pinned[label] = color
+        self._colors[label] = color
+        self._dirty = True
+
+    def setPinned(self, colors):
+        """
+        设置固定颜色, 替换原有的固定颜色
+
+        @param {dict} colors - 标签 -> 颜色值, 颜色值格式见parseColor, 格式不正确的忽略
+        """
+        for _label in self._pinned:
+            self._colors.pop(_label, None)
+        self._pinned = {}
+        for _label, _value in (colors or {}).items():
+            _color = parseColor(_value)
+            if _color is not None:
+                self.pin(_label, _color)
+
+    def load(self, path):
+        """
+        载入项目颜色表, 替换已缓存的非固定颜色
+
+        @param {str} path - 颜色表文件路径
+
+        @returns {int} - 载入的颜色数量, 文件不存在或无法解析返回0
+        """
+        self._colors = dict(self._pinned)
+        self._dirty = False
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r', encoding='utf-8') as _file:
+                _colors = json.loads(_file.read())
+        except (IOError, ValueError):
+            return 0
+
+        _count = 0
+        for _label, _value in _colors.items():
+            _color = parseColor(_value)
+            if _color is not None and _label not in self._pinned:
+                self._colors[_label] = _color
+                _count += 1
+        return _count
+
+    def save(self, path):
+        """
+        保存颜色表, 只保存非固定的颜色, 没有新增颜色时不写文件
+
+        @param {str} path - 颜色表文件路径
+
+        @returns {bool} - 是否写入了文件
+        """
+        if not self._dirty:
+            return False
+        with open(path, 'w', encoding='utf-8') as _file:
+            _file.write(json.dumps(
+                dict((_label, colorValue(_color)) for _label, _color in self._colors.items()
+                     if _label not in self._pinned),
+                ensure_ascii=False, indent=2, sort_keys=True
+            ))
+        self._dirty = False
+        return True
+
+
+# 进程内共享的标签颜色表
+LABEL_PALETTE = LabelPalette()
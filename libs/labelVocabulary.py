@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+标签词表, 提供前缀/模糊查找及最近使用排序
+@module labelVocabulary
+@file labelVocabulary.py
+"""
+
+import heapq
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+
+# 查找结果的默认数量上限
+DEFAULT_SEARCH_LIMIT = 200
+
+
+def fuzzyScore(key, text):
+    """
+    计算模糊匹配得分, text的字符需按顺序出现在key中
+
+    @param {str} key - 小写的标签
+    @param {str} text - 小写的查找内容
+
+    @returns {tuple} - 得分(越小越匹配): (首字符位置, 匹配跨度, 标签长度), 不匹配返回None
+    """
+    _start = _pos = key.find(text[0])
+    if _start < 0:
+        return None
+    for _char in text[1:]:
+        _pos = key.find(_char, _pos + 1)
+        if _pos < 0:
+            return None
+    return (_start, _pos - _start, len(key))
+
+
+class LabelVocabulary(object):
+    """
+    标签词表, 保持加入顺序(YOLO格式按该顺序生成分类序号), 同时维护:
+        集合索引 - O(1)判断标签是否存在及获取序号
+        排序索引 - 按小写标签排序, 二分查找前缀
+        最近使用 - 按最近使用时间排序
+    兼容list的in/append/index/迭代用法, 空标签也会保留在词表中, 只是不参与查找
+    """
+
+    def __init__(self, labels=None):
+        """
+        构造函数
+
+        @param {list} labels=None - 初始标签清单
+        """
+        self._labels = []  # 按加入顺序
+        self._positions = {}  # 标签 -> 加入顺序号
+        self._sorted = []  # (小写标签, 标签), 排序
+        self._recent = OrderedDict()  # 标签 -> None, 最近使用的在最后
+        for _label in labels or []:
+            self.add(_label)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __iter__(self):
+        return iter(self._labels)
+
+    def __contains__(self, label):
+        return label in self._positions
+
+    def __getitem__(self, index):
+        return self._labels[index]
+
+    def index(self, label):
+        """
+        获取标签的加入顺序号
+
+        @param {str} label - 标签
+
+        @returns {int} - 顺序号, 标签不存在抛出ValueError
+        """
+        try:
+            return self._positions[label]
+        except KeyError:
+            raise ValueError('%s is not in vocabulary' % label)
+
+    def add(self, label):
+        """
+        添加标签, 已存在的标签忽略
+
+        @param {str} label - 标签
+
+        @returns {bool} - 是否新增
+        """
+        if label is None or label in self._positions:
+            return False
+        self.append(label)
+        return True
+
+    def append(self, label):
+        """
+        与list.append一致, 总是添加到末尾(重复的标签index返回第一次的位置),
+        用于保持预定义分类文件中的行号即YOLO分类序号
+
+        @param {str} label - 标签
+        """
+        if label not in self._positions:
+            self._positions[label] = len(self._labels)
+            # 空标签不参与查找
+            if label:
+                insort(self._sorted, (label.lower(), label))
+        self._labels.append(label)
+
+    def use(self, label):
+        """
+        记录标签被使用, 标签不存在时先添加
+
+        @param {str} label - 标签
+        """
+        if not label:
+            return
+        self.add(label)
+        self._recent.pop(label, None)
+        self._recent[label] = None
+
+    def recent(self, limit=None):
+        """
+        获取最近使用的标签
+
+        @param {int} limit=None - 数量上限
+
+        @returns {list} - 标签清单, 最近使用的在前
+        """
+        _result = []
+        for _label in reversed(self._recent):
+            if limit is not None and len(_result) >= limit:
+                break
+            _result.append(_label)
+        return _result
+
+    def prefixMatches(self, prefix):
+        """
+        获取以指定内容开头的标签(不区分大小写)
+
+        @param {str} prefix - 前缀
+
+        @returns {list} - 标签清单, 按字母顺序
+        """
+        _key = prefix.lower()
+        _start = bisect_left(self._sorted, (_key,))
+        _result = []
+        for _index in range(_start, len(self._sorted)):
+            _sortKey, _label = self._sorted[_index]
+            if not _sortKey.startswith(_key):
+                break
+            _result.append(_label)
+        return _result
+
+    def search(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        查找标签, 前缀匹配的在前(其中最近使用的优先), 其余按模糊匹配得分排序
+        查找内容为空时返回最近使用的标签及按加入顺序的其余标签(即预定义分类文件中的顺序)
+
+        @param {str} text - 查找内容
+        @param {int} limit=DEFAULT_SEARCH_LIMIT - 数量上限
+
+        @returns {list} - 标签清单
+        """
+        _text = (text or '').strip().lower()
+        _rank = self._recentRank()
+        if not _text:
+            _result = self.recent(limit)
+            _seen = set(_result)
+            for _label in self._labels:
+                if len(_result) >= limit:
+                    break
+                if _label and _label not in _seen:
+                    _seen.add(_label)
+                    _result.append(_label)
+            return _result
+
+        _result = self.prefixMatches(_text)
+        _result.sort(key=lambda label: (-_rank.get(label, -1), label.lower()))
+        if len(_result) >= limit:
+            return _result[:limit]
+
+        _seen = set(_result)
+        _scored = []
+        for _sortKey, _label in self._sorted:
+            if _label in _seen:
+                continue
+            _score = fuzzyScore(_sortKey, _text)
+            if _score is not None:
+                _scored.append((_score, _sortKey, _label))
+        _result.extend(_item[2] for _item in heapq.nsmallest(limit - len(_result), _scored))
+        return _result
+
+    def clear(self):
+        self._labels = []
+        self._positions.clear()
+        self._sorted = []
+        self._recent.clear()
+
+    #############################
+    # 内部函数
+    #############################
+    def _recentRank(self):
+        # 标签 -> 最近使用的排名, 越大越近
+        return dict((_label, _i) for _i, _label in enumerate(self._recent))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+画布绘制性能监视
+@module perfMonitor
+@file perfMonitor.py
+"""
+
+import csv
+import math
+import time
+from collections import deque
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+    from PyQt5.QtWidgets import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+# 每帧记录的指标: 绘制耗时, 绘制的形状数量, 图片缩放绘制耗时, 鼠标移动事件到绘制完成的延迟
+METRICS = ('paint_ms', 'shapes', 'pixmap_ms', 'latency_ms')
+# 统计的百分位
+PERCENTILES = (50, 95, 99)
+# 滚动统计的帧数
+DEFAULT_WINDOW_SIZE = 500
+# 保留用于导出的帧数
+DEFAULT_HISTORY_SIZE = 100000
+
+
+def percentile(values, q):
+    """
+    计算百分位数(最近秩法)
+
+    @param {list} values - 已排序的数值清单
+    @param {float} q - 百分位(0-100)
+
+    @returns {float} - 百分位数, 清单为空返回None
+    """
+    if not values:
+        return None
+    _rank = int(math.ceil(q / 100.0 * len(values))) - 1
+    return values[max(0, min(_rank, len(values) - 1))]
+
+
+class PerfMonitor(object):
+    """
+    记录每次绘制的性能数据, 提供最近若干帧的滚动百分位统计及CSV导出
+    """
+
+    def __init__(self, windowSize=DEFAULT_WINDOW_SIZE, historySize=DEFAULT_HISTORY_SIZE, logInterval=0):
+        """
+        构造函数
+
+        @param {int} windowSize=DEFAULT_WINDOW_SIZE - 滚动统计的帧数
+        @param {int} historySize=DEFAULT_HISTORY_SIZE - 保留用于导出的帧数
+        @param {int} logInterval=0 - 每隔多少帧打印一次统计, 0代表不打印
+        """
+        self.windowSize = windowSize
+        self.logInterval = logInterval
+        self.frameCount = 0
+        self._history = deque(maxlen=historySize)  # (时间, 各指标值...)
+        self._windows = dict((_metric, deque(maxlen=windowSize)) for _metric in METRICS)
+
+    def __len__(self):
+        return len(self._history)
+
+    def record(self, paint_ms, shapes, pixmap_ms, latency_ms=None):
+        """
+        记录一帧的性能数据
+
+        @param {float} paint_ms - 绘制耗时(毫秒)
+        @param {int} shapes - 绘制的形状数量
+        @param {float} pixmap_ms - 图片缩放绘制耗时(毫秒)
+        @param {float} latency_ms=None - 鼠标移动事件到绘制完成的延迟(毫秒), 非鼠标移动触发的绘制为None
+        """
+        _values = (paint_ms, shapes, pixmap_ms, latency_ms)
+        self._history.append((time.time(),) + _values)
+        for _metric, _value in zip(METRICS, _values):
+            if _value is not None:
+                self._windows[_metric].append(_value)
+
+        self.frameCount += 1
+        if self.logInterval > 0 and self.frameCount % self.logInterval == 0:
+            print('canvas perf: %s' % self.summary().replace('\n', '; '))
+
+    def percentiles(self, metric):
+        """
+        获取指标在滚动窗口内的百分位数
+
+        @param {str} metric - 指标名, 见METRICS
+
+        @returns {dict} - 百分位 -> 数值, 没有数据返回None
+        """
+        _values = sorted(self._windows[metric])
+        if not _values:
+            return None
+        return dict((_q, percentile(_values, _q)) for _q in PERCENTILES)
+
+    def summary(self):
+        """
+        获取滚动窗口的统计文本
+
+        @returns {str} - 每个指标一行的统计文本
+        """
+        _lines = []
+        for _metric in METRICS:
+            _stats = self.percentiles(_metric)
+            if _stats is None:
+                _lines.append('%s: -' % _metric)
+                continue
+            _lines.append('%s: %s' % (_metric, ' '.join(
+                'p%d=%.1f' % (_q, _stats[_q]) for _q in PERCENTILES
+            )))
+        return '\n'.join(_lines)
+
+    def exportCsv(self, path):
+        """
+        导出保留的所有帧数据为CSV文件
+
+        @param {str} path - 文件路径
+
+        @returns {int} - 导出的帧数
+        """
+        with open(path, 'w', newline='') as _file:
+            _writer = csv.writer(_file)
+            _writer.writerow(('time',) + METRICS)
+            for _row in self._history:
+                _writer.writerow(['' if _value is None else _value for _value in _row])
+        return len(self._history)
+
+    def clear(self):
+        self.frameCount = 0
+        self._history.clear()
+        for _window in self._windows.values():
+            _window.clear()
+
+
+class PerfHud(QLabel):
+    """
+    悬浮在画布区域左上角的性能统计显示, 定时刷新, 不参与画布的绘制
+    """
+
+    def __init__(self, monitor, parent=None, interval=500):
+        """
+        构造函数
+
+        @param {PerfMonitor} monitor - 性能监视对象
+        @param {QWidget} parent=None - 父控件
+        @param {int} interval=500 - 刷新间隔(毫秒)
+        """
+        super(PerfHud, self).__init__(parent)
+        self.monitor = monitor
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet('background-color: rgba(0, 0, 0, 160); color: white; '
+                           'font-family: monospace; padding: 4px;')
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def setActive(self, active):
+        """
+        显示或隐藏性能统计
+
+        @param {bool} active - 是否显示
+        """
+        if active:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start()
+        else:
+            self.timer.stop()
+            self.hide()
+
+    def refresh(self):
+        self.setText('frames: %d\n%s' % (self.monitor.frameCount, self.monitor.summary()))
+        self.adjustSize()
+        self.move(8, 8)
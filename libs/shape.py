@@ -11,6 +11,8 @@ except ImportError:
 
 from libs.utils import distance
 import sys
+import itertools
+import numpy as np
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -21,26 +23,59 @@ DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 MIN_Y_LABEL = 10
 
 
+def coordsOf(points):
+    """Convert a sequence of QPointF or (x, y) pairs to an (n, 2) float array."""
+    if isinstance(points, np.ndarray):
+        return np.array(points, dtype=np.float64).reshape(-1, 2)
+    return np.array([(p.x(), p.y()) if isinstance(p, QPointF) else tuple(p) for p in points],
+                    dtype=np.float64).reshape(-1, 2)
+
+
 class Shape(object):
     P_SQUARE, P_ROUND = range(2)
 
     MOVE_VERTEX, NEAR_VERTEX = range(2)
 
+    # Vertices are kept in a compact (n, 2) float array; QPointF objects are
+    # only built on demand (self.points) and for the cached paint paths.
+    __slots__ = ('uid', 'label', '_coords', '_pointList', '_path', '_linePath', '_rect',
+                 '_vertexPath', '_vertexKey', 'fill', 'selected', 'difficult', 'paintLabel',
+                 '_highlightIndex', '_highlightMode', '_closed', '_line_color', '_fill_color')
+
     # The following class variables influence the drawing
-    # of _all_ shape objects.
-    line_color = DEFAULT_LINE_COLOR
-    fill_color = DEFAULT_FILL_COLOR
+    # of _all_ shape objects. line_color and fill_color of a shape fall back
+    # to the defaults unless set on the shape itself.
+    default_line_color = DEFAULT_LINE_COLOR
+    default_fill_color = DEFAULT_FILL_COLOR
     select_line_color = DEFAULT_SELECT_LINE_COLOR
     select_fill_color = DEFAULT_SELECT_FILL_COLOR
-    vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
+    default_vertex_fill_color = DEFAULT_VERTEX_FILL_COLOR
     hvertex_fill_color = DEFAULT_HVERTEX_FILL_COLOR
     point_type = P_ROUND
     point_size = 8
     scale = 1.0
 
+    _highlightSettings = {
+        NEAR_VERTEX: (4, P_ROUND),
+        MOVE_VERTEX: (1.5, P_SQUARE),
+    }
+
+    # Pens and the label font are shared by all shapes.
+    _pens = {}
+    _labelFont = None
+    # Source of unique shape ids, used to refer to shapes in the undo journal.
+    _uids = itertools.count(1)
+
     def __init__(self, label=None, line_color=None, difficult=False, paintLabel=False):
+        self.uid = next(Shape._uids)
         self.label = label
-        self.points = []
+        self._coords = np.empty((0, 2), dtype=np.float64)
+        self._pointList = None
+        self._path = None
+        self._linePath = None
+        self._rect = None
+        self._vertexPath = None
+        self._vertexKey = None
         self.fill = False
         self.selected = False
         self.difficult = difficult
@@ -48,34 +83,106 @@ class Shape(object):
 
         self._highlightIndex = None
         self._highlightMode = self.NEAR_VERTEX
-        self._highlightSettings = {
-            self.NEAR_VERTEX: (4, self.P_ROUND),
-            self.MOVE_VERTEX: (1.5, self.P_SQUARE),
-        }
 
         self._closed = False
 
-        if line_color is not None:
-            # Override the class line_color attribute
-            # with an object attribute. Currently this
-            # is used for drawing the pending line a different color.
-            self.line_color = line_color
+        # Override the default line color, currently this
+        # is used for drawing the pending line a different color.
+        self._line_color = line_color
+        self._fill_color = None
+
+    @property
+    def line_color(self):
+        return self._line_color if self._line_color is not None else Shape.default_line_color
+
+    @line_color.setter
+    def line_color(self, color):
+        self._line_color = color
+
+    @property
+    def fill_color(self):
+        return self._fill_color if self._fill_color is not None else Shape.default_fill_color
+
+    @fill_color.setter
+    def fill_color(self, color):
+        self._fill_color = color
+
+    @property
+    def vertex_fill_color(self):
+        if self._highlightIndex is not None:
+            return self.hvertex_fill_color
+        return self.default_vertex_fill_color
+
+    @property
+    def points(self):
+        """Vertices as a new list of QPointF; assign to replace them.
+        Editing the returned list does not change the shape."""
+        if self._pointList is None:
+            self._pointList = [QPointF(x, y) for x, y in self._coords.tolist()]
+        return list(self._pointList)
+
+    @points.setter
+    def points(self, points):
+        self.setCoords(coordsOf(points))
+
+    @property
+    def coords(self):
+        """Read-only (n, 2) array view of the vertices."""
+        view = self._coords.view()
+        view.flags.writeable = False
+        return view
+
+    def setCoords(self, coords):
+        """Replace the vertices with an (n, 2) array, which the shape takes over."""
+        self._coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop cached geometry; called whenever the points change."""
+        self._pointList = None
+        self._path = None
+        self._linePath = None
+        self._rect = None
+        self._vertexPath = None
+
+    @classmethod
+    def pen(cls, color, width):
+        key = (color.rgba(), width)
+        pen = cls._pens.get(key)
+        if pen is None:
+            pen = QPen(color)
+            pen.setWidth(width)
+            cls._pens[key] = pen
+        return pen
+
+    @classmethod
+    def labelFont(cls):
+        if cls._labelFont is None:
+            cls._labelFont = QFont()
+            cls._labelFont.setPointSize(8)
+            cls._labelFont.setBold(True)
+        return cls._labelFont
 
     def close(self):
         self._closed = True
+        self._linePath = None
 
     def reachMaxPoints(self):
-        if len(self.points) >= 4:
+        if len(self._coords) >= 4:
             return True
         return False
 
     def addPoint(self, point):
         if not self.reachMaxPoints():
-            self.points.append(point)
+            self._coords = np.append(self._coords, [(point.x(), point.y())], axis=0)
+            self.invalidate()
 
     def popPoint(self):
-        if self.points:
-            return self.points.pop()
+        if len(self._coords):
+            x, y = self._coords[-1]
+            self._coords = self._coords[:-1].copy()
+            self.invalidate()
+            return QPointF(x, y)
         return None
 
     def isClosed(self):
@@ -83,67 +190,82 @@ class Shape(object):
 
     def setOpen(self):
         self._closed = False
+        self._linePath = None
 
-    def paint(self, painter):
-        if self.points:
-            color = self.select_line_color if self.selected else self.line_color
-            pen = QPen(color)
-            # Try using integer sizes for smoother drawing(?)
-            pen.setWidth(max(1, int(round(2.0 / self.scale))))
-            painter.setPen(pen)
+    def penWidth(self):
+        # Try using integer sizes for smoother drawing(?)
+        return max(1, int(round(2.0 / self.scale)))
 
-            line_path = QPainterPath()
-            vrtx_path = QPainterPath()
+    def isPlain(self):
+        """True when the shape paints with its plain line color and vertices,
+        so it can be drawn in a batch with other shapes of the same color."""
+        return not (self.selected or self.fill or self._highlightIndex is not None)
 
-            line_path.moveTo(self.points[0])
-            # Uncommenting the following line will draw 2 paths
-            # for the 1st vertex, and make it non-filled, which
-            # may be desirable.
-            #self.drawVertex(vrtx_path, 0)
+    def paint(self, painter):
+        if len(self._coords):
+            color = self.select_line_color if self.selected else self.line_color
+            painter.setPen(self.pen(color, self.penWidth()))
 
-            for i, p in enumerate(self.points):
-                line_path.lineTo(p)
-                self.drawVertex(vrtx_path, i)
-            if self.isClosed():
-                line_path.lineTo(self.points[0])
+            line_path = self.linePath()
+            vrtx_path = self.vertexPath()
 
             painter.drawPath(line_path)
             painter.drawPath(vrtx_path)
             painter.fillPath(vrtx_path, self.vertex_fill_color)
 
-            # Draw text at the top-left
             if self.paintLabel:
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(8)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    if(self.label == None):
-                        self.label = ""
-                    if(min_y < MIN_Y_LABEL):
-                        min_y += MIN_Y_LABEL
-                    painter.drawText(min_x, min_y, self.label)
+                self.paintLabelText(painter)
 
             if self.fill:
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
+    def paintLabelText(self, painter):
+        # Draw text at the top-left
+        rect = self.boundingRect()
+        min_x, min_y = rect.left(), rect.top()
+        painter.setFont(self.labelFont())
+        if(self.label == None):
+            self.label = ""
+        if(min_y < MIN_Y_LABEL):
+            min_y += MIN_Y_LABEL
+        painter.drawText(QPointF(min_x, min_y), self.label)
+
+    def linePath(self):
+        """Outline path, cached until the points change."""
+        if self._linePath is None:
+            points = self._qpoints()
+            path = QPainterPath()
+            path.moveTo(points[0])
+            # Uncommenting the following line will draw 2 paths
+            # for the 1st vertex, and make it non-filled, which
+            # may be desirable.
+            #self.drawVertex(vrtx_path, 0)
+            for p in points:
+                path.lineTo(p)
+            if self.isClosed():
+                path.lineTo(points[0])
+            self._linePath = path
+        return self._linePath
+
+    def vertexPath(self):
+        """Vertex handles path, cached per scale and highlight state."""
+        key = (self.scale, self._highlightIndex, self._highlightMode)
+        if self._vertexPath is None or self._vertexKey != key:
+            path = QPainterPath()
+            for i in range(len(self._coords)):
+                self.drawVertex(path, i)
+            self._vertexPath = path
+            self._vertexKey = key
+        return self._vertexPath
+
     def drawVertex(self, path, i):
         d = self.point_size / self.scale
         shape = self.point_type
-        point = self.points[i]
+        point = self._qpoints()[i]
         if i == self._highlightIndex:
             size, shape = self._highlightSettings[self._highlightMode]
             d *= size
-        if self._highlightIndex is not None:
-            self.vertex_fill_color = self.hvertex_fill_color
-        else:
-            self.vertex_fill_color = Shape.vertex_fill_color
         if shape == self.P_SQUARE:
             path.addRect(point.x() - d / 2, point.y() - d / 2, d, d)
         elif shape == self.P_ROUND:
@@ -152,28 +274,53 @@ class Shape(object):
             assert False, "unsupported vertex shape"
 
     def nearestVertex(self, point, epsilon):
-        for i, p in enumerate(self.points):
-            if distance(p - point) <= epsilon:
-                return i
-        return None
+        if not len(self._coords):
+            return None
+        dists = np.hypot(self._coords[:, 0] - point.x(), self._coords[:, 1] - point.y())
+        i = int(np.argmax(dists <= epsilon))
+        return i if dists[i] <= epsilon else None
 
     def containsPoint(self, point):
         return self.makePath().contains(point)
 
     def makePath(self):
-        path = QPainterPath(self.points[0])
-        for p in self.points[1:]:
-            path.lineTo(p)
-        return path
+        if self._path is None:
+            points = self._qpoints()
+            path = QPainterPath(points[0])
+            for p in points[1:]:
+                path.lineTo(p)
+            self._path = path
+        return self._path
 
     def boundingRect(self):
-        return self.makePath().boundingRect()
+        if self._rect is None:
+            if len(self._coords):
+                x1, y1 = self._coords.min(axis=0)
+                x2, y2 = self._coords.max(axis=0)
+                self._rect = QRectF(x1, y1, x2 - x1, y2 - y1)
+            else:
+                self._rect = QRectF()
+        return self._rect
+
+    def translate(self, dx, dy):
+        """Move all vertices by (dx, dy) in place."""
+        self._coords += (dx, dy)
+        self.invalidate()
+
+    def clamp(self, width, height):
+        """Clip all vertices to [0, width] x [0, height]; returns True if any moved."""
+        clipped = np.clip(self._coords, 0, (width, height))
+        if np.array_equal(clipped, self._coords):
+            return False
+        self.setCoords(clipped)
+        return True
 
     def moveBy(self, offset):
-        self.points = [p + offset for p in self.points]
+        self.translate(offset.x(), offset.y())
 
     def moveVertexBy(self, i, offset):
-        self.points[i] = self.points[i] + offset
+        self._coords[i] += (offset.x(), offset.y())
+        self.invalidate()
 
     def highlightVertex(self, i, action):
         self._highlightIndex = i
@@ -184,22 +331,27 @@ class Shape(object):
 
     def copy(self):
         shape = Shape("%s" % self.label)
-        shape.points = [p for p in self.points]
+        shape.setCoords(self._coords.copy())
         shape.fill = self.fill
         shape.selected = self.selected
         shape._closed = self._closed
-        if self.line_color != Shape.line_color:
-            shape.line_color = self.line_color
-        if self.fill_color != Shape.fill_color:
-            shape.fill_color = self.fill_color
+        shape._line_color = self._line_color
+        shape._fill_color = self._fill_color
         shape.difficult = self.difficult
         return shape
 
     def __len__(self):
-        return len(self.points)
+        return len(self._coords)
 
     def __getitem__(self, key):
-        return self.points[key]
+        return self._qpoints()[key]
 
     def __setitem__(self, key, value):
-        self.points[key] = value
+        self._coords[key] = (value.x(), value.y())
+        self.invalidate()
+
+    def _qpoints(self):
+        # Cached QPointF list, shared with the paint paths; not to be modified.
+        if self._pointList is None:
+            self._pointList = [QPointF(x, y) for x, y in self._coords.tolist()]
+        return self._pointList
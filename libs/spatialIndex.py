@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+画布形状的空间索引
+@module spatialIndex
+@file spatialIndex.py
+"""
+
+import math
+
+try:
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtCore import *
+
+
+# 默认的网格边长(原图像素)
+DEFAULT_CELL_SIZE = 128
+
+
+def overlaps(a, b):
+    """
+    判断两个矩形是否相交(含边界), 与QRectF.intersects不同, 宽或高为0的矩形也能相交
+
+    @param {QRectF} a - 矩形
+    @param {QRectF} b - 矩形
+
+    @returns {bool} - 是否相交
+    """
+    return a.left() <= b.right() and b.left() <= a.right() and a.top() <= b.bottom() and b.top() <= a.bottom()
+
+
+def covers(rect, point):
+    """
+    判断矩形是否包含点(含边界), 宽或高为0的矩形也能包含其上的点
+
+    @param {QRectF} rect - 矩形
+    @param {QPointF} point - 点
+
+    @returns {bool} - 是否包含
+    """
+    return rect.left() <= point.x() <= rect.right() and rect.top() <= point.y() <= rect.bottom()
+
+
+def encloses(outer, inner):
+    """
+    判断矩形inner是否完全在outer内(含边界), 宽或高为0的inner也能被包含
+
+    @param {QRectF} outer - 外部矩形
+    @param {QRectF} inner - 内部矩形
+
+    @returns {bool} - 是否包含
+    """
+    return outer.left() <= inner.left() and inner.right() <= outer.right() \
+        and outer.top() <= inner.top() and inner.bottom() <= outer.bottom()
+
+
+class SpatialIndex(object):
+    """
+    基于均匀网格的形状外接矩形索引, 用于快速找出某个点或区域附近的形状
+    每个形状登记在其外接矩形覆盖的所有网格中, 同时记录加入顺序,
+    查询结果按加入顺序排列, 与画布上形状的绘制顺序一致
+    """
+
+    def __init__(self, cellSize=DEFAULT_CELL_SIZE):
+        """
+        构造函数
+
+        @param {float} cellSize=DEFAULT_CELL_SIZE - 网格边长
+        """
+        self.cellSize = float(cellSize)
+        self._cells = {}  # (col, row) -> set(shape)
+        self._items = {}  # shape -> (cells, rect)
+        self._order = {}  # shape -> 加入顺序号
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, shape):
+        return shape in self._items
+
+    def insert(self, shape, rect=None):
+        """
+        登记形状, 已登记的形状更新其位置并保持原有顺序
+
+        @param {Shape} shape - 形状对象
+        @param {QRectF} rect=None - 形状外接矩形, 不传则通过shape.boundingRect()获取
+        """
+        if rect is None:
+            rect = shape.boundingRect()
+
+        if shape in self._items:
+            self._unregister(shape)
+        else:
+            self._order[shape] = self._seq
+            self._seq += 1
+
+        _cells = self._cellsOf(rect)
+        for _cell in _cells:
+            self._cells.setdefault(_cell, set()).add(shape)
+        self._items[shape] = (_cells, QRectF(rect).normalized())
+
+    # 已登记的形状重新登记即为更新
+    update = insert
+
+    def remove(self, shape):
+        """
+        删除形状
+
+        @param {Shape} shape - 形状对象
+        """
+        if shape not in self._items:
+            return
+        self._unregister(shape)
+        del self._items[shape]
+        del self._order[shape]
+
+    def clear(self):
+        self._cells.clear()
+        self._items.clear()
+        self._order.clear()
+        self._seq = 0
+
+    def rect(self, shape):
+        """
+        获取形状登记的外接矩形
+
+        @param {Shape} shape - 形状对象
+
+        @returns {QRectF} - 外接矩形, 未登记返回None
+        """
+        _item = self._items.get(shape, None)
+        return _item[1] if _item is not None else None
+
+    def query(self, rect):
+        """
+        获取外接矩形与区域相交的形状
+
+        @param {QRectF} rect - 查询区域
+
+        @returns {list} - 形状清单, 按加入顺序排列
+        """
+        _found = set()
+        for _cell in self._cellsOf(rect):
+            _shapes = self._cells.get(_cell, None)
+            if _shapes:
+                _found.update(_shapes)
+
+        _result = [_shape for _shape in _found if overlaps(self._items[_shape][1], rect)]
+        _result.sort(key=self._order.__getitem__)
+        return _result
+
+    def queryPoint(self, point, margin=0.0):
+        """
+        获取外接矩形(向外扩展margin)包含指定点的形状
+
+        @param {QPointF} point - 查询点
+        @param {float} margin=0.0 - 外接矩形向外扩展的距离
+
+        @returns {list} - 形状清单, 按加入顺序排列
+        """
+        if margin > 0:
+            _rect = QRectF(point.x() - margin, point.y() - margin, 2 * margin, 2 * margin)
+            return [
+                _shape for _shape in self.query(_rect)
+                if covers(self._items[_shape][1].adjusted(-margin, -margin, margin, margin), point)
+            ]
+
+        _shapes = self._cells.get(self._cellOf(point.x(), point.y()), None)
+        if not _shapes:
+            return []
+        _result = [_shape for _shape in _shapes if covers(self._items[_shape][1], point)]
+        _result.sort(key=self._order.__getitem__)
+        return _result
+
+    #############################
+    # 内部函数
+    #############################
+    def _cellOf(self, x, y):
+        return int(math.floor(x / self.cellSize)), int(math.floor(y / self.cellSize))
+
+    def _cellsOf(self, rect):
+        _left, _top = self._cellOf(rect.left(), rect.top())
+        _right, _bottom = self._cellOf(rect.right(), rect.bottom())
+        return [(_col, _row) for _row in range(_top, _bottom + 1) for _col in range(_left, _right + 1)]
+
+    def _unregister(self, shape):
+        for _cell in self._items[shape][0]:
+            _shapes = self._cells.get(_cell, None)
+            if _shapes is not None:
+                _shapes.discard(shape)
+                if not _shapes:
+                    del self._cells[_cell]
@@ -0,0 +1,508 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+超大图片的分块多分辨率金字塔
+@module tiledImage
+@file tiledImage.py
+"""
+
+import os
+import math
+import shutil
+import hashlib
+import tempfile
+import traceback
+from collections import OrderedDict
+
+try:
+    from PyQt5.QtGui import *
+    from PyQt5.QtCore import *
+except ImportError:
+    from PyQt4.QtGui import *
+    from PyQt4.QtCore import *
+
+
+# 超过该像素数量的图片使用分块显示
+TILED_IMAGE_PIXELS = 50 * 1000 * 1000
+# 分块的边长(像素)
+DEFAULT_TILE_SIZE = 512
+# 内存中最多缓存的分块数量
+DEFAULT_MAX_TILES = 256
+# 显示尺寸超过预览图尺寸的倍数后才绘制分块
+PREVIEW_ZOOM_THRESHOLD = 1.2
+# 分块磁盘缓存的默认容量(MB)
+DEFAULT_TILE_CACHE_SIZE = 2048
+# 不支持裁剪解码的图片, 整图解码允许占用的最大内存(字节), 超过则只显示预览图
+MAX_DECODE_BYTES = 512 * 1024 * 1024
+
+
+def decodeLimit():
+    """
+    获取整图解码允许占用的最大内存, 取MAX_DECODE_BYTES与Qt图片读取器分配上限中较小的值
+
+    @returns {int} - 字节数
+    """
+    _limit = MAX_DECODE_BYTES
+    if hasattr(QImageReader, 'allocationLimit'):
+        # Qt的分配上限单位为MB, 0代表不限制
+        _qtLimit = QImageReader.allocationLimit()
+        if _qtLimit > 0:
+            _limit = min(_limit, _qtLimit * 1024 * 1024)
+    return _limit
+
+
+def tileCacheRoot():
+    """
+    获取分块磁盘缓存的根目录
+
+    @returns {str} - 缓存根目录
+    """
+    return os.path.join(tempfile.gettempdir(), 'labelImg_tiles')
+
+
+def dirSize(path):
+    """
+    获取目录下所有文件的总大小
+
+    @param {str} path - 目录
+
+    @returns {int} - 字节数
+    """
+    _total = 0
+    for _dir, _dirs, _files in os.walk(path):
+        for _name in _files:
+            try:
+                _total += os.path.getsize(os.path.join(_dir, _name))
+            except OSError:
+                pass
+    return _total
+
+
+def pruneTileCache(root, maxBytes, keep=None):
+    """
+    按最近使用时间(目录的访问时间)淘汰分块缓存, 直到总大小不超过上限
+    缓存目录结构为: 根目录/图片路径的哈希/图片版本(修改时间及大小)的哈希/分块文件
+
+    @param {str} root - 缓存根目录
+    @param {int} maxBytes - 容量上限(字节)
+    @param {str} keep=None - 不淘汰的版本目录(当前使用中)
+
+    @returns {int} - 淘汰的版本目录数量
+    """
+    if not os.path.isdir(root):
+        return 0
+
+    _entries = []  # (访问时间, 大小, 目录)
+    for _name in os.listdir(root):
+        _imageDir = os.path.join(root, _name)
+        if not os.path.isdir(_imageDir):
+            continue
+        _versions = [os.path.join(_imageDir, _v) for _v in os.listdir(_imageDir)
+                     if os.path.isdir(os.path.join(_imageDir, _v))]
+        # 旧版本的缓存没有图片版本这一层
+        for _dir in _versions or [_imageDir]:
+            try:
+                _entries.append((os.stat(_dir).st_atime, dirSize(_dir), _dir))
+            except OSError:
+                pass
+
+    _total = sum(_entry[1] for _entry in _entries)
+    _removed = 0
+    _keep = os.path.abspath(keep) if keep is not None else None
+    for _atime, _size, _dir in sorted(_entries):
+        if _total <= maxBytes:
+            break
+        if os.path.abspath(_dir) == _keep:
+            continue
+        shutil.rmtree(_dir, ignore_errors=True)
+        _total -= _size
+        _removed += 1
+        _parent = os.path.dirname(_dir)
+        if _parent != root and os.path.isdir(_parent) and not os.listdir(_parent):
+            os.rmdir(_parent)
+    return _removed
+
+
+class TileTask(QRunnable):
+    """
+    后台加载一个分块的任务, 优先读取磁盘缓存, 没有缓存时从原图裁剪解码
+    """
+
+    def __init__(self, tiledImage, key):
+        super(TileTask, self).__init__()
+        self.tiledImage = tiledImage
+        self.key = key
+
+    def run(self):
+        _image = None
+        try:
+            if self.tiledImage.isWanted(self.key):
+                _image = self.tiledImage.loadTile(self.key)
+        except:
+            print('load tile error: %s %s\r\n%s' % (self.tiledImage.path, self.key, traceback.format_exc()))
+        self.tiledImage.tileDecoded.emit(self.key, _image)
+
+
+class PruneTask(QRunnable):
+    """
+    后台淘汰分块磁盘缓存的任务
+    """
+
+    def __init__(self, tiledImage):
+        super(PruneTask, self).__init__()
+        self.tiledImage = tiledImage
+
+    def run(self):
+        try:
+            self.tiledImage.pruneCache()
+        except:
+            print('prune tile cache error: %s\r\n%s' % (self.tiledImage.cacheRoot, traceback.format_exc()))
+
+
+class PyramidTask(QRunnable):
+    """
+    不支持裁剪解码的图片格式, 在后台生成所有层级的分块到磁盘缓存
+    """
+
+    def __init__(self, tiledImage):
+        super(PyramidTask, self).__init__()
+        self.tiledImage = tiledImage
+
+    def run(self):
+        try:
+            self.tiledImage.buildPyramid()
+            self.tiledImage.pruneCache()
+        except:
+            self.tiledImage.error = 'build pyramid error: %s' % self.tiledImage.path
+            print('%s\r\n%s' % (self.tiledImage.error, traceback.format_exc()))
+        self.tiledImage.pyramidBuilt.emit()
+
+
+class TiledImage(QObject):
+    """
+    分块的多分辨率图片, 第0层为原始分辨率, 每层的边长为上一层的一半
+    分块在后台线程按需解码并缓存到磁盘, 内存中只保留最近使用的分块,
+    绘制时只绘制可见区域内对应层级的分块, 分块未就绪时由预览图代替
+    """
+    # 有新的分块可以绘制
+    tileReady = pyqtSignal()
+    # 内部信号, 参数为: 分块键值(层级, 列, 行), 分块图片(失败为None)
+    tileDecoded = pyqtSignal(object, object)
+    # 内部信号, 金字塔生成完成
+    pyramidBuilt = pyqtSignal()
+    # 无法生成分块, 只能显示预览图, 参数为原因
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, imageSize, previewSize, tileSize=DEFAULT_TILE_SIZE,
+                 maxTiles=DEFAULT_MAX_TILES, cacheRoot=None, cacheSize=DEFAULT_TILE_CACHE_SIZE, parent=None):
+        """
+        构造函数
+
+        @param {str} path - 图片路径
+        @param {QSize} imageSize - 图片原始尺寸
+        @param {QSize} previewSize - 预览图尺寸, 分辨率不高于预览图的层级不生成
+        @param {int} tileSize=DEFAULT_TILE_SIZE - 分块边长
+        @param {int} maxTiles=DEFAULT_MAX_TILES - 内存中最多缓存的分块数量
+        @param {str} cacheRoot=None - 磁盘缓存根目录, 不传使用临时目录
+        @param {int} cacheSize=DEFAULT_TILE_CACHE_SIZE - 磁盘缓存容量(MB), 超过后淘汰最久未使用的图片缓存
+        @param {QObject} parent=None - 父对象
+        """
+        super(TiledImage, self).__init__(parent)
+        self.path = path
+        self.imageSize = QSize(imageSize)
+        self.tileSize = tileSize
+        self.maxTiles = maxTiles
+
+        # 预览图的分辨率比例, 层级分辨率需高于预览图才有意义
+        self.previewRatio = float(previewSize.width()) / max(1, imageSize.width())
+        self.levels = 0
+        while 0.5 ** self.levels > self.previewRatio:
+            self.levels += 1
+
+        # 同一图片的各版本缓存放在同一目录下, 重新生成时清除旧版本
+        _stat = os.stat(path)
+        _version = '%s|%s' % (_stat.st_mtime, _stat.st_size)
+        self.cacheRoot = cacheRoot if cacheRoot is not None else tileCacheRoot()
+        self.maxCacheBytes = cacheSize * 1024 * 1024
+        self.cacheDir = os.path.join(
+            self.cacheRoot,
+            hashlib.md5(os.path.abspath(path).encode('utf-8')).hexdigest(),
+            hashlib.md5(_version.encode('utf-8')).hexdigest()
+        )
+        if os.path.isdir(self.cacheDir):
+            # 记录最近使用时间, 用于缓存淘汰
+            try:
+                os.utime(self.cacheDir, None)
+            except OSError:
+                pass
+
+        _reader = QImageReader(path)
+        self.clipSupported = _reader.supportsOption(QImageIOHandler.ClipRect)
+        self.pyramidReady = self.clipSupported or os.path.exists(self._completeFile())
+        # 分块生成失败的原因, 失败后只显示预览图
+        self.error = None
+
+        self._tiles = OrderedDict()  # (level, col, row) -> QPixmap
+        self._pending = set()
+        self._wanted = set()
+        self._pyramidStarted = False
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(2)
+        self.tileDecoded.connect(self._tileDecoded)
+        self.pyramidBuilt.connect(self._pyramidBuilt)
+        self.pool.start(PruneTask(self), -1)
+
+    def levelForScale(self, scale):
+        """
+        获取显示比例对应的层级, 选择分辨率不低于显示比例的最粗层级
+
+        @param {float} scale - 显示比例(屏幕像素/原图像素)
+
+        @returns {int} - 层级, 预览图已足够时返回-1
+        """
+        if self.levels == 0 or scale <= self.previewRatio * PREVIEW_ZOOM_THRESHOLD:
+            return -1
+        _level = int(math.floor(math.log(1.0 / scale, 2))) if scale < 1 else 0
+        return max(0, min(_level, self.levels - 1))
+
+    def levelSize(self, level):
+        """
+        获取层级的图片尺寸
+
+        @param {int} level - 层级
+
+        @returns {QSize} - 图片尺寸
+        """
+        _factor = 2 ** level
+        return QSize(int(math.ceil(self.imageSize.width() / float(_factor))),
+                     int(math.ceil(self.imageSize.height() / float(_factor))))
+
+    def tileRect(self, key):
+        """
+        获取分块在原图坐标中的区域
+
+        @param {tuple} key - 分块键值(层级, 列, 行)
+
+        @returns {QRect} - 原图坐标区域
+        """
+        _level, _col, _row = key
+        _span = self.tileSize * (2 ** _level)
+        _rect = QRect(_col * _span, _row * _span, _span, _span)
+        return _rect.intersected(QRect(QPoint(0, 0), self.imageSize))
+
+    def tileKeys(self, level, rect):
+        """
+        获取与区域相交的分块
+
+        @param {int} level - 层级
+        @param {QRectF} rect - 原图坐标区域
+
+        @returns {list} - 分块键值清单
+        """
+        _span = float(self.tileSize * (2 ** level))
+        _rect = rect.intersected(QRectF(0, 0, self.imageSize.width(), self.imageSize.height()))
+        if _rect.isEmpty():
+            return []
+        _cols = range(int(_rect.left() // _span), int(math.ceil(_rect.right() / _span)))
+        _rows = range(int(_rect.top() // _span), int(math.ceil(_rect.bottom() / _span)))
+        return [(level, _col, _row) for _row in _rows for _col in _cols]
+
+    def paint(self, painter, rect, scale):
+        """
+        绘制可见区域内的分块, 未加载的分块提交后台加载
+
+        @param {QPainter} painter - 画笔, 坐标系为原图坐标
+        @param {QRectF} rect - 需要绘制的原图坐标区域
+        @param {float} scale - 显示比例
+        """
+        _level = self.levelForScale(scale)
+        if _level < 0:
+            self._wanted = set()
+            return
+
+        _keys = self.tileKeys(_level, rect)
+        self._wanted = set(_keys)
+        for _key in _keys:
+            _pixmap = self._tiles.get(_key, None)
+            if _pixmap is None:
+                self._request(_key)
+                continue
+            self._tiles.move_to_end(_key)
+            painter.drawPixmap(QRectF(self.tileRect(_key)), _pixmap, QRectF(_pixmap.rect()))
+
+    def isWanted(self, key):
+        return key in self._wanted
+
+    def loadTile(self, key):
+        """
+        加载分块图片, 在工作线程中执行
+
+        @param {tuple} key - 分块键值(层级, 列, 行)
+
+        @returns {QImage} - 分块图片, 失败返回None
+        """
+        _file = self._tileFile(key)
+        if os.path.exists(_file):
+            _image = QImage(_file)
+            if not _image.isNull():
+                return _image
+
+        if not self.clipSupported:
+            return None
+
+        _image = self._readRegion(self.tileRect(key), key[0])
+        if _image.isNull():
+            return None
+
+        self._saveTile(_file, _image)
+        return _image
+
+    def buildPyramid(self):
+        """
+        生成所有层级的分块到磁盘缓存, 在工作线程中执行
+        支持裁剪解码的格式按分块行逐条解码; 其它格式需要解码完整图片,
+        超过decodeLimit()或解码失败时记录原因到error, 只显示预览图
+
+        @returns {bool} - 是否生成成功
+        """
+        self._clearStale()
+        if self.clipSupported:
+            return self._buildPyramidBands()
+
+        _width, _height = self.imageSize.width(), self.imageSize.height()
+        if _width * _height * 4 > decodeLimit():
+            self.error = 'image too large to tile without clip decoding (%dx%d), showing preview only: %s' % (
+                _width, _height, self.path)
+            return False
+
+        _image = QImageReader(self.path).read()
+        if _image.isNull():
+            self.error = 'decode image failed, showing preview only: %s' % self.path
+            return False
+
+        for _level in range(self.levels):
+            if _level > 0:
+                _size = self.levelSize(_level)
+                _image = _image.scaled(_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            _rows = int(math.ceil(_image.height() / float(self.tileSize)))
+            for _row in range(_rows):
+                _y = _row * self.tileSize
+                self._saveBand(_image.copy(0, _y, _image.width(), min(self.tileSize, _image.height() - _y)),
+                               _level, _row)
+        open(self._completeFile(), 'w').close()
+        return True
+
+    def pruneCache(self):
+        """
+        淘汰超出容量的磁盘缓存, 不淘汰当前图片的缓存
+
+        @returns {int} - 淘汰的版本目录数量
+        """
+        return pruneTileCache(self.cacheRoot, self.maxCacheBytes, keep=self.cacheDir)
+
+    def shutdown(self, msecs=1000):
+        """
+        停止后台任务并释放内存中的分块
+
+        @param {int} msecs=1000 - 最长等待时间(毫秒)
+        """
+        self._wanted = set()
+        self.pool.clear()
+        self.pool.waitForDone(msecs)
+        self._tiles.clear()
+        self._pending.clear()
+
+    #############################
+    # 内部函数
+    #############################
+    def _readRegion(self, rect, level):
+        # 裁剪解码原图区域并缩放到层级分辨率
+        _factor = float(2 ** level)
+        _reader = QImageReader(self.path)
+        _reader.setClipRect(rect)
+        _reader.setScaledSize(QSize(int(math.ceil(rect.width() / _factor)),
+                                    int(math.ceil(rect.height() / _factor))))
+        return _reader.read()
+
+    def _buildPyramidBands(self):
+        # 每次只解码一行分块对应的原图区域
+        _full = QRect(QPoint(0, 0), self.imageSize)
+        for _level in range(self.levels):
+            _span = self.tileSize * (2 ** _level)
+            _rows = int(math.ceil(self.imageSize.height() / float(_span)))
+            for _row in range(_rows):
+                _band = self._readRegion(QRect(0, _row * _span, _full.width(), _span).intersected(_full), _level)
+                if _band.isNull():
+                    self.error = 'decode image band failed, showing preview only: %s' % self.path
+                    return False
+                self._saveBand(_band, _level, _row)
+        open(self._completeFile(), 'w').close()
+        return True
+
+    def _saveBand(self, band, level, row):
+        # 将一行分块的图片切分保存
+        _cols = int(math.ceil(band.width() / float(self.tileSize)))
+        for _col in range(_cols):
+            _x = _col * self.tileSize
+            _tile = band.copy(_x, 0, min(self.tileSize, band.width() - _x), band.height())
+            self._saveTile(self._tileFile((level, _col, row)), _tile)
+
+    def _tileFile(self, key):
+        return os.path.join(self.cacheDir, 'L%d_%d_%d.png' % key)
+
+    def _completeFile(self):
+        return os.path.join(self.cacheDir, 'complete')
+
+    def _saveTile(self, path, image):
+        if not os.path.isdir(self.cacheDir):
+            self._clearStale()
+            try:
+                os.makedirs(self.cacheDir)
+            except OSError:
+                # 其它线程已创建
+                pass
+        image.save(path, 'PNG')
+
+    def _clearStale(self):
+        # 删除同一图片其它版本(图片已修改)的缓存
+        _imageDir = os.path.dirname(self.cacheDir)
+        if not os.path.isdir(_imageDir):
+            return
+        for _name in os.listdir(_imageDir):
+            _dir = os.path.join(_imageDir, _name)
+            if _dir != self.cacheDir and os.path.isdir(_dir):
+                shutil.rmtree(_dir, ignore_errors=True)
+
+    def _request(self, key):
+        if key in self._pending:
+            return
+
+        if not self.pyramidReady:
+            if not self._pyramidStarted:
+                self._pyramidStarted = True
+                self.pool.start(PyramidTask(self))
+            return
+
+        self._pending.add(key)
+        _task = TileTask(self, key)
+        _task.setAutoDelete(True)
+        # 粗的层级优先加载
+        self.pool.start(_task, key[0])
+
+    def _tileDecoded(self, key, image):
+        self._pending.discard(key)
+        if image is None:
+            return
+
+        self._tiles[key] = QPixmap.fromImage(image)
+        while len(self._tiles) > self.maxTiles:
+            self._tiles.popitem(last=False)
+        self.tileReady.emit()
+
+    def _pyramidBuilt(self):
+        self.pyramidReady = self.error is None and os.path.exists(self._completeFile())
+        if self.pyramidReady:
+            self.tileReady.emit()
+        elif self.error is not None:
+            self.failed.emit(self.error)
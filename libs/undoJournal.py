@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+标注编辑的撤销/重做日志
+@module undoJournal
+@file undoJournal.py
+"""
+
+from collections import deque
+
+
+# 日志默认的内存上限(字节)
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# 每条记录的固定开销估算(字节)
+ENTRY_OVERHEAD = 64
+# 新增/删除记录中保存的整个形状对象的估算大小(字节), 不含坐标数组
+SHAPE_OVERHEAD = 256
+
+
+class UndoCommand(object):
+    """
+    日志记录的基类, 子类需实现undo(target)撤销及redo(target)重做, 通过target对象操作画布和标注列表
+    target需要提供以下函数:
+        shapesById(uids) - 获取id对应的形状, 返回{uid: shape}
+        restoreShapes(entries) - 按(位置, 形状)清单恢复形状
+        removeShapes(shapes) - 删除形状
+        damageOf(shapes) - 获取形状占用的画布区域
+        shapesChanged(shapes, damage) - 形状的坐标或标签已修改, damage为修改前damageOf的结果
+    """
+    # 记录类型说明, 用于菜单提示
+    text = ''
+
+    def size(self):
+        """
+        获取记录占用内存的估算值
+
+        @returns {int} - 字节数
+        """
+        return ENTRY_OVERHEAD
+
+
+class CreateCommand(UndoCommand):
+    """
+    新增形状, 保存形状对象及其在画布形状清单中的位置
+    """
+    text = 'create'
+
+    def __init__(self, entries):
+        """
+        构造函数
+
+        @param {list} entries - (位置, 形状)清单
+        """
+        self.entries = list(entries)
+
+    def size(self):
+        return ENTRY_OVERHEAD + sum(SHAPE_OVERHEAD + _shape.coords.nbytes for _index, _shape in self.entries)
+
+    def undo(self, target):
+        target.removeShapes([_shape for _index, _shape in self.entries])
+
+    def redo(self, target):
+        target.restoreShapes(self.entries)
+
+
+class DeleteCommand(CreateCommand):
+    """
+    删除形状, 与新增相反
+    """
+    text = 'delete'
+
+    def undo(self, target):
+        CreateCommand.redo(self, target)
+
+    def redo(self, target):
+        CreateCommand.undo(self, target)
+
+
+class MoveCommand(UndoCommand):
+    """
+    形状坐标修改(整体移动/顶点编辑/微调), 只保存形状id和修改前后的坐标
+    """
+    text = 'move'
+
+    def __init__(self, changes):
+        """
+        构造函数
+
+        @param {list} changes - (形状id, 修改前坐标数组, 修改后坐标数组)清单
+        """
+        self.changes = list(changes)
+
+    def size(self):
+        return ENTRY_OVERHEAD + sum(16 + _old.nbytes + _new.nbytes for _uid, _old, _new in self.changes)
+
+    def undo(self, target):
+        self._apply(target, 1)
+
+    def redo(self, target):
+        self._apply(target, 2)
+
+    #############################
+    # 内部函数
+    #############################
+    @staticmethod
+    def _found(target, changes):
+        # 按id找到仍然存在的形状, 返回(形状, 修改记录)清单
+        _shapes = target.shapesById([_change[0] for _change in changes])
+        return [(_shapes[_change[0]], _change) for _change in changes if _change[0] in _shapes]
+
+    def _apply(self, target, column):
+        _changes = self._found(target, self.changes)
+        _damage = target.damageOf([_shape for _shape, _change in _changes])
+        for _shape, _change in _changes:
+            _shape.setCoords(_change[column].copy())
+        target.shapesChanged([_shape for _shape, _change in _changes], _damage)
+
+
+class RelabelCommand(UndoCommand):
+    """
+    修改形状标签(含确认自动标注), 保存形状id和修改前后的标签及线条颜色
+    """
+    text = 'relabel'
+
+    def __init__(self, changes):
+        """
+        构造函数
+
+        @param {list} changes - (形状id, 修改前(标签, 颜色), 修改后(标签, 颜色))清单
+        """
+        self.changes = list(changes)
+
+    def size(self):
+        return ENTRY_OVERHEAD + sum(
+            48 + 2 * (len(_old[0] or '') + len(_new[0] or '')) for _uid, _old, _new in self.changes
+        )
+
+    def undo(self, target):
+        self._apply(target, 1)
+
+    def redo(self, target):
+        self._apply(target, 2)
+
+    #############################
+    # 内部函数
+    #############################
+    def _apply(self, target, column):
+        _changes = MoveCommand._found(target, self.changes)
+        _damage = target.damageOf([_shape for _shape, _change in _changes])
+        for _shape, _change in _changes:
+            _shape.label, _shape.line_color = _change[column]
+        target.shapesChanged([_shape for _shape, _change in _changes], _damage)
+
+
+class UndoJournal(object):
+    """
+    撤销/重做日志, 总内存超过上限时从最早的记录开始丢弃
+    """
+
+    def __init__(self, maxBytes=DEFAULT_MAX_BYTES):
+        """
+        构造函数
+
+        @param {int} maxBytes=DEFAULT_MAX_BYTES - 内存上限(字节)
+        """
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self._undo = deque()  # (记录, 大小)
+        self._redo = []
+
+    def __len__(self):
+        return len(self._undo)
+
+    def canUndo(self):
+        return len(self._undo) > 0
+
+    def canRedo(self):
+        return len(self._redo) > 0
+
+    def push(self, command):
+        """
+        添加一条已执行的记录, 同时清空重做记录
+
+        @param {UndoCommand} command - 记录
+        """
+        for _command, _size in self._redo:
+            self.bytes -= _size
+        self._redo = []
+
+        _size = command.size()
+        self._undo.append((command, _size))
+        self.bytes += _size
+        while self.bytes > self.maxBytes and len(self._undo) > 1:
+            self.bytes -= self._undo.popleft()[1]
+
+    def undo(self, target):
+        """
+        撤销最近一条记录
+
+        @param {object} target - 执行对象, 见UndoCommand
+
+        @returns {UndoCommand} - 撤销的记录, 没有可撤销记录返回None
+        """
+        if not self._undo:
+            return None
+        _item = self._undo.pop()
+        _item[0].undo(target)
+        self._redo.append(_item)
+        return _item[0]
+
+    def redo(self, target):
+        """
+        重做最近撤销的记录
+
+        @param {object} target - 执行对象, 见UndoCommand
+
+        @returns {UndoCommand} - 重做的记录, 没有可重做记录返回None
+        """
+        if not self._redo:
+            return None
+        _item = self._redo.pop()
+        _item[0].redo(target)
+        self._undo.append(_item)
+        return _item[0]
+
+    def clear(self):
+        self._undo.clear()
+        self._redo = []
+        self.bytes = 0
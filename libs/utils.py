@@ -1,6 +1,6 @@
 from math import sqrt
 from libs.ustr import ustr
-import hashlib
+from libs.labelPalette import LABEL_PALETTE
 import re
 import sys
 
@@ -78,12 +78,26 @@ def fmtShortcut(text):
 
 
 def generateColorByText(text):
-    s = ustr(text)
-    hashCode = int(hashlib.sha256(s.encode('utf-8')).hexdigest(), 16)
-    r = int((hashCode / 255) % 255)
-    g = int((hashCode / 65025)  % 255)
-    b = int((hashCode / 16581375)  % 255)
-    return QColor(r, g, b, 100)
+    # Cached per label in the shared palette; the returned QColor is shared,
+    # do not modify it.
+    return LABEL_PALETTE.color(text)
+
+
+def labelMatcher(text):
+    """Build a label predicate from a filter string.
+
+    Empty text matches every label and returns None. Text wrapped in slashes
+    is a regular expression searched in the label; anything else is a list of
+    exact labels separated by commas. Raises re.error for a bad expression.
+    """
+    text = ustr(text).strip()
+    if not text:
+        return None
+    if len(text) > 1 and text.startswith('/') and text.endswith('/'):
+        return re.compile(text[1:-1]).search
+    labels = set(label.strip() for label in re.split(u'[,\uff0c]', text))
+    labels.discard('')
+    return labels.__contains__
 
 def have_qstring():
     '''p3/qt5 get rid of QString wrapper as py3 has native unicode str type'''
@@ -92,12 +106,15 @@ def have_qstring():
 def util_qt_strlistclass():
     return QStringList if have_qstring() else list
 
+def natural_key(s):
+    """
+    Return the key used to sort strings into natural alphanumeric order.
+    """
+    convert = lambda text: int(text) if text.isdigit() else text
+    return [convert(c) for c in re.split('([0-9]+)', s)]
+
 def natural_sort(list, key=lambda s:s):
     """
     Sort the list into natural alphanumeric order.
     """
-    def get_alphanum_key_func(key):
-        convert = lambda text: int(text) if text.isdigit() else text
-        return lambda s: [convert(c) for c in re.split('([0-9]+)', key(s))]
-    sort_key = get_alphanum_key_func(key)
-    list.sort(key=sort_key)
+    list.sort(key=lambda s: natural_key(key(s)))
@@ -83,7 +83,7 @@ class YOLOWriter:
 
 class YoloReader:
 
-    def __init__(self, filepath, image, classListPath=None):
+    def __init__(self, filepath, image, classListPath=None, imageShape=None):
         # shapes type:
         # [labbel, [(x1,y1), (x2,y2), (x3,y3), (x4,y4)], color, color, difficult]
         self.shapes = []
@@ -102,10 +102,12 @@ class YoloReader:
 
         # print (self.classes)
 
-        imgSize = [image.height(), image.width(),
-                      1 if image.isGrayscale() else 3]
+        # imageShape is passed when image was decoded at a reduced resolution
+        if imageShape is None:
+            imageShape = [image.height(), image.width(),
+                          1 if image.isGrayscale() else 3]
 
-        self.imgSize = imgSize
+        self.imgSize = imageShape
 
         self.verified = False
         # try:
@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+try:
+    from PyQt5.QtCore import QPoint, QPointF, Qt
+    from PyQt5.QtGui import QPixmap
+    from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow
+except ImportError:
+    from PyQt4.QtCore import QPoint, QPointF, Qt
+    from PyQt4.QtGui import QApplication, QLabel, QMainWindow, QPixmap
+
+from libs.canvas import Canvas
+from libs.shape import Shape
+
+
+class TestCanvas(unittest.TestCase):
+
+    def setUp(self):
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        self.window = QMainWindow()
+        self.window.filePath = None
+        self.window.labelCoordinates = QLabel()
+        self.canvas = Canvas(parent=self.window)
+        self.window.setCentralWidget(self.canvas)
+        self.window.resize(200, 200)
+        self.canvas.loadPixmap(QPixmap(100, 100))
+
+        shape = Shape(label='cat')
+        for x, y in ((10, 10), (60, 10), (60, 60), (10, 60)):
+            shape.addPoint(QPointF(x, y))
+        shape.close()
+        self.shape = shape
+        self.canvas.loadShapes([shape])
+
+    def widgetPos(self, x, y):
+        offset = self.canvas.offsetToCenter()
+        return QPoint(int(x + offset.x()), int(y + offset.y()))
+
+    def test_hoverFromEmptySpace(self):
+        self.assertIsNone(self.canvas.hShape)
+        self.canvas.applyMouseMove(self.widgetPos(90, 90), Qt.NoButton)
+        self.assertIsNone(self.canvas.hShape)
+        self.canvas.applyMouseMove(self.widgetPos(30, 30), Qt.NoButton)
+        self.assertIs(self.canvas.hShape, self.shape)
+        self.canvas.applyMouseMove(self.widgetPos(90, 90), Qt.NoButton)
+        self.assertIsNone(self.canvas.hShape)
+
+    def scaledAt(self, scale):
+        self.canvas.scale = scale
+        self.canvas.adjustSize()
+        self.canvas.grab()
+        self.canvas._scalePool.waitForDone()
+        self.app.processEvents()
+        return (scale, self.canvas.pixmap.cacheKey()) in self.canvas._scaledPixmaps
+
+    def test_scaledPixmapPerZoom(self):
+        self.assertTrue(self.scaledAt(0.5))
+        self.assertTrue(self.scaledAt(2.0))
+        self.assertTrue(self.scaledAt(0.5))
+        self.assertEqual(len(self.canvas._scaledPixmaps), 2)
+        self.assertFalse(self.scaledAt(1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from libs.datasetIndex import DatasetIndex, FORMAT_VOC, FORMAT_YOLO
+
+VOC_XML = '''<annotation verified="yes">
+    <filename>a.jpg</filename>
+    <object><name>cat</name></object>
+    <object><name>dog</name></object>
+</annotation>
+'''
+
+
+class TestDatasetIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmpdir, 'sub'))
+        self.images = [os.path.join(self.tmpdir, 'a.jpg'),
+                       os.path.join(self.tmpdir, 'sub', 'b.jpg'),
+                       os.path.join(self.tmpdir, 'sub', 'c.jpg')]
+        for path in self.images:
+            shutil.copy(os.path.join(os.path.dirname(__file__), 'test.512.512.bmp'), path)
+        self.write('a.xml', VOC_XML)
+        self.write('sub/b.txt', '0 0.5 0.5 0.1 0.1\n1 0.2 0.2 0.1 0.1\n')
+        self.write('sub/classes.txt', 'person\ncar\n')
+        self.write('sub/info.json', "{'weather': 'rain'}")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmpdir, name), 'w') as f:
+            f.write(text)
+
+    def test_reconcile(self):
+        index = DatasetIndex(self.tmpdir)
+        self.assertEqual(index.reconcile(self.images), (3, 0))
+        self.assertEqual(index.paths(), self.images)
+
+        record = index.get(self.images[0])
+        self.assertEqual(record['format'], FORMAT_VOC)
+        self.assertEqual(record['labels'], ['cat', 'dog'])
+        self.assertTrue(record['verified'])
+        self.assertEqual((record['width'], record['height']), (512, 512))
+
+        record = index.get(self.images[1])
+        self.assertEqual(record['format'], FORMAT_YOLO)
+        self.assertEqual(record['box_count'], 2)
+        self.assertEqual(record['labels'], ['person', 'car'])
+        self.assertEqual(record['info'], {'weather': 'rain'})
+        self.assertEqual(index.get(self.images[2])['format'], None)
+        self.assertEqual([r['path'] for r in index.records(os.path.join(self.tmpdir, 'sub'))],
+                         self.images[1:])
+        index.close()
+
+        # 重新打开时只更新修改过的文件
+        index = DatasetIndex(self.tmpdir)
+        self.assertEqual(index.reconcile(self.images), (0, 0))
+        self.write('sub/c.xml', '<annotation><object><name>cat</name></object></annotation>')
+        mtime = time.time() + 10
+        os.utime(os.path.join(self.tmpdir, 'sub', 'c.xml'), (mtime, mtime))
+        self.assertEqual(index.reconcile(self.images[1:]), (1, 1))
+        self.assertEqual(index.get(self.images[0]), None)
+        self.assertEqual(index.get(self.images[2])['labels'], ['cat'])
+        self.assertEqual(index.paths(), self.images[1:])
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
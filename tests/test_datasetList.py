@@ -0,0 +1,62 @@
+import unittest
+
+from libs.datasetList import DatasetList
+
+
+class TestDatasetList(unittest.TestCase):
+
+    def test_indexAndNavigation(self):
+        images = DatasetList(['/a/1.jpg', '/a/2.jpg', '/b/1.jpg'])
+        self.assertEqual(len(images), 3)
+        self.assertEqual(images.index('/b/1.jpg'), 2)
+        self.assertRaises(ValueError, images.index, '/c/1.jpg')
+        self.assertEqual(images.nextPath(), None)
+
+        self.assertEqual(images.setCurrent('/a/2.jpg'), 1)
+        self.assertEqual(images.nextPath(), '/b/1.jpg')
+        self.assertEqual(images.prevPath(), '/a/1.jpg')
+        self.assertEqual(images.setCurrent('/missing.jpg'), -1)
+        self.assertEqual(images.currentPath(), None)
+
+    def test_removeKeepsPositions(self):
+        images = DatasetList(['/a/1.jpg', '/a/2.jpg', '/b/1.jpg', '/b/2.jpg'])
+        images.setCurrent('/b/2.jpg')
+        images.remove('/a/2.jpg')
+        self.assertEqual(list(images), ['/a/1.jpg', '/b/1.jpg', '/b/2.jpg'])
+        self.assertEqual(images.index('/b/2.jpg'), 2)
+        self.assertEqual(images.currentPath(), '/b/2.jpg')
+        self.assertNotIn('/a/2.jpg', images)
+
+        images.remove('/b/2.jpg')
+        self.assertEqual(images.current, -1)
+
+    def test_extendAndClear(self):
+        images = DatasetList()
+        images.extend(['/a/1.jpg'])
+        images.extend(['/a/2.jpg', '/a/3.jpg'])
+        self.assertEqual(images.index('/a/3.jpg'), 2)
+        self.assertEqual(images[1:], ['/a/2.jpg', '/a/3.jpg'])
+        images.clear()
+        self.assertEqual(len(images), 0)
+        self.assertNotIn('/a/1.jpg', images)
+
+    def test_directoryIndex(self):
+        images = DatasetList(['/a/1.jpg', '/a/2.jpg', '/b/1.jpg'])
+        images.extend(['/b/2.jpg', '/c/1.jpg'])
+        self.assertEqual(images.dirCount(), 3)
+        self.assertEqual(images.dirIndex(3), 1)
+        self.assertEqual(images.nextDirStart(1), 2)
+        self.assertEqual(images.nextDirStart(4), -1)
+        self.assertEqual(images.prevDirStart(3), 0)
+        self.assertEqual(images.prevDirStart(1), -1)
+        self.assertEqual(images.dirStart(2), 4)
+
+        images.remove('/c/1.jpg')
+        images.remove('/b/1.jpg')
+        images.remove('/b/2.jpg')
+        self.assertEqual(images.dirCount(), 1)
+        self.assertEqual(images.nextDirStart(0), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
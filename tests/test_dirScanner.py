@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.dirScanner import iterImageFiles
+from libs.utils import natural_sort
+
+
+class TestDirScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        files = [
+            'a1.jpg', 'a10.jpg', 'a2.jpg', 'b-c.jpg', 'b.jpg', 'notes.txt',
+            'b/1.jpg', 'b/x.png', 'b1/2.jpg', 'b01.jpg', 'b12.jpg',
+            'dir 2/img.jpg', 'dir 10/img.jpg', 'dir 10/sub/z.JPG',
+        ]
+        for name in files:
+            path = os.path.join(self.tmpdir, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def walkAndSort(self, extensions):
+        images = []
+        for root, dirs, files in os.walk(self.tmpdir):
+            for file in files:
+                if file.lower().endswith(extensions):
+                    images.append(os.path.abspath(os.path.join(root, file)))
+        natural_sort(images, key=lambda x: x.lower())
+        return images
+
+    def test_streamedOrderMatchesNaturalSort(self):
+        extensions = ('.jpg', '.png')
+        streamed = list(iterImageFiles(self.tmpdir, extensions))
+        self.assertEqual(streamed, self.walkAndSort(extensions))
+        self.assertEqual(len(streamed), 13)
+
+    def test_missingDirectory(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        self.assertEqual(list(iterImageFiles(missing, ('.jpg',))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtCore import QSize
+except ImportError:
+    from PyQt4.QtGui import QImage
+    from PyQt4.QtCore import QSize
+
+from libs.imageCache import ImageCache, ImagePrefetcher, imageBytes, decodeImageFile
+
+
+class TestImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def makeImage(self, name, size=16):
+        image = QImage(size, size, QImage.Format_RGB32)
+        image.fill(0)
+        path = os.path.join(self.tmpdir, name)
+        image.save(path, 'BMP')
+        with open(path, 'rb') as f:
+            return path, f.read(), image
+
+    def test_hitMissCounters(self):
+        cache = ImageCache()
+        path, data, image = self.makeImage('a.bmp')
+        self.assertIsNone(cache.get(path))
+        cache.put(path, data, image)
+        cachedData, cachedImage, cachedSize = cache.get(path)
+        self.assertEqual(cachedData, data)
+        self.assertEqual(cachedImage.size(), image.size())
+        self.assertEqual(cachedSize, image.size())
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evictLeastRecentlyUsed(self):
+        pathA, dataA, imageA = self.makeImage('a.bmp')
+        pathB, dataB, imageB = self.makeImage('b.bmp')
+        pathC, dataC, imageC = self.makeImage('c.bmp')
+        cost = len(dataA) + imageBytes(imageA)
+        cache = ImageCache(maxBytes=cost * 2)
+        cache.put(pathA, dataA, imageA)
+        cache.put(pathB, dataB, imageB)
+        cache.get(pathA)
+        cache.put(pathC, dataC, imageC)
+        self.assertIn(pathA, cache)
+        self.assertNotIn(pathB, cache)
+        self.assertIn(pathC, cache)
+        self.assertLessEqual(cache.currentBytes, cache.maxBytes)
+
+    def test_modifiedFileInvalidates(self):
+        cache = ImageCache()
+        path, data, image = self.makeImage('a.bmp')
+        cache.put(path, data, image, mtime=os.path.getmtime(path) - 10)
+        self.assertIsNone(cache.get(path))
+        self.assertNotIn(path, cache)
+
+    def test_prefetchDecodesInBackground(self):
+        cache = ImageCache()
+        paths = [self.makeImage('%d.bmp' % i)[0] for i in range(3)]
+        prefetcher = ImagePrefetcher(cache)
+        prefetcher.prefetch(paths + [os.path.join(self.tmpdir, 'missing.bmp')])
+        prefetcher.pool.waitForDone()
+        for path in paths:
+            self.assertIn(path, cache)
+        self.assertEqual(len(cache), 3)
+
+    def test_reducedDecodeKeepsOriginalSize(self):
+        path = self.makeImage('big.bmp', size=400)[0]
+        mtime, data, image, imageSize = decodeImageFile(path, QSize(100, 50))
+        self.assertEqual(image.size(), QSize(50, 50))
+        self.assertEqual(imageSize, QSize(400, 400))
+        self.assertEqual(decodeImageFile(path, QSize(800, 800))[2].size(), QSize(400, 400))
+
+        cache = ImageCache()
+        prefetcher = ImagePrefetcher(cache, maxSize=QSize(100, 100))
+        prefetcher.prefetch([path])
+        prefetcher.pool.waitForDone()
+        cachedImage, cachedSize = cache.get(path)[1:]
+        self.assertEqual(cachedImage.size(), QSize(100, 100))
+        self.assertEqual(cachedSize, QSize(400, 400))
+
+
+if __name__ == '__main__':
+    unittest.main()
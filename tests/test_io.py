@@ -28,5 +28,30 @@ class TestPascalVocRW(unittest.TestCase):
         self.assertEqual(face[0], 'face')
         self.assertEqual(face[1], [(113, 40), (450, 40), (450, 403), (113, 403)])
 
+
+class TestLabelFileImageShape(unittest.TestCase):
+
+    def test_saveWithoutDecoding(self):
+        import shutil
+        import tempfile
+        from libs.labelFile import LabelFile
+        from libs.pascal_voc_io import PascalVocReader
+
+        image = os.path.join(os.path.dirname(__file__), 'test.512.512.bmp')
+        self.assertEqual(LabelFile.readImageShape(image)[:2], [512, 512])
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            xml = os.path.join(tmpdir, 'test.xml')
+            shapes = [dict(label='person', points=[(1, 2), (30, 2), (30, 40), (1, 40)], difficult=False)]
+            LabelFile().savePascalVocFormat(xml, shapes, image, None, imageShape=[100, 200, 3])
+            with open(xml) as f:
+                content = f.read()
+            self.assertIn('<width>200</width>', content)
+            self.assertIn('<height>100</height>', content)
+            self.assertEqual(PascalVocReader(xml).getShapes()[0][0], 'person')
+        finally:
+            shutil.rmtree(tmpdir)
+
 if __name__ == '__main__':
     unittest.main()
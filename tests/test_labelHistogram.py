@@ -0,0 +1,60 @@
+import sys
+import unittest
+
+try:
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    from PyQt4.QtGui import QApplication
+
+from libs.labelHistogram import LabelHistogram, LabelStatsWidget
+
+
+class TestLabelHistogram(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.histogram = LabelHistogram()
+        self.histogram.labelAdded.connect(lambda label: self.events.append(('+', label)))
+        self.histogram.labelRemoved.connect(lambda label: self.events.append(('-', label)))
+
+    def test_addRemove(self):
+        self.histogram.add('cat')
+        self.histogram.add('cat')
+        self.histogram.add('dog')
+        self.assertEqual(self.histogram.items(), [('cat', 2), ('dog', 1)])
+        self.histogram.remove('cat')
+        self.histogram.remove('dog')
+        self.histogram.remove('bird')
+        self.assertEqual(self.histogram.labels(), ['cat'])
+        self.assertEqual(self.events, [('+', 'cat'), ('+', 'dog'), ('-', 'dog')])
+
+    def test_rename(self):
+        self.histogram.add('auto_0_cat')
+        self.histogram.add('cat')
+        self.histogram.rename('auto_0_cat', 'cat')
+        self.histogram.rename('cat', 'cat')
+        self.assertEqual(self.histogram.count('cat'), 2)
+        self.assertNotIn('auto_0_cat', self.histogram)
+        self.assertEqual(self.events[-1], ('-', 'auto_0_cat'))
+
+    def test_addAll(self):
+        self.histogram.add('cat')
+        self.histogram.addAll(['cat', 'dog', 'dog', None])
+        self.assertEqual(self.histogram.items(), [('', 1), ('cat', 2), ('dog', 2)])
+        self.assertEqual(self.events, [('+', 'cat'), ('+', 'dog'), ('+', '')])
+
+    def test_statsWidget(self):
+        app = QApplication.instance() or QApplication(sys.argv)
+        widget = LabelStatsWidget(self.histogram)
+        self.histogram.add('cat')
+        self.histogram.add('dog', 3)
+        self.assertEqual(widget.topLevelItemCount(), 2)
+        self.histogram.remove('cat')
+        self.assertEqual(widget.topLevelItemCount(), 1)
+        self.assertEqual(widget.topLevelItem(0).data(1, 0), 3)
+        self.histogram.clear()
+        self.assertEqual(widget.topLevelItemCount(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.labelPalette import LabelPalette, hashColor, parseColor
+
+
+class TestLabelPalette(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'colors.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cached(self):
+        palette = LabelPalette()
+        color = palette.color('cat')
+        self.assertIs(palette.color('cat'), color)
+        self.assertEqual(color, hashColor('cat'))
+
+    def test_parseColor(self):
+        self.assertEqual(parseColor('#ff0000').alpha(), 100)
+        self.assertEqual(parseColor('#80ff0000').alpha(), 128)
+        self.assertEqual(parseColor([1, 2, 3, 4]).blue(), 3)
+        self.assertIsNone(parseColor('nope'))
+        self.assertIsNone(parseColor([1, 2]))
+
+    def test_pinnedAndPersisted(self):
+        palette = LabelPalette()
+        palette.setPinned({'cat': '#00ff00', 'bad': 'nope'})
+        self.assertEqual(palette.color('cat').green(), 255)
+        palette.color('dog')
+        self.assertTrue(palette.save(self.path))
+        self.assertFalse(palette.save(self.path))
+
+        other = LabelPalette()
+        other.setPinned({'cat': [0, 0, 255]})
+        self.assertEqual(other.load(self.path), 1)
+        self.assertEqual(other.color('cat').blue(), 255)
+        self.assertEqual(other.color('dog'), palette.color('dog'))
+
+        # 去掉固定颜色后恢复为哈希生成的颜色
+        unpinned = LabelPalette()
+        unpinned.load(self.path)
+        self.assertEqual(unpinned.color('cat'), hashColor('cat'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from libs.labelVocabulary import LabelVocabulary, fuzzyScore
+
+
+class TestLabelVocabulary(unittest.TestCase):
+
+    def setUp(self):
+        self.vocabulary = LabelVocabulary(['Cat', 'cattle', 'dog', 'concat', 'dog'])
+
+    def test_listCompatible(self):
+        self.assertEqual(list(self.vocabulary), ['Cat', 'cattle', 'dog', 'concat'])
+        self.assertEqual(self.vocabulary.index('dog'), 2)
+        self.assertRaises(ValueError, self.vocabulary.index, 'bird')
+        self.vocabulary.append('bird')
+        self.assertIn('bird', self.vocabulary)
+        self.assertEqual(self.vocabulary[-1], 'bird')
+
+    def test_appendKeepsListSemantics(self):
+        self.vocabulary.append('')
+        self.assertEqual(self.vocabulary.index(''), 4)
+        self.vocabulary.append('dog')
+        self.vocabulary.append('bird')
+        self.assertEqual(self.vocabulary.index('dog'), 2)
+        self.assertEqual(self.vocabulary.index('bird'), 6)
+        self.assertNotIn('', self.vocabulary.search(''))
+
+    def test_search(self):
+        self.assertEqual(self.vocabulary.search('cat'), ['Cat', 'cattle', 'concat'])
+        self.assertEqual(self.vocabulary.search('ct'), ['Cat', 'cattle', 'concat'])
+        self.assertEqual(self.vocabulary.search('cat', limit=1), ['Cat'])
+        self.assertIsNone(fuzzyScore('dog', 'cat'))
+
+    def test_recent(self):
+        self.vocabulary.use('cattle')
+        self.vocabulary.use('dog')
+        self.vocabulary.use('bird')
+        self.assertEqual(self.vocabulary.recent(2), ['bird', 'dog'])
+        self.assertEqual(self.vocabulary.search('cat')[0], 'cattle')
+        self.assertEqual(self.vocabulary.search('')[:4], ['bird', 'dog', 'cattle', 'Cat'])
+
+    def test_emptySearchKeepsInsertionOrder(self):
+        vocabulary = LabelVocabulary()
+        for label in ['zebra', '', 'cat', 'apple', 'cat', 'mouse']:
+            vocabulary.append(label)
+        self.assertEqual(vocabulary.search(''), ['zebra', 'cat', 'apple', 'mouse'])
+        vocabulary.use('apple')
+        self.assertEqual(vocabulary.search(''), ['apple', 'zebra', 'cat', 'mouse'])
+        self.assertEqual(vocabulary.search('', limit=2), ['apple', 'zebra'])
+
+
+if __name__ == '__main__':
+    unittest.main()
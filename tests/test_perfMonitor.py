@@ -0,0 +1,43 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+from libs.perfMonitor import PerfMonitor, percentile
+
+
+class TestPerfMonitor(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), None)
+
+    def test_rollingWindowAndCsv(self):
+        monitor = PerfMonitor(windowSize=10)
+        for i in range(20):
+            monitor.record(float(i), i, 0.5, float(i) if i % 2 else None)
+        self.assertEqual(len(monitor), 20)
+        self.assertEqual(monitor.percentiles('paint_ms')[50], 14.0)
+        self.assertEqual(monitor.percentiles('latency_ms')[99], 19.0)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'perf.csv')
+            self.assertEqual(monitor.exportCsv(path), 20)
+            with open(path) as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0], ['time', 'paint_ms', 'shapes', 'pixmap_ms', 'latency_ms'])
+            self.assertEqual(rows[1][1:], ['0.0', '0', '0.5', ''])
+        finally:
+            shutil.rmtree(tmpdir)
+
+        monitor.clear()
+        self.assertEqual(monitor.percentiles('shapes'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
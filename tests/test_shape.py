@@ -0,0 +1,60 @@
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF, QRectF
+except ImportError:
+    from PyQt4.QtCore import QPointF, QRectF
+
+from libs.shape import Shape
+
+
+class TestShapeGeometryCache(unittest.TestCase):
+
+    def makeShape(self):
+        shape = Shape(label='cat')
+        for x, y in ((0, 0), (10, 0), (10, 20), (0, 20)):
+            shape.addPoint(QPointF(x, y))
+        shape.close()
+        return shape
+
+    def test_cacheInvalidation(self):
+        shape = self.makeShape()
+        self.assertEqual(shape.boundingRect(), QRectF(0, 0, 10, 20))
+        self.assertIs(shape.makePath(), shape.makePath())
+
+        shape.moveBy(QPointF(5, 5))
+        self.assertEqual(shape.boundingRect(), QRectF(5, 5, 10, 20))
+        shape.moveVertexBy(2, QPointF(5, 5))
+        self.assertEqual(shape.boundingRect(), QRectF(5, 5, 15, 25))
+        shape[0] = QPointF(0, 0)
+        self.assertEqual(shape.boundingRect(), QRectF(0, 0, 20, 30))
+        shape.popPoint()
+        self.assertTrue(shape.containsPoint(QPointF(15, 10)))
+        shape.points = [QPointF(1, 1), QPointF(2, 2)]
+        self.assertEqual(shape.boundingRect(), QRectF(1, 1, 1, 1))
+
+    def test_compactCoords(self):
+        shape = self.makeShape()
+        self.assertEqual(shape.coords.shape, (4, 2))
+        self.assertFalse(shape.coords.flags.writeable)
+
+        shape.translate(-5, 0)
+        self.assertEqual(shape[0], QPointF(-5, 0))
+        self.assertTrue(shape.clamp(8, 15))
+        self.assertEqual(shape.boundingRect(), QRectF(0, 0, 5, 15))
+        self.assertFalse(shape.clamp(8, 15))
+
+        copied = shape.copy()
+        copied.translate(1, 1)
+        self.assertEqual(shape[0], QPointF(0, 0))
+        self.assertEqual(copied[0], QPointF(1, 1))
+        self.assertEqual(shape.nearestVertex(QPointF(5, 14), 2), 2)
+        self.assertEqual(shape.nearestVertex(QPointF(50, 50), 2), None)
+
+    def test_pensAreShared(self):
+        a, b = self.makeShape(), self.makeShape()
+        self.assertIs(Shape.pen(a.line_color, 2), Shape.pen(b.line_color, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF, QRectF
+except ImportError:
+    from PyQt4.QtCore import QPointF, QRectF
+
+from libs.spatialIndex import SpatialIndex, encloses
+
+
+class Box(object):
+
+    def __init__(self, x, y, w, h):
+        self.rect = QRectF(x, y, w, h)
+
+    def boundingRect(self):
+        return self.rect
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_queryMatchesLinearScan(self):
+        random.seed(1)
+        boxes = [Box(random.uniform(0, 2000), random.uniform(0, 2000),
+                     random.uniform(1, 300), random.uniform(1, 300)) for _ in range(300)]
+        index = SpatialIndex(cellSize=100)
+        for box in boxes:
+            index.insert(box)
+
+        for _ in range(100):
+            point = QPointF(random.uniform(0, 2300), random.uniform(0, 2300))
+            expected = [b for b in boxes if b.rect.adjusted(-5, -5, 5, 5).contains(point)]
+            self.assertEqual(index.queryPoint(point, 5), expected)
+
+        rect = QRectF(500, 500, 400, 200)
+        self.assertEqual(index.query(rect), [b for b in boxes if b.rect.intersects(rect)])
+
+    def test_updateAndRemoveKeepOrder(self):
+        index = SpatialIndex(cellSize=10)
+        a, b = Box(0, 0, 5, 5), Box(2, 2, 5, 5)
+        index.insert(a)
+        index.insert(b)
+        self.assertEqual(index.queryPoint(QPointF(3, 3)), [a, b])
+
+        a.rect = QRectF(100, 100, 5, 5)
+        index.update(a)
+        self.assertEqual(index.queryPoint(QPointF(3, 3)), [b])
+        self.assertEqual(index.queryPoint(QPointF(102, 102)), [a])
+
+        a.rect = QRectF(1, 1, 5, 5)
+        index.update(a)
+        self.assertEqual(index.queryPoint(QPointF(3, 3)), [a, b])
+
+        index.remove(b)
+        self.assertNotIn(b, index)
+        self.assertEqual(index.queryPoint(QPointF(3, 3)), [a])
+        self.assertEqual(len(index), 1)
+
+    def test_zeroAreaShape(self):
+        index = SpatialIndex(cellSize=100)
+        line, dot = Box(10, 10, 0, 20), Box(50, 50, 0, 0)
+        index.insert(line)
+        index.insert(dot)
+        self.assertEqual(index.query(QRectF(0, 0, 100, 100)), [line, dot])
+        self.assertEqual(index.queryPoint(QPointF(10, 15)), [line])
+        self.assertEqual(index.queryPoint(QPointF(51, 51), margin=2), [dot])
+        self.assertTrue(encloses(QRectF(0, 0, 100, 100), index.rect(line)))
+
+
+if __name__ == '__main__':
+    unittest.main()
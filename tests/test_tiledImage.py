@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtCore import QSize, QRectF, Qt
+except ImportError:
+    from PyQt4.QtGui import QImage
+    from PyQt4.QtCore import QSize, QRectF, Qt
+
+import libs.tiledImage
+from libs.tiledImage import TiledImage, pruneTileCache
+
+
+class TestTiledImage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def makeTiled(self, ext):
+        image = QImage(1000, 600, QImage.Format_RGB32)
+        image.fill(Qt.blue)
+        path = os.path.join(self.tmpdir, 'big.' + ext)
+        image.save(path)
+        return TiledImage(path, QSize(1000, 600), QSize(125, 75), tileSize=256,
+                          cacheRoot=os.path.join(self.tmpdir, 'cache'))
+
+    def test_levels(self):
+        tiled = self.makeTiled('jpg')
+        self.assertEqual(tiled.levels, 3)
+        self.assertEqual(tiled.levelForScale(0.1), -1)
+        self.assertEqual(tiled.levelForScale(0.3), 1)
+        self.assertEqual(tiled.levelForScale(4), 0)
+        self.assertEqual(tiled.levelSize(2), QSize(250, 150))
+        self.assertEqual(len(tiled.tileKeys(0, QRectF(0, 0, 1000, 600))), 12)
+        self.assertEqual(tiled.tileKeys(1, QRectF(600, 0, 10, 10)), [(1, 1, 0)])
+        self.assertEqual(tiled.tileRect((0, 3, 2)).size(), QSize(232, 88))
+
+    def test_loadTiles(self):
+        for ext in ('jpg', 'png'):
+            tiled = self.makeTiled(ext)
+            if not tiled.pyramidReady:
+                tiled.buildPyramid()
+            tile = tiled.loadTile((1, 1, 1))
+            self.assertEqual(tile.size(), QSize(244, 44))
+            self.assertTrue(os.path.exists(tiled._tileFile((1, 1, 1))))
+
+    def test_bandedPyramid(self):
+        tiled = self.makeTiled('jpg')
+        self.assertTrue(tiled.buildPyramid())
+        self.assertIsNone(tiled.error)
+        self.assertEqual(QImage(tiled._tileFile((1, 1, 1))).size(), QSize(244, 44))
+
+    def test_tooLargeFallsBackToPreview(self):
+        tiled = self.makeTiled('png')
+        limit = libs.tiledImage.MAX_DECODE_BYTES
+        libs.tiledImage.MAX_DECODE_BYTES = 1000
+        try:
+            self.assertFalse(tiled.buildPyramid())
+        finally:
+            libs.tiledImage.MAX_DECODE_BYTES = limit
+        self.assertIsNotNone(tiled.error)
+        self.assertFalse(os.path.exists(tiled._tileFile((0, 0, 0))))
+
+    def test_staleVersionsAndPrune(self):
+        tiled = self.makeTiled('png')
+        tiled.buildPyramid()
+        stale = tiled.cacheDir
+        os.utime(tiled.path, (1, 1))
+        rebuilt = TiledImage(tiled.path, QSize(1000, 600), QSize(125, 75), tileSize=256, cacheRoot=tiled.cacheRoot)
+        self.assertNotEqual(rebuilt.cacheDir, stale)
+        rebuilt.buildPyramid()
+        self.assertFalse(os.path.exists(stale))
+
+        other = os.path.join(tiled.cacheRoot, 'other', 'v1')
+        os.makedirs(other)
+        with open(os.path.join(other, 'tile.png'), 'wb') as f:
+            f.write(b'x' * 100)
+        os.utime(other, (1, 1))
+        self.assertEqual(pruneTileCache(tiled.cacheRoot, 0, keep=rebuilt.cacheDir), 1)
+        self.assertFalse(os.path.exists(os.path.join(tiled.cacheRoot, 'other')))
+        self.assertTrue(os.path.exists(rebuilt.cacheDir))
+
+
+if __name__ == '__main__':
+    unittest.main()
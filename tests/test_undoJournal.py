@@ -0,0 +1,87 @@
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF
+except ImportError:
+    from PyQt4.QtCore import QPointF
+
+from libs.shape import Shape
+from libs.undoJournal import UndoJournal, CreateCommand, DeleteCommand, MoveCommand, RelabelCommand
+
+
+class FakeTarget(object):
+
+    def __init__(self, shapes):
+        self.shapes = list(shapes)
+
+    def shapesById(self, uids):
+        return dict((s.uid, s) for s in self.shapes if s.uid in uids)
+
+    def restoreShapes(self, entries):
+        for index, shape in sorted(entries, key=lambda e: e[0]):
+            self.shapes.insert(index, shape)
+
+    def removeShapes(self, shapes):
+        self.shapes = [s for s in self.shapes if s not in shapes]
+
+    def damageOf(self, shapes):
+        return None
+
+    def shapesChanged(self, shapes, damage):
+        pass
+
+
+def makeShape(label, x):
+    shape = Shape(label=label)
+    for dx, dy in ((0, 0), (10, 0), (10, 10), (0, 10)):
+        shape.addPoint(QPointF(x + dx, dy))
+    shape.close()
+    return shape
+
+
+class TestUndoJournal(unittest.TestCase):
+
+    def test_undoRedo(self):
+        a, b, c = makeShape('a', 0), makeShape('b', 20), makeShape('c', 40)
+        target = FakeTarget([a, b, c])
+        journal = UndoJournal()
+
+        old = b.coords.copy()
+        b.translate(5, 5)
+        journal.push(MoveCommand([(b.uid, old, b.coords.copy())]))
+        journal.push(RelabelCommand([(a.uid, ('a', a.line_color), ('z', a.line_color))]))
+        a.label = 'z'
+        target.removeShapes([b])
+        journal.push(DeleteCommand([(1, b)]))
+
+        journal.undo(target)
+        self.assertEqual(target.shapes, [a, b, c])
+        journal.undo(target)
+        self.assertEqual(a.label, 'a')
+        journal.undo(target)
+        self.assertEqual(b[0], QPointF(20, 0))
+        self.assertFalse(journal.canUndo())
+
+        journal.redo(target)
+        self.assertEqual(b[0], QPointF(25, 5))
+        journal.push(CreateCommand([(3, makeShape('d', 60))]))
+        self.assertFalse(journal.canRedo())
+
+    def test_byteCap(self):
+        shape = makeShape('a', 0)
+        journal = UndoJournal(maxBytes=1000)
+        for i in range(20):
+            old = shape.coords.copy()
+            shape.translate(1, 0)
+            journal.push(MoveCommand([(shape.uid, old, shape.coords.copy())]))
+        self.assertTrue(journal.bytes <= 1000)
+        self.assertTrue(0 < len(journal) < 20)
+
+        target = FakeTarget([shape])
+        while journal.undo(target) is not None:
+            pass
+        self.assertEqual(shape[0], QPointF(20 - len(journal._redo), 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
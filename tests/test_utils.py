@@ -1,7 +1,7 @@
 import os
 import sys
 import unittest
-from libs.utils import struct, newAction, newIcon, addActions, fmtShortcut, generateColorByText, natural_sort
+from libs.utils import struct, newAction, newIcon, addActions, fmtShortcut, generateColorByText, natural_sort, labelMatcher
 
 class TestUtils(unittest.TestCase):
 
@@ -17,6 +17,14 @@ class TestUtils(unittest.TestCase):
         natural_sort(l1)
         for idx, val in enumerate(l1):
             self.assertTrue(val == exptected_l1[idx])
+    def test_labelMatcher(self):
+        self.assertIsNone(labelMatcher('  '))
+        match = labelMatcher('cat, dog')
+        self.assertTrue(match('dog'))
+        self.assertFalse(match('cats'))
+        match = labelMatcher('/^auto_/')
+        self.assertTrue(match('auto_0_cat'))
+        self.assertFalse(match('cat'))
 
 if __name__ == '__main__':
     unittest.main()